@@ -1,35 +1,117 @@
-from flask import Flask, jsonify
+from utils import startup  # first, so startup timing covers the imports below
+from flask import Flask, jsonify, Response, request
 from flask_cors import CORS
-from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
 from config import Config
 from routes.auth import auth_bp  
-from database import init_database 
+from database import init_database, get_db_connection
+from modules import reminders, task_stats
+from utils.cache import get_task_cache
+from utils.hashing import get_password_hasher
+from utils import metrics, profiling, log, compression, pubsub, replicas
+from utils.json_provider import FastJSONProvider
 import logging
 from routes.tasks import tasks_bp 
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+startup.mark('imports_done')
+
 logger = logging.getLogger(__name__)
 
+def _runtime_gauges():
+    """Connection pool, cache and password hasher state for /metrics"""
+    samples = []
+    pool = get_db_connection().pool_stats()
+    for state in ('idle', 'in_use'):
+        samples.append(('taskflux_db_pool_connections', 'gauge',
+                        'Pooled database connections by state', {'state': state}, pool[state]))
+    samples.append(('taskflux_db_pool_max_size', 'gauge',
+                    'Upper bound on pooled database connections', {}, pool.get('max_size', 0)))
+    for event in ('created', 'discarded', 'checkouts', 'waits', 'timeouts', 'failed_checks', 'recycled'):
+        if event in pool:
+            samples.append(('taskflux_db_pool_events_total', 'counter',
+                            'Connection pool events', {'event': event}, pool[event]))
+    for replica in pool.get('replicas', ()):
+        labels = {'replica': replica['name']}
+        samples.append(('taskflux_db_replica_up', 'gauge',
+                        'Read replica in rotation (1) or ejected (0)', labels, int(replica['up'])))
+        samples.append(('taskflux_db_replica_in_flight', 'gauge',
+                        'Reads running on the read replica', labels, replica['in_flight']))
+        samples.append(('taskflux_db_replica_reads_total', 'counter',
+                        'Reads routed to the read replica', labels, replica['reads']))
+        samples.append(('taskflux_db_replica_ejections_total', 'counter',
+                        'Times the read replica was taken out of rotation', labels, replica['ejections']))
+        samples.append(('taskflux_db_replica_overflows_total', 'counter',
+                        'Reads sent to the primary because the replica pool was exhausted',
+                        labels, replica['overflows']))
+
+    for name, value in get_task_cache().stats().items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            kind = 'gauge' if name in ('size', 'max_entries') else 'counter'
+            metric = f"taskflux_cache_{name}" if kind == 'gauge' else f"taskflux_cache_{name}_total"
+            samples.append((metric, kind, f"Task list cache {name.replace('_', ' ')}", {}, value))
+
+    hasher = get_password_hasher().stats()
+    samples.append(('taskflux_bcrypt_pending', 'gauge',
+                    'Password hashing jobs queued or running', {}, hasher['pending']))
+    samples.append(('taskflux_bcrypt_max_pending', 'gauge',
+                    'Password hashing jobs allowed before rejecting with 503', {}, hasher['max_pending']))
+    samples.append(('taskflux_bcrypt_rejected_total', 'counter',
+                    'Password hashing jobs rejected because the queue was full', {}, hasher['rejected']))
+    for name, value in compression.get_body_cache().stats().items():
+        if name in ('hits', 'misses', 'evictions'):
+            samples.append((f"taskflux_compression_cache_{name}_total", 'counter',
+                            f"Compressed body cache {name}", {}, value))
+    for encoding, counts in compression.stats.snapshot().items():
+        samples.append(('taskflux_compression_responses_total', 'counter',
+                        'Responses compressed, by content coding', {'encoding': encoding}, counts['responses']))
+        for stage in ('in', 'out'):
+            samples.append(('taskflux_compression_bytes_total', 'counter',
+                            'Response bytes before (in) and after (out) compression',
+                            {'encoding': encoding, 'stage': stage}, counts[f'bytes_{stage}']))
+    scheduler = reminders.get_scheduler()
+    if scheduler is not None:
+        reminder_stats = scheduler.stats()
+        samples.append(('taskflux_reminders_pending', 'gauge',
+                        'Reminders held for the lookahead window', {}, reminder_stats['pending']))
+        samples.append(('taskflux_reminders_fired_total', 'counter',
+                        'Reminders sent by this process', {}, reminder_stats['fired']))
+    events = pubsub.get_broker().stats()
+    samples.append(('taskflux_event_streams', 'gauge', 'Open task event streams', {}, events['subscribers']))
+    for name in ('published', 'delivered', 'slow_disconnects', 'rejected'):
+        samples.append((f"taskflux_events_{name}_total", 'counter',
+                        f"Task events {name.replace('_', ' ')}", {}, events[name]))
+    samples.append(('taskflux_log_dropped_total', 'counter',
+                    'Log records dropped because the log queue was full', {}, log.dropped_records()))
+    return samples
+
 def create_app():
     """Create and configure Flask application"""
+    log.configure_logging()
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
     
     # Load configuration
     app.config['SECRET_KEY'] = Config.SECRET_KEY
     app.config['JWT_SECRET_KEY'] = Config.JWT_SECRET_KEY
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = Config.JWT_ACCESS_TOKEN_EXPIRES
+    # off only for the legacy integer subjects; remove with Config.JWT_ACCEPT_INT_SUBJECTS
+    app.config['JWT_VERIFY_SUB'] = not Config.JWT_ACCEPT_INT_SUBJECTS
     app.config['DEBUG'] = Config.DEBUG
     
     # Initialize extensions
     CORS(app, origins=Config.CORS_ORIGINS)
-    Bcrypt(app)
     jwt = JWTManager(app)
     
+    # Log sampling, per-request query accounting, read-your-writes tracking for replicas,
+    # and request counts and latency for /metrics
+    log.init_app(app)
+    profiling.init_app(app)
+    replicas.init_app(app)
+    metrics.init_app(app)
+    metrics.get_metrics().register_collector(_runtime_gauges)
+    # registered last so it runs first among after_request hooks and is timed by metrics
+    compression.init_app(app)
+    
     # Register blueprints
     app.register_blueprint(auth_bp)
     app.register_blueprint(tasks_bp)  
@@ -79,6 +161,18 @@ def create_app():
             'message': 'Authorization token is required'
         }), 401
     
+    # Stream tokens travel in URLs, so they open the event stream and nothing else
+    @jwt.token_verification_loader
+    def token_scope_callback(jwt_header, jwt_payload):
+        return jwt_payload.get('scope') != 'stream' or request.endpoint == 'tasks.stream_tasks'
+    
+    @jwt.token_verification_failed_loader
+    def token_scope_failed_callback(jwt_header, jwt_payload):
+        return jsonify({
+            'success': False,
+            'message': 'This token only opens the task event stream'
+        }), 401
+    
     # Health check endpoint
     @app.route('/api/health', methods=['GET'])
     def health_check():
@@ -89,6 +183,36 @@ def create_app():
             'status': 'healthy'
         }), 200
     
+    # Connection pool statistics for monitoring
+    @app.route('/api/health/db', methods=['GET'])
+    def db_health_check():
+        return jsonify({
+            'success': True,
+            'pool': get_db_connection().pool_stats()
+        }), 200
+    
+    # Task list cache statistics for monitoring
+    @app.route('/api/health/cache', methods=['GET'])
+    def cache_health_check():
+        return jsonify({
+            'success': True,
+            'cache': get_task_cache().stats()
+        }), 200
+    
+    # Prometheus scrape endpoint
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        return Response(metrics.get_metrics().render(),
+                        mimetype='text/plain; version=0.0.4; charset=utf-8')
+    
+    # Boot phase timings and, with STARTUP_PROFILE_IMPORTS=true, the slowest imports
+    @app.route('/api/health/startup', methods=['GET'])
+    def startup_report():
+        return jsonify({
+            'success': True,
+            'startup': startup.report()
+        }), 200
+    
     # Root endpoint
     @app.route('/', methods=['GET'])
     def root():
@@ -101,35 +225,41 @@ def create_app():
                 'login': '/api/login',
                 'profile': '/api/profile',
                 'verify_token': '/api/verify-token',
-                'health': '/api/health'
+                'health': '/api/health',
+                'db_health': '/api/health/db',
+                'cache_health': '/api/health/cache',
+                'startup': '/api/health/startup',
+                'metrics': '/metrics'
             }
         }), 200
     
+    startup.init_app(app)
     return app
 
 if __name__ == '__main__':
-    try:
-        # Initialize database first
+    # Development server only; production runs `gunicorn -c gunicorn.conf.py wsgi:app`
+    log.configure_logging()
+    
+    # Schema changes are a separate step (`python migrations.py upgrade`);
+    # AUTO_MIGRATE=true applies them here for local development
+    if Config.AUTO_MIGRATE:
         logger.info("Initializing database...")
         init_database()
-        logger.info("Database initialization completed successfully")
-        
-        # Create Flask app
-        app = create_app()
-        
-        # Run the application
-        logger.info("Starting TaskFlux API server...")
-        logger.info(f"Server running on: http://localhost:5000")
-        logger.info(f"Health check: http://localhost:5000/api/health")
-        
-        app.run(
-            host='0.0.0.0',
-            port=5000,
-            debug=Config.DEBUG
-        )
-        
-    except Exception as e:
-        logger.error(f"Failed to start application: {e}")
-        print(f" Error: {e}")
-        input("Press Enter to exit...")
-        raise e
\ No newline at end of file
+    
+    app = create_app()
+    if get_db_connection().replicas is not None:
+        get_db_connection().replicas.start()
+    task_stats.get_reconciler().start()
+    if reminders.get_scheduler():
+        reminders.get_scheduler().start()
+    
+    logger.info("Starting TaskFlux API development server...")
+    logger.info(f"Server running on: http://localhost:{Config.API_PORT}")
+    logger.info(f"Health check: http://localhost:{Config.API_PORT}/api/health")
+    
+    app.run(
+        host=Config.API_HOST,
+        port=Config.API_PORT,
+        debug=Config.DEBUG,
+        threaded=True
+    )
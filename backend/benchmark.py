@@ -0,0 +1,505 @@
+"""Load generator and benchmark for the TaskFlux API.
+
+Seeds users and tasks, then concurrent workers run a weighted mix of
+register/login/list/create/update/delete requests. Requests go either to the
+Flask app in this process or to a running server over HTTP. The results
+report requests/sec and per-endpoint p50/p95/p99 latency with a histogram,
+written as JSON so runs from different commits can be compared.
+
+    python benchmark.py run                          # in-process, temporary SQLite db
+    python benchmark.py run --url http://localhost:5000 --workers 16 --duration 60
+    python benchmark.py run --users 50 --tasks-per-user 500 --output after.json
+    python benchmark.py compare before.json after.json
+    python benchmark.py json --tasks 10000           # response encoders on one task list
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_MIX = "list=50,create=15,update=15,delete=5,login=10,register=5"
+PASSWORD = "bench-password"
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open ended
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class InProcessClient:
+    """Calls the Flask app directly through its test client"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        resp = self.client.open(path, method=method, json=body, headers=headers)
+        return resp.status_code, resp.get_json(silent=True)
+
+
+class HttpClient:
+    """Keeps one HTTP/1.1 connection per worker to a running server"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+    def request(self, method, path, body=None, token=None):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        payload = json.dumps(body) if body is not None else None
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            resp = self.conn.getresponse()
+        except (http.client.HTTPException, OSError):
+            # the server closed the keep-alive connection; retry once on a new one
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self.conn.request(method, path, body=payload, headers=headers)
+            resp = self.conn.getresponse()
+        raw = resp.read()
+        try:
+            return resp.status, json.loads(raw) if raw else None
+        except ValueError:
+            return resp.status, None
+
+
+class Recorder:
+    """Collects latency samples per endpoint from every worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}   # endpoint -> [seconds]
+        self.errors = {}    # endpoint -> count of non-2xx/304 responses or exceptions
+
+    def record(self, endpoint, seconds, ok):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, errors, elapsed):
+    """Per-endpoint statistics in milliseconds"""
+    values = sorted(s * 1000 for s in samples)
+    histogram = {f"le_{bound}": 0 for bound in BUCKETS_MS}
+    histogram["le_inf"] = 0
+    for value in values:
+        for bound in BUCKETS_MS:
+            if value <= bound:
+                histogram[f"le_{bound}"] += 1
+                break
+        else:
+            histogram["le_inf"] += 1
+    return {
+        "count": len(values),
+        "errors": errors,
+        "rps": round(len(values) / elapsed, 2) if elapsed else None,
+        "mean_ms": round(sum(values) / len(values), 3) if values else None,
+        "min_ms": round(values[0], 3) if values else None,
+        "p50_ms": round(percentile(values, 0.50), 3) if values else None,
+        "p95_ms": round(percentile(values, 0.95), 3) if values else None,
+        "p99_ms": round(percentile(values, 0.99), 3) if values else None,
+        "max_ms": round(values[-1], 3) if values else None,
+        "histogram": histogram,
+    }
+
+
+def parse_mix(text):
+    """Parse "list=50,create=15,..." into a weights dict"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation in mix: {name}")
+        mix[name] = float(weight)
+    if not any(mix.values()):
+        raise ValueError("The operation mix needs at least one positive weight")
+    return mix
+
+
+# ---- workload ----
+
+class Session:
+    """One simulated user: a token and the ids of tasks it may update/delete"""
+
+    def __init__(self, email, token, task_ids):
+        self.email = email
+        self.token = token
+        self.task_ids = task_ids
+
+
+def _ok(status):
+    return 200 <= status < 300 or status == 304
+
+
+def op_list(client, session, rng):
+    path = "/api/tasks?limit=50"
+    if rng.random() < 0.3:
+        path += "&status=" + rng.choice(("pending", "in_progress", "completed"))
+    status, _ = client.request("GET", path, token=session.token)
+    return "GET /api/tasks", status
+
+
+def op_create(client, session, rng):
+    status, body = client.request("POST", "/api/tasks", {
+        "title": f"bench task {rng.randrange(10 ** 9)}",
+        "priority": rng.choice(("low", "medium", "high")),
+    }, token=session.token)
+    if status == 201:
+        session.task_ids.append(body["task"]["id"])
+    return "POST /api/tasks", status
+
+
+def op_update(client, session, rng):
+    if not session.task_ids:
+        return op_create(client, session, rng)
+    task_id = rng.choice(session.task_ids)
+    status, _ = client.request("PUT", f"/api/tasks/{task_id}", {
+        "status": rng.choice(("pending", "in_progress", "completed")),
+    }, token=session.token)
+    return "PUT /api/tasks/<id>", status
+
+
+def op_delete(client, session, rng):
+    if not session.task_ids:
+        return op_create(client, session, rng)
+    task_id = session.task_ids.pop(rng.randrange(len(session.task_ids)))
+    status, _ = client.request("DELETE", f"/api/tasks/{task_id}", token=session.token)
+    return "DELETE /api/tasks/<id>", status
+
+
+def op_login(client, session, rng):
+    status, _ = client.request("POST", "/api/", {"email": session.email, "password": PASSWORD})
+    return "POST /api/ (login)", status
+
+
+def op_register(client, session, rng):
+    email = f"bench-{rng.randrange(10 ** 12)}-{time.monotonic_ns()}@example.com"
+    status, _ = client.request("POST", "/api/register",
+                               {"name": "Bench User", "email": email, "password": PASSWORD})
+    return "POST /api/register", status
+
+
+OPERATIONS = {
+    "list": op_list,
+    "create": op_create,
+    "update": op_update,
+    "delete": op_delete,
+    "login": op_login,
+    "register": op_register,
+}
+
+
+def seed(client, users, tasks_per_user, run_id):
+    """Register `users` users and give each `tasks_per_user` tasks via /batch"""
+    sessions = []
+    for n in range(users):
+        email = f"bench-{run_id}-{n}@example.com"
+        status, body = client.request("POST", "/api/register",
+                                      {"name": f"Bench User {n}", "email": email, "password": PASSWORD})
+        if status != 201:
+            raise RuntimeError(f"Seeding failed registering {email}: {status} {body}")
+        token = body["access_token"]
+        task_ids = []
+        remaining = tasks_per_user
+        while remaining:
+            size = min(remaining, 1000)
+            status, body = client.request("POST", "/api/tasks/batch", {"operations": [
+                {"op": "create", "title": f"seed task {i}",
+                 "status": ("pending", "in_progress", "completed")[i % 3],
+                 "priority": ("low", "medium", "high")[i % 3]}
+                for i in range(size)
+            ]}, token=token)
+            if status != 200:
+                raise RuntimeError(f"Seeding tasks failed: {status} {body}")
+            task_ids.extend(r["id"] for r in body["results"])
+            remaining -= size
+        sessions.append(Session(email, token, task_ids))
+    return sessions
+
+
+def worker(make_client, session, mix, rng, recorder, deadline, budget):
+    client = make_client()
+    names, weights = list(mix), list(mix.values())
+    while time.monotonic() < deadline and budget.take():
+        name = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            endpoint, status = OPERATIONS[name](client, session, rng)
+            ok = _ok(status)
+        except Exception:
+            endpoint, ok = name, False
+        recorder.record(endpoint, time.perf_counter() - start, ok)
+
+
+class Budget:
+    """Shared request budget; unlimited when total is None"""
+
+    def __init__(self, total):
+        self.remaining = total
+        self._lock = threading.Lock()
+
+    def take(self):
+        if self.remaining is None:
+            return True
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+# ---- runner ----
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _in_process_app(args):
+    """Build the app against a fresh database so runs start from the same state"""
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_LOG_ROUNDS"] = str(args.bcrypt_rounds)
+    import database
+    from app import create_app
+    if not args.use_configured_db:
+        from sqlite_database import SQLiteDatabase
+        path = args.sqlite_path or os.path.join(tempfile.mkdtemp(prefix="taskflux-bench-"), "bench.db")
+        if os.path.exists(path):
+            os.remove(path)
+        database.db = SQLiteDatabase(path)
+    database.init_database()
+    app = create_app()
+    return app, database.db.dialect
+
+
+def run(args):
+    mix = parse_mix(args.mix)
+    if args.url:
+        target, backend = args.url, None
+        make_client = lambda: HttpClient(args.url)  # noqa: E731
+    else:
+        app, backend = _in_process_app(args)
+        target = "in-process"
+        make_client = lambda: InProcessClient(app)  # noqa: E731
+
+    rng = random.Random(args.seed)
+    run_id = f"{args.seed}-{int(time.time())}"
+    print(f"Seeding {args.users} users x {args.tasks_per_user} tasks on {target}...", file=sys.stderr)
+    seed_start = time.perf_counter()
+    sessions = seed(make_client(), args.users, args.tasks_per_user, run_id)
+    seed_seconds = time.perf_counter() - seed_start
+
+    recorder = Recorder()
+    budget = Budget(args.requests)
+    print(f"Running {args.workers} workers for "
+          f"{f'{args.requests} requests' if args.requests else f'{args.duration}s'}...", file=sys.stderr)
+    start = time.monotonic()
+    deadline = start + (args.duration if not args.requests else float("inf"))
+    threads = [
+        threading.Thread(target=worker, daemon=True, args=(
+            make_client, sessions[i % len(sessions)], mix,
+            random.Random(rng.random()), recorder, deadline, budget))
+        for i in range(args.workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    all_samples = [s for samples in recorder.samples.values() for s in samples]
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "target": target,
+            "backend": backend,
+            "workers": args.workers,
+            "users": args.users,
+            "tasks_per_user": args.tasks_per_user,
+            "mix": mix,
+            "seed": args.seed,
+            "seed_seconds": round(seed_seconds, 3),
+            "elapsed_seconds": round(elapsed, 3),
+        },
+        "total": summarize(all_samples, sum(recorder.errors.values()), elapsed),
+        "endpoints": {
+            endpoint: summarize(samples, recorder.errors.get(endpoint, 0), elapsed)
+            for endpoint, samples in sorted(recorder.samples.items())
+        },
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    _print_table(report, sys.stderr)
+    return 0
+
+
+def _print_table(report, out):
+    print(f"\n{'endpoint':<26}{'count':>8}{'err':>6}{'rps':>10}{'p50':>9}{'p95':>9}{'p99':>9}",
+          file=out)
+    rows = list(report["endpoints"].items()) + [("total", report["total"])]
+    for endpoint, stats in rows:
+        print(f"{endpoint:<26}{stats['count']:>8}{stats['errors']:>6}{stats['rps'] or 0:>10.1f}"
+              f"{stats['p50_ms'] or 0:>9.2f}{stats['p95_ms'] or 0:>9.2f}{stats['p99_ms'] or 0:>9.2f}",
+              file=out)
+
+
+def compare(args):
+    """Print the change in rps and latency percentiles between two reports"""
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    def pct(old, new):
+        if not old or new is None:
+            return "      n/a"
+        return f"{(new - old) / old * 100:>+8.1f}%"
+
+    print(f"{before['meta'].get('commit')} -> {after['meta'].get('commit')}")
+    print(f"{'endpoint':<26}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    endpoints = sorted(set(before["endpoints"]) & set(after["endpoints"])) + ["total"]
+    for endpoint in endpoints:
+        old = before["total"] if endpoint == "total" else before["endpoints"][endpoint]
+        new = after["total"] if endpoint == "total" else after["endpoints"][endpoint]
+        print(f"{endpoint:<26}{pct(old['rps'], new['rps'])}{pct(old['p50_ms'], new['p50_ms'])}"
+              f"{pct(old['p95_ms'], new['p95_ms'])}{pct(old['p99_ms'], new['p99_ms'])}")
+    return 0
+
+
+def _task_rows(count, rng):
+    """Task dicts shaped like cursor(dictionary=True) rows"""
+    base = datetime(2025, 1, 1, 9, 0, 0)
+    rows = []
+    for i in range(count):
+        created = base + timedelta(minutes=i, seconds=rng.randrange(60))
+        rows.append({
+            "id": i + 1, "user_id": 1, "title": f"Task {i} \u00e9t\u00e9",
+            "description": None if i % 3 else "Some longer description of the work to do",
+            "status": rng.choice(("pending", "in_progress", "completed")),
+            "priority": rng.choice(("low", "medium", "high")),
+            "due_date": created + timedelta(days=7) if i % 2 else None,
+            "created_at": created, "updated_at": created,
+        })
+    return rows
+
+
+def json_bench(args):
+    """Time encoding one list_tasks-shaped response with each JSON provider"""
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+    from utils import json_provider
+
+    rows = _task_rows(args.tasks, random.Random(args.seed))
+    columns = list(rows[0])
+    app = Flask(__name__)
+    default, fast = DefaultJSONProvider(app), json_provider.FastJSONProvider(app)
+
+    objects = {"success": True, "tasks": rows}
+    # tuples as a cursor(dictionary=False) returns them for ?shape=rows
+    as_rows = {"success": True, "tasks": json_provider.RowSet.from_dicts(columns, rows)}
+    cases = [("flask-default", default, objects)]
+    encoders = [("orjson", True), ("stdlib", False)] if json_provider.orjson else [("stdlib", False)]
+    for name, use_orjson in encoders:
+        cases.append((name, fast, objects, use_orjson))
+        cases.append((f"{name}-rows", fast, as_rows, use_orjson))
+
+    results = {}
+    saved = json_provider._fast
+    try:
+        with app.app_context():
+            for name, provider, payload, *encoder in cases:
+                if encoder:
+                    json_provider._fast = encoder[0]
+                timings, size = [], 0
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    size = len(provider.response(payload).get_data())
+                    timings.append(time.perf_counter() - start)
+                timings.sort()
+                results[name] = {"median_ms": round(timings[len(timings) // 2] * 1000, 2),
+                                 "min_ms": round(timings[0] * 1000, 2), "bytes": size}
+    finally:
+        json_provider._fast = saved
+
+    baseline = results["flask-default"]["median_ms"]
+    print(f"{args.tasks} tasks, {args.repeat} runs each")
+    print(f"{'encoder':<16}{'median ms':>11}{'min ms':>9}{'bytes':>11}{'speedup':>9}")
+    for name, stats in results.items():
+        print(f"{name:<16}{stats['median_ms']:>11.2f}{stats['min_ms']:>9.2f}{stats['bytes']:>11}"
+              f"{baseline / stats['median_ms']:>8.1f}x")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"tasks": args.tasks, "repeat": args.repeat, "results": results}, f, indent=2)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the TaskFlux API")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="seed a dataset and drive load against the API")
+    run_parser.add_argument("--url", help="benchmark a running server instead of the app in-process")
+    run_parser.add_argument("--workers", type=int, default=8, help="concurrent clients")
+    run_parser.add_argument("--duration", type=float, default=10, help="seconds to run")
+    run_parser.add_argument("--requests", type=int, help="stop after this many requests instead")
+    run_parser.add_argument("--users", type=int, default=10, help="users to seed")
+    run_parser.add_argument("--tasks-per-user", type=int, default=200, help="tasks to seed per user")
+    run_parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})")
+    run_parser.add_argument("--seed", type=int, default=42, help="random seed for the request mix")
+    run_parser.add_argument("--output", help="also write the JSON report to this file")
+    run_parser.add_argument("--bcrypt-rounds", type=int,
+                            help="in-process only: override BCRYPT_LOG_ROUNDS")
+    run_parser.add_argument("--sqlite-path", help="in-process only: SQLite file to (re)create")
+    run_parser.add_argument("--use-configured-db", action="store_true",
+                            help="in-process only: use the DB_BACKEND from the environment as is")
+
+    compare_parser = sub.add_parser("compare", help="compare two JSON reports")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+
+    json_parser = sub.add_parser("json", help="compare JSON encoders on one large task list")
+    json_parser.add_argument("--tasks", type=int, default=10000, help="tasks in the response")
+    json_parser.add_argument("--repeat", type=int, default=20, help="encodings per encoder")
+    json_parser.add_argument("--seed", type=int, default=42)
+    json_parser.add_argument("--output", help="also write the results as JSON to this file")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        return run(args)
+    if args.command == "json":
+        return json_bench(args)
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,19 +6,123 @@ load_dotenv()
 
 class Config:
     # Database Configuration
+    DB_BACKEND = os.getenv('DB_BACKEND', 'mysql')  # mysql | sqlite
+    SQLITE_PATH = os.getenv('SQLITE_PATH', 'taskflux.db')
     DB_HOST = os.getenv('DB_HOST', 'localhost')
     DB_USER = os.getenv('DB_USER', 'root')
     DB_PASSWORD = os.getenv('DB_PASSWORD', 'Kodithuwakku#22')
     DB_NAME = os.getenv('DB_NAME', 'task_db')
     
+    # Read Replicas (MySQL only; utils.replicas)
+    DB_REPLICAS = os.getenv('DB_REPLICAS', '')  # "host[:port],...": same user, password and database as DB_HOST
+    DB_PRIMARY_PIN_SECONDS = float(os.getenv('DB_PRIMARY_PIN_SECONDS', 10))  # a user's reads stay on the primary this long after a write
+    DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 5))  # seconds; a replica further behind is ejected
+    DB_REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 5))  # seconds between lag checks; 0 disables
+    DB_REPLICA_EJECT_SECONDS = float(os.getenv('DB_REPLICA_EJECT_SECONDS', 5))  # first ejection; doubles while failures repeat
+    
+    # Connection Pool Configuration
+    DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))  # seconds to wait for a free connection
+    DB_POOL_MAX_LIFETIME = int(os.getenv('DB_POOL_MAX_LIFETIME', 1800))  # recycle after 30 minutes
+    DB_POOL_MAX_IDLE = int(os.getenv('DB_POOL_MAX_IDLE', 300))  # close idle connections after 5 minutes
+    DB_POOL_PING_INTERVAL = int(os.getenv('DB_POOL_PING_INTERVAL', 30))  # health check when idle this long
+    
+    # Server Configuration (gunicorn.conf.py)
+    API_HOST = os.getenv('API_HOST', '0.0.0.0')
+    API_PORT = int(os.getenv('API_PORT', 5000))
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', os.cpu_count() or 2))  # worker processes
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 4))  # request threads per worker
+    WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', 30))  # seconds before a stuck worker is restarted
+    WEB_GRACEFUL_TIMEOUT = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))  # seconds to finish requests on shutdown/reload
+    WEB_MAX_REQUESTS = int(os.getenv('WEB_MAX_REQUESTS', 0))  # recycle workers after this many requests; 0 = never
+    WEB_WORKER_CLASS = os.getenv('WEB_WORKER_CLASS', 'gthread')  # gevent suits many open event streams
+    AUTO_MIGRATE = os.getenv('AUTO_MIGRATE', 'false').lower() == 'true'  # let `python app.py` apply migrations
+    
+    # Cache Configuration
+    # memory is per process: with several workers a write would leave the others serving stale
+    # task lists, so it is only the default for one worker (gunicorn refuses it for more)
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory' if WEB_WORKERS == 1 else 'none')  # memory | redis | none
+    CACHE_URL = os.getenv('CACHE_URL', 'redis://localhost:6379/0')
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+    CACHE_TTL = int(os.getenv('CACHE_TTL', 60))  # seconds
+    
+    # Password Hashing Configuration
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))  # work factor; stored hashes are upgraded on login
+    BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    BCRYPT_MAX_PENDING = int(os.getenv('BCRYPT_MAX_PENDING', BCRYPT_WORKERS * 4))  # beyond this, reply 503
+    BCRYPT_TIMEOUT = float(os.getenv('BCRYPT_TIMEOUT', 10))  # seconds
+    
+    # Logging Configuration (applied by utils.log.configure_logging)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json | text
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # records beyond this are dropped, never block
+    LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 1.0))  # share of requests whose INFO logs are kept
+    LOG_SAMPLE_ROUTES = os.getenv('LOG_SAMPLE_ROUTES', '')  # per-route overrides: "/api/tasks=0.05,/api/=0.1"
+    
+    # Task Statistics (modules.task_stats)
+    STATS_RECONCILE_INTERVAL = float(os.getenv('STATS_RECONCILE_INTERVAL', 3600))  # seconds; 0 disables
+    STATS_RECONCILE_BATCH = int(os.getenv('STATS_RECONCILE_BATCH', 500))  # users per page while reconciling
+    
+    # Due-Date Reminders (modules.reminders)
+    REMINDERS_ENABLED = os.getenv('REMINDERS_ENABLED', 'true').lower() == 'true'
+    REMINDER_SINK = os.getenv('REMINDER_SINK', 'log')  # log | file | queue | package.module:factory
+    REMINDER_FILE = os.getenv('REMINDER_FILE', 'reminders.ndjson')  # NDJSON output of the file sink
+    REMINDER_LEAD = float(os.getenv('REMINDER_LEAD', 0))  # seconds before the due date to fire
+    REMINDER_LOOKAHEAD = float(os.getenv('REMINDER_LOOKAHEAD', 900))  # seconds of upcoming reminders held in memory
+    REMINDER_RESCAN = float(os.getenv('REMINDER_RESCAN', 60))  # seconds between reloads of that window
+    REMINDER_GRACE = float(os.getenv('REMINDER_GRACE', 3600))  # reminders missed by more than this are skipped
+    REMINDER_MAX_PENDING = int(os.getenv('REMINDER_MAX_PENDING', 10000))  # cap on reminders held at once
+    
+    # Delta Sync (GET /api/tasks/changes)
+    SYNC_SETTLE = float(os.getenv('SYNC_SETTLE', 2))  # seconds; newer writes wait for the next sync
+    SYNC_TOMBSTONE_DAYS = int(os.getenv('SYNC_TOMBSTONE_DAYS', 30))  # deleted ids kept this long
+    
+    # Task Search
+    SEARCH_RANK_WINDOW = int(os.getenv('SEARCH_RANK_WINDOW', 5000))  # newest matches ranked by relevance
+    
+    # Response Encoding (utils.json_provider)
+    JSON_ENCODER = os.getenv('JSON_ENCODER', 'auto')  # auto (orjson when installed) | orjson | stdlib
+    
+    # Response Compression (utils.compression)
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))  # bytes; smaller bodies are sent as is
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))  # 1-9
+    COMPRESSION_BR_LEVEL = int(os.getenv('COMPRESSION_BR_LEVEL', 4))  # 0-11, needs the brotli package
+    COMPRESSION_ZSTD_LEVEL = int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3))  # 1-22, needs the zstandard package
+    COMPRESSION_CACHE_ENTRIES = int(os.getenv('COMPRESSION_CACHE_ENTRIES', 512))  # compressed bodies kept by ETag
+    
+    # Metrics Configuration
+    METRICS_DIR = os.getenv('METRICS_DIR')  # shared directory when running several worker processes
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1))  # seconds between writes of each worker's file
+    
+    # Query Profiling Configuration
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))  # log statements slower than this; 0 disables
+    QUERY_COUNT_WARN = int(os.getenv('QUERY_COUNT_WARN', 25))  # warn when one request runs more statements; 0 disables
+    SERVER_TIMING = os.getenv('SERVER_TIMING', 'false').lower() == 'true'  # add a Server-Timing header with DB time
+    
     # JWT Configuration
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', '496f338a6d0bd305a9dea2002a6e13af3649090c3886f945007daf5ff5e95a51')
     JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour in seconds
+    # TEMPORARY: accept tokens issued before subjects became strings, which carry an integer
+    # "sub". Set to false once JWT_ACCESS_TOKEN_EXPIRES has passed since that deploy, then remove.
+    JWT_ACCEPT_INT_SUBJECTS = os.getenv('JWT_ACCEPT_INT_SUBJECTS', 'true').lower() == 'true'
     
     # Flask Configuration
     SECRET_KEY = os.getenv('SECRET_KEY', 'df029394d6e04965ab198e8f3e8f1bfa4cab259e2b550cf442efc1a24e1ab6b4')
     DEBUG = os.getenv('FLASK_ENV', 'production') == 'development'
     
+    # Task Event Streams (GET /api/tasks/stream, utils.pubsub)
+    # memory reaches only the streams of the worker that took the write, so it is not the default with several
+    PUBSUB_BACKEND = os.getenv('PUBSUB_BACKEND', 'memory' if WEB_WORKERS == 1 else 'none')  # memory | redis | none
+    PUBSUB_URL = os.getenv('PUBSUB_URL', CACHE_URL)
+    SSE_HEARTBEAT = float(os.getenv('SSE_HEARTBEAT', 15))  # seconds between keep-alive comments
+    SSE_BUFFER = int(os.getenv('SSE_BUFFER', 64))  # events a stream may fall behind before it is closed
+    SSE_TOKEN_TTL = int(os.getenv('SSE_TOKEN_TTL', 60))  # seconds a stream token can open /api/tasks/stream
+    # each open stream holds a request thread under gthread, so only a share of them by default
+    SSE_MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', 1000 if WEB_WORKER_CLASS in ('gevent', 'eventlet')
+                                    else max(1, WEB_THREADS // 2)))  # per worker process
+    
     # CORS Configuration
     CORS_ORIGINS = ["http://localhost:3000", "http://127.0.0.1:3000"]
     
@@ -33,4 +137,28 @@ class Config:
             'autocommit': True,
             'charset': 'utf8mb4',
             'collation': 'utf8mb4_unicode_ci'
-        }
\ No newline at end of file
+        }
+    
+    @staticmethod
+    def get_replica_configs():
+        """Return one connection configuration per DB_REPLICAS entry"""
+        replicas = []
+        for entry in filter(None, (item.strip() for item in Config.DB_REPLICAS.split(','))):
+            host, _, port = entry.partition(':')
+            replica = {**Config.get_db_config(), 'host': host}
+            if port:
+                replica['port'] = int(port)
+            replicas.append(replica)
+        return replicas
+    
+    @staticmethod
+    def get_pool_config():
+        """Return connection pool configuration as dictionary"""
+        return {
+            'min_size': Config.DB_POOL_MIN_SIZE,
+            'max_size': Config.DB_POOL_MAX_SIZE,
+            'timeout': Config.DB_POOL_TIMEOUT,
+            'max_lifetime': Config.DB_POOL_MAX_LIFETIME,
+            'max_idle': Config.DB_POOL_MAX_IDLE,
+            'ping_interval': Config.DB_POOL_PING_INTERVAL
+        }
@@ -1,122 +1,406 @@
-import mysql.connector
-from mysql.connector import Error
 from config import Config
+from utils.pool import ConnectionPool, PoolError
+from utils.metrics import observe_query
+from utils.profiling import QueryEvent, query_shape, record_query, current_profile
+from utils import replicas as replica_routing
+from contextlib import contextmanager
+from functools import partial
+from collections import namedtuple
+import threading
+import time
+import sqlite3
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Outcome of an INSERT/UPDATE/DELETE: the generated id (INSERT only) and the
+# number of rows matched by the statement
+WriteResult = namedtuple("WriteResult", ["lastrowid", "rowcount"])
+
+ER_DUP_ENTRY = 1062  # mysql.connector.errorcode.ER_DUP_ENTRY, without importing the driver
+
+def is_duplicate_entry(error):
+    """True when `error` is a UNIQUE/PRIMARY KEY violation"""
+    if isinstance(error, sqlite3.IntegrityError):
+        return 'UNIQUE constraint failed' in str(error)
+    return getattr(error, 'errno', None) == ER_DUP_ENTRY
+
+class ProfiledCursor:
+    """Cursor handed out by Database.transaction(); reports each statement to the query hooks"""
+
+    def __init__(self, db, cursor):
+        self._db = db
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        started = time.perf_counter()
+        self._cursor.execute(query, params or ())
+        self._db._record(query, started, self._cursor.rowcount)
+
+    def executemany(self, query, seq_params):
+        started = time.perf_counter()
+        self._cursor.executemany(query, seq_params)
+        self._db._record(query, started, self._cursor.rowcount)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
 class Database:
-    def __init__(self):
-        self.config = Config.get_db_config()
-        self.connection = None
-        
-    def connect(self):
-        """Create database connection"""
+    """MySQL storage backend.
+
+    Other backends (see sqlite_database.py) subclass this and keep the same
+    interface: execute_query, execute_write, stream_query, transaction,
+    connection, insert_ids and create_tables, all taking %s placeholders.
+
+    With `replicas` (connection configs, see Config.get_replica_configs),
+    read-only statements of execute_query and stream_query are served by
+    the replicas; see utils/replicas.py.
+    """
+    dialect = 'mysql'
+    display_name = 'MySQL'
+    for_update = ' FOR UPDATE'  # row-lock suffix for SELECTs inside transaction()
+    now_sql = 'NOW(6)'  # the clock CURRENT_TIMESTAMP(6) defaults stamp rows with
+
+    def __init__(self, config=None, replicas=()):
+        self.config = config or Config.get_db_config()
+        self.replica_configs = list(replicas)
+        self._pool = None
+        self._replicas = None
+        self._pool_lock = threading.Lock()
+        self.query_hooks = [observe_query, record_query]
+
+    @property
+    def error_class(self):
+        # mysql.connector takes tens of milliseconds to import; only load it when used
+        from mysql.connector import Error
+        return Error
+
+    @property
+    def pool(self):
+        """Connection pool, created lazily on first use"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ConnectionPool(
+                        self._open_connection,
+                        **Config.get_pool_config()
+                    )
+        return self._pool
+
+    @property
+    def replicas(self):
+        """ReplicaSet over the read replicas, created lazily; None without replicas"""
+        if self._replicas is None and self.replica_configs:
+            with self._pool_lock:
+                if self._replicas is None:
+                    self._replicas = replica_routing.ReplicaSet(
+                        [replica_routing.Replica(
+                            f"{config['host']}:{config.get('port', 3306)}",
+                            ConnectionPool(partial(self._open_connection, config), **Config.get_pool_config()))
+                         for config in self.replica_configs],
+                        eject_seconds=Config.DB_REPLICA_EJECT_SECONDS,
+                        max_lag=Config.DB_REPLICA_MAX_LAG,
+                        check_interval=Config.DB_REPLICA_CHECK_INTERVAL)
+        return self._replicas
+
+    @property
+    def connection_errors(self):
+        """Errors that mean the server is unreachable rather than the statement wrong.
+
+        Not PoolError: an exhausted pool (PoolTimeout) means the server is busy,
+        and ejecting a busy replica would only move its load onto the rest.
+        """
+        from mysql.connector.errors import InterfaceError, OperationalError
+        return (InterfaceError, OperationalError)
+
+    def _open_connection(self, config=None):
+        """Open a raw MySQL connection for the pool (to a replica when given its `config`)"""
+        import mysql.connector
+        from mysql.connector.constants import ClientFlag
         try:
-            self.connection = mysql.connector.connect(**self.config)
-            if self.connection.is_connected():
-                logger.info("Successfully connected to MySQL database")
-                return self.connection
-        except Error as e:
+            # FOUND_ROWS: UPDATE reports matched rows, not only changed ones,
+            # so a no-op update of an existing row is not mistaken for "not found"
+            connection = mysql.connector.connect(
+                client_flags=[ClientFlag.FOUND_ROWS], **(config or self.config)
+            )
+            logger.debug("Opened new pooled MySQL connection")
+            return connection
+        except mysql.connector.Error as e:
             logger.error(f"Error connecting to MySQL: {e}")
             raise e
-            
+
+    def connect(self):
+        """Open the connection pools, warm them up to their minimum size and start
+        the replica lag checks"""
+        self.pool.fill()
+        if self.replicas is not None:
+            self.replicas.fill()
+            self.replicas.start()
+        logger.info(f"Successfully connected to {self.display_name} database")
+        return self
+
     def disconnect(self):
-        """Close database connection"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            logger.info("MySQL connection is closed")
-            
-    def execute_query(self, query, params=None, fetch=False):
-        """Execute a database query"""
+        """Close the connection pools"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+            replicas, self._replicas = self._replicas, None
+        if replicas is not None:
+            replicas.close()
+        if pool is not None:
+            pool.close()
+            logger.info(f"{self.display_name} connection pool is closed")
+
+    def _read_replica(self, query):
+        """The replica to run `query` on, or None for the primary"""
+        if (self.replica_configs and replica_routing.is_read_only(query)
+                and not replica_routing.wants_primary()):
+            return self.replicas.acquire()
+        return None
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the duration of a with-block"""
+        with self.pool.connection() as connection:
+            yield connection
+
+    def add_query_hook(self, hook):
+        """Call `hook(QueryEvent)` after every statement this database runs"""
+        self.query_hooks.append(hook)
+
+    def remove_query_hook(self, hook):
+        self.query_hooks.remove(hook)
+
+    def _record(self, query, started, rows):
+        """Pass a finished statement to the query hooks; a failing hook never fails the query"""
+        profile = current_profile()
+        event = QueryEvent(query_shape(query), query, time.perf_counter() - started, rows,
+                           profile.request_id if profile is not None else None)
+        for hook in self.query_hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                logger.warning(f"Query hook {hook!r} failed: {e}")
+
+    def stream_query(self, query, params=None, batch_size=1000):
+        """Yield result rows in lists of `batch_size` without buffering the result set.
+
+        Uses an unbuffered cursor, so rows are read off the wire as they are
+        consumed. The pooled connection is held until the generator is
+        exhausted or closed; a partially read result leaves the connection
+        unusable, so it is discarded instead of returned.
+        """
+        replica = self._read_replica(query)
+        pool = self.pool if replica is None else replica.pool
+        try:
+            connection = pool.acquire()
+        except (PoolError, *self.connection_errors) as e:
+            if replica is None:
+                raise
+            self.replicas.release(replica, ok=False)
+            if isinstance(e, PoolError):
+                self.replicas.overflow(replica)
+            else:
+                self.replicas.eject(replica, f"connect failed: {e}")
+            replica, pool = None, self.pool
+            connection = pool.acquire()
+        if replica is None and not replica_routing.is_read_only(query):
+            replica_routing.note_write()
+        finished = False
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        started, total = time.perf_counter(), 0
         try:
-            if not self.connection or not self.connection.is_connected():
-                self.connect()
-                
-            cursor = self.connection.cursor(dictionary=True)
             cursor.execute(query, params or ())
-            
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                total += len(rows)
+                yield rows
+            finished = True
+            # includes the time the consumer spent between batches
+            self._record(query, started, total)
+        except self.error_class as e:
+            logger.error(f"Error streaming query: {e}")
+            raise e
+        finally:
+            try:
+                cursor.close()
+            except self.error_class:
+                finished = False
+            pool.release(connection, discard=not finished)
+            if replica is not None:
+                self.replicas.release(replica, ok=finished)
+
+    @contextmanager
+    def transaction(self):
+        """Run several statements on one pooled connection as a single transaction.
+
+        Yields a dictionary cursor; commits when the block exits cleanly and
+        rolls back if it raises.
+        """
+        replica_routing.note_write()
+        with self.connection() as connection:
+            connection.start_transaction()
+            cursor = ProfiledCursor(self, connection.cursor(dictionary=True))
+            try:
+                yield cursor
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def now(self):
+        """The database's current time, read from the primary; compare timestamps
+        the database stamped with this, not with the app server's clock"""
+        with replica_routing.primary_reads():
+            return self.execute_query(f"SELECT {self.now_sql} AS now", fetch=True)[0]['now']
+
+    def timestamp_key(self, value):
+        """A timestamp read from a row, as a parameter that compares equal to the stored value"""
+        return value
+
+    def insert_ids(self, cursor, count):
+        """Ids generated by the multi-row INSERT just run on `cursor`, in row order.
+
+        InnoDB hands a multi-row INSERT ... VALUES a consecutive block of
+        auto-increment ids and lastrowid is the first of them.
+        """
+        return list(range(cursor.lastrowid, cursor.lastrowid + count))
+
+    def reset_after_fork(self):
+        """Forget connections inherited from the parent process.
+
+        They are not closed: the sockets are shared with the parent, and a
+        close here would end the parent's sessions. The child opens its own
+        pool on first use.
+        """
+        self._pool = None
+        self._replicas = None
+        self._pool_lock = threading.Lock()
+
+    def pool_stats(self):
+        """Return connection pool statistics for monitoring, with one entry per read replica"""
+        if self._pool is None:
+            stats = {'size': 0, 'idle': 0, 'in_use': 0, 'closed': True}
+        else:
+            stats = self._pool.stats()
+        if self._replicas is not None:
+            stats['replicas'] = self._replicas.stats()
+        return stats
+
+    def _run_query(self, connection, query, params, fetch, dictionary):
+        cursor = connection.cursor(dictionary=dictionary)
+        try:
+            started = time.perf_counter()
+            cursor.execute(query, params or ())
+
             if fetch:
                 if 'SELECT' in query.upper():
                     result = cursor.fetchall()
+                    rows = len(result)
                 else:
                     result = cursor.fetchone()
+                    rows = 1 if result is not None else 0
             else:
-                result = cursor.rowcount
-                
-            cursor.close()
+                result = rows = cursor.rowcount
+            self._record(query, started, rows)
             return result
-            
-        except Error as e:
+        finally:
+            cursor.close()
+
+    def execute_query(self, query, params=None, fetch=False, dictionary=True):
+        """Execute a database query on a pooled connection; rows are tuples when not `dictionary`.
+
+        A read-only statement may run on a read replica; if that replica
+        cannot be reached it is ejected and the statement runs on the primary.
+        A replica with no free pooled connection stays in rotation; only this
+        statement runs on the primary.
+        """
+        replica = self._read_replica(query)
+        if replica is not None:
+            ok = False
+            try:
+                with replica.pool.connection() as connection:
+                    result = self._run_query(connection, query, params, fetch, dictionary)
+                ok = True
+                return result
+            except self.connection_errors as e:
+                self.replicas.eject(replica, str(e))
+            except PoolError:
+                self.replicas.overflow(replica)
+            except self.error_class as e:
+                ok = True  # the statement failed, not the replica
+                logger.error(f"Error executing query: {e}")
+                raise e
+            finally:
+                self.replicas.release(replica, ok)
+        elif not replica_routing.is_read_only(query):
+            replica_routing.note_write()
+
+        try:
+            with self.connection() as connection:
+                return self._run_query(connection, query, params, fetch, dictionary)
+
+        except self.error_class as e:
             logger.error(f"Error executing query: {e}")
             raise e
-            
+
+    def execute_write(self, query, params=None):
+        """Execute an INSERT/UPDATE/DELETE and return a WriteResult in one round trip"""
+        replica_routing.note_write()
+        try:
+            with self.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    started = time.perf_counter()
+                    cursor.execute(query, params or ())
+                    self._record(query, started, cursor.rowcount)
+                    return WriteResult(cursor.lastrowid, cursor.rowcount)
+                finally:
+                    cursor.close()
+
+        except self.error_class as e:
+            if not is_duplicate_entry(e):
+                logger.error(f"Error executing query: {e}")
+            raise e
+
     def create_tables(self):
-        """Create necessary database tables"""
+        """Bring the schema up to date by applying pending migrations"""
+        from migrations import migrate
         try:
-            self.connect()
-            
-            # Users table
-            users_table = """
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(100) NOT NULL,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                is_active BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                INDEX idx_email (email),
-                INDEX idx_created_at (created_at)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-            """
-            
-            # Tasks table (for future use)
-            tasks_table = """
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                title VARCHAR(255) NOT NULL,
-                description TEXT,
-                status ENUM('pending', 'in_progress', 'completed') DEFAULT 'pending',
-                priority ENUM('low', 'medium', 'high') DEFAULT 'medium',
-                due_date DATETIME NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                INDEX idx_user_id (user_id),
-                INDEX idx_status (status),
-                INDEX idx_due_date (due_date)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-            """
-            
-            # Execute table creation queries
-            self.execute_query(users_table)
-            self.execute_query(tasks_table)
-            
+            migrate(self)
             logger.info("Database tables created successfully")
-            
-        except Error as e:
+        except self.error_class as e:
             logger.error(f"Error creating tables: {e}")
             raise e
-        finally:
-            self.disconnect()
+
+def create_database():
+    """Build the storage backend selected by Config.DB_BACKEND"""
+    if Config.DB_BACKEND == 'sqlite':
+        from sqlite_database import SQLiteDatabase
+        if Config.DB_REPLICAS:
+            logger.warning("DB_REPLICAS is ignored by the SQLite backend")
+        return SQLiteDatabase()
+    if Config.DB_BACKEND == 'mysql':
+        return Database(replicas=Config.get_replica_configs())
+    raise ValueError(f"Unknown DB_BACKEND: {Config.DB_BACKEND}")
 
 # Global database instance
-db = Database()
+db = create_database()
 
 def init_database():
     """Initialize database and create tables"""
     try:
         db.create_tables()
         logger.info("Database initialized successfully")
+        from utils import startup
+        startup.mark('schema_ready')
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise e
 
 def get_db_connection():
-    """Get a fresh database connection"""
-    db.connect()
+    """Get the shared database handle; connections are borrowed from its pool per query"""
     return db
\ No newline at end of file
@@ -0,0 +1,72 @@
+"""Gunicorn settings for running TaskFlux in production.
+
+    python migrations.py upgrade          # once per deploy
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Workers are forked from a master that has already imported the app
+(preload_app), so imports happen once and are shared copy-on-write. Each
+worker opens its own connection pool, password hashing pool and log writer
+after fork. SIGHUP reloads workers gracefully; SIGTERM lets in-flight
+requests finish within graceful_timeout.
+
+Each open /api/tasks/stream holds a request thread under the default
+gthread workers; WEB_WORKER_CLASS=gevent (with gevent installed) serves
+thousands of idle streams per worker instead.
+"""
+import os
+import glob
+import tempfile
+
+# Workers merge their /metrics through files in a shared directory
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'taskflux-metrics'))
+
+from config import Config  # noqa: E402
+
+bind = f"{Config.API_HOST}:{Config.API_PORT}"
+workers = Config.WEB_WORKERS
+worker_class = Config.WEB_WORKER_CLASS
+threads = Config.WEB_THREADS
+timeout = Config.WEB_TIMEOUT
+graceful_timeout = Config.WEB_GRACEFUL_TIMEOUT
+keepalive = 5
+max_requests = Config.WEB_MAX_REQUESTS
+max_requests_jitter = max_requests // 10
+preload_app = True
+# %(U)s is the path without the query string, which can carry a stream token (?jwt=)
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+
+
+def on_starting(server):
+    if workers > 1 and Config.CACHE_BACKEND == 'memory':
+        # invalidation would only reach the worker that handled the write
+        raise RuntimeError("CACHE_BACKEND=memory is per process; with WEB_WORKERS > 1 "
+                           "use CACHE_BACKEND=redis or none")
+    if workers > 1 and Config.PUBSUB_BACKEND == 'memory':
+        # a stream would miss every write handled by another worker
+        raise RuntimeError("PUBSUB_BACKEND=memory is per process; with WEB_WORKERS > 1 "
+                           "use PUBSUB_BACKEND=redis or none")
+    if workers > 1 and Config.get_replica_configs() and Config.CACHE_BACKEND != 'redis':
+        # a user pinned by the worker that took their write would read a lagging replica elsewhere
+        raise RuntimeError("Read-your-writes pins for DB_REPLICAS are per process unless "
+                           "CACHE_BACKEND=redis; set it when WEB_WORKERS > 1")
+    # counters from a previous run would otherwise be merged into this one
+    os.makedirs(Config.METRICS_DIR, exist_ok=True)
+    for path in glob.glob(os.path.join(Config.METRICS_DIR, 'metrics-*.json')):
+        os.remove(path)
+
+
+def post_fork(server, worker):
+    import wsgi
+    wsgi.post_fork()
+    server.log.info(f"Worker {worker.pid} initialised")
+
+
+def worker_exit(server, worker):
+    import wsgi
+    wsgi.shutdown()
+
+
+def child_exit(server, worker):
+    # runs in the master, also for workers that were killed before worker_exit
+    from utils import metrics
+    metrics.get_metrics().retire(worker.pid)
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for TaskFlux.
+
+Applied versions are recorded in the ``schema_migrations`` table, so booting
+the app only runs migrations that have not been applied yet. New schema
+changes must be appended to MIGRATIONS for every storage backend, using the
+same next version number; never edit a migration that has already shipped.
+
+Usage:
+    python migrations.py upgrade [--to VERSION]   apply pending migrations
+    python migrations.py status                   show applied/pending versions
+    python migrations.py check                    EXPLAIN every query shape
+"""
+
+import sys
+import logging
+import argparse
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+Migration = namedtuple("Migration", ["version", "description", "statements"])
+
+LOCK_NAME = "taskflux_schema_migrations"
+LOCK_TIMEOUT = 60  # seconds to wait for another process that is migrating
+
+VERSION_TABLE = {
+    "mysql": """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    "sqlite": """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+}
+
+
+def _stats_backfill(now):
+    """Counters of every existing user as of `now` (an SQL expression)"""
+    return f"""
+        INSERT INTO task_stats (user_id, pending, in_progress, completed, priority_low,
+                                priority_medium, priority_high, overdue, overdue_as_of,
+                                next_due, reconciled_at)
+        SELECT u.id,
+               COALESCE(SUM(CASE WHEN t.status = 'pending' THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN t.status = 'in_progress' THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN t.status = 'completed' THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN t.priority = 'low' THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN t.priority = 'medium' THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN t.priority = 'high' THEN 1 ELSE 0 END), 0),
+               COALESCE(SUM(CASE WHEN t.status <> 'completed' AND t.due_date <= {now} THEN 1 ELSE 0 END), 0),
+               {now},
+               MIN(CASE WHEN t.status <> 'completed' AND t.due_date > {now} THEN t.due_date END),
+               {now}
+        FROM users u LEFT JOIN tasks t ON t.user_id = u.id
+        GROUP BY u.id
+    """
+
+
+MYSQL_MIGRATIONS = [
+    Migration(1, "Create users and tasks tables", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            email VARCHAR(255) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_email (email),
+            INDEX idx_created_at (created_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            title VARCHAR(255) NOT NULL,
+            description TEXT,
+            status ENUM('pending', 'in_progress', 'completed') DEFAULT 'pending',
+            priority ENUM('low', 'medium', 'high') DEFAULT 'medium',
+            due_date DATETIME NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            INDEX idx_user_id (user_id),
+            INDEX idx_status (status),
+            INDEX idx_due_date (due_date)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """,
+    ]),
+    # list_tasks filters on user_id plus any combination of status/priority and
+    # pages on (created_at, id) DESC; one index per filter combination lets
+    # every variant be read straight from an index in order, with no filesort.
+    # The user_id-leading indexes also cover the foreign key, which makes
+    # idx_user_id redundant; idx_status alone is never used, and idx_email
+    # duplicates the UNIQUE key on email.
+    Migration(2, "Composite indexes for task listing", [
+        "ALTER TABLE tasks"
+        " ADD INDEX idx_user_created (user_id, created_at, id),"
+        " ADD INDEX idx_user_status_created (user_id, status, created_at, id),"
+        " ADD INDEX idx_user_priority_created (user_id, priority, created_at, id),"
+        " ADD INDEX idx_user_status_priority_created (user_id, status, priority, created_at, id)",
+        "ALTER TABLE tasks DROP INDEX idx_user_id, DROP INDEX idx_status",
+        "ALTER TABLE users DROP INDEX idx_email",
+    ]),
+    # ETags are derived from COUNT(*)/MAX(updated_at)/MAX(id) per user; the
+    # index answers that from the index alone, and microsecond timestamps
+    # keep two writes within the same second from producing the same tag.
+    Migration(3, "Microsecond updated_at and per-user change index", [
+        "ALTER TABLE tasks"
+        " MODIFY updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),"
+        " ADD INDEX idx_user_updated (user_id, updated_at)",
+        "ALTER TABLE users"
+        " MODIFY updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)",
+    ]),
+    # /api/tasks/search; InnoDB keeps the index current on every write
+    Migration(4, "Full-text index on task title and description", [
+        "ALTER TABLE tasks ADD FULLTEXT INDEX ft_tasks_text (title, description)",
+    ]),
+    # Counters behind /api/tasks/stats (modules/task_stats.py), backfilled for
+    # existing users; idx_user_due finds tasks that became overdue.
+    Migration(5, "Per-user task statistics", [
+        """
+        CREATE TABLE IF NOT EXISTS task_stats (
+            user_id INT PRIMARY KEY,
+            pending INT NOT NULL DEFAULT 0,
+            in_progress INT NOT NULL DEFAULT 0,
+            completed INT NOT NULL DEFAULT 0,
+            priority_low INT NOT NULL DEFAULT 0,
+            priority_medium INT NOT NULL DEFAULT 0,
+            priority_high INT NOT NULL DEFAULT 0,
+            overdue INT NOT NULL DEFAULT 0,
+            overdue_as_of DATETIME(6) NOT NULL,
+            next_due DATETIME NULL,
+            reconciled_at DATETIME(6) NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB
+        """,
+        "ALTER TABLE tasks ADD INDEX idx_user_due (user_id, due_date)",
+        _stats_backfill("NOW(6)"),
+    ]),
+    # When a task's due-date reminder was sent (modules/reminders.py); the
+    # scheduler claims a reminder by setting it.
+    Migration(6, "Task reminder state", [
+        "ALTER TABLE tasks ADD COLUMN reminded_at DATETIME NULL",
+    ]),
+    # Deleted task ids for /api/tasks/changes, read per user in
+    # (deleted_at, id) order like tasks are by idx_user_updated; rows older
+    # than SYNC_TOMBSTONE_DAYS are pruned through idx_deleted.
+    Migration(7, "Task tombstones for delta sync", [
+        """
+        CREATE TABLE IF NOT EXISTS task_tombstones (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            task_id INT NOT NULL,
+            user_id INT NOT NULL,
+            deleted_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+            INDEX idx_user_deleted (user_id, deleted_at),
+            INDEX idx_deleted (deleted_at),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB
+        """,
+    ]),
+]
+
+# sqlite timestamps are local-time ISO text, matching what MySQL returns;
+# triggers stand in for ON UPDATE CURRENT_TIMESTAMP and CHECK for ENUM
+_SQLITE_NOW = "(strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime'))"
+_SQLITE_NOW_MS = "(strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))"
+
+SQLITE_MIGRATIONS = [
+    Migration(1, "Create users and tasks tables", [
+        f"""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name VARCHAR(100) NOT NULL,
+            email VARCHAR(255) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            is_active BOOLEAN NOT NULL DEFAULT 1,
+            created_at TIMESTAMP NOT NULL DEFAULT {_SQLITE_NOW},
+            updated_at TIMESTAMP NOT NULL DEFAULT {_SQLITE_NOW_MS}
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_users_updated_at AFTER UPDATE ON users
+        FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+        BEGIN
+            UPDATE users SET updated_at = {_SQLITE_NOW_MS} WHERE id = NEW.id;
+        END
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            title VARCHAR(255) NOT NULL,
+            description TEXT,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending'
+                CHECK (status IN ('pending', 'in_progress', 'completed')),
+            priority VARCHAR(10) NOT NULL DEFAULT 'medium'
+                CHECK (priority IN ('low', 'medium', 'high')),
+            due_date DATETIME NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT {_SQLITE_NOW},
+            updated_at TIMESTAMP NOT NULL DEFAULT {_SQLITE_NOW_MS}
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_updated_at AFTER UPDATE ON tasks
+        FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+        BEGIN
+            UPDATE tasks SET updated_at = {_SQLITE_NOW_MS} WHERE id = NEW.id;
+        END
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_due_date ON tasks (due_date)",
+    ]),
+    Migration(2, "Composite indexes for task listing", [
+        "CREATE INDEX IF NOT EXISTS idx_user_created ON tasks (user_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_user_status_created ON tasks (user_id, status, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_user_priority_created ON tasks (user_id, priority, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_user_status_priority_created"
+        " ON tasks (user_id, status, priority, created_at, id)",
+    ]),
+    Migration(3, "Microsecond updated_at and per-user change index", [
+        "CREATE INDEX IF NOT EXISTS idx_user_updated ON tasks (user_id, updated_at)",
+    ]),
+    # External-content FTS5 table over tasks: the text lives only in tasks,
+    # triggers mirror every write into the index, and prefix indexes make
+    # 2- and 3-letter prefix queries index lookups. user_id is indexed too so
+    # searches intersect with the owner's postings instead of joining every
+    # match; its rank weight is 0, and titles count 10x descriptions.
+    Migration(4, "Full-text index on task title and description", [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, description, user_id,
+            content='tasks', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_fts_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (rowid, title, description, user_id)
+            VALUES (NEW.id, NEW.title, NEW.description, NEW.user_id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_fts_delete AFTER DELETE ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description, user_id)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.user_id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tasks_fts_update AFTER UPDATE OF title, description, user_id ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description, user_id)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.user_id);
+            INSERT INTO tasks_fts (rowid, title, description, user_id)
+            VALUES (NEW.id, NEW.title, NEW.description, NEW.user_id);
+        END
+        """,
+        "INSERT INTO tasks_fts (tasks_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0, 0.0)')",
+        "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')",
+    ]),
+    Migration(5, "Per-user task statistics", [
+        """
+        CREATE TABLE IF NOT EXISTS task_stats (
+            user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            pending INTEGER NOT NULL DEFAULT 0,
+            in_progress INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            priority_low INTEGER NOT NULL DEFAULT 0,
+            priority_medium INTEGER NOT NULL DEFAULT 0,
+            priority_high INTEGER NOT NULL DEFAULT 0,
+            overdue INTEGER NOT NULL DEFAULT 0,
+            overdue_as_of DATETIME NOT NULL,
+            next_due DATETIME NULL,
+            reconciled_at DATETIME NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_user_due ON tasks (user_id, due_date)",
+        _stats_backfill(_SQLITE_NOW_MS),
+    ]),
+    # Claiming a reminder is not a change to the task, so updated_at now only
+    # follows the columns clients see (MySQL: the claim assigns it to itself).
+    Migration(6, "Task reminder state", [
+        "ALTER TABLE tasks ADD COLUMN reminded_at DATETIME NULL",
+        "DROP TRIGGER IF EXISTS trg_tasks_updated_at",
+        f"""
+        CREATE TRIGGER trg_tasks_updated_at
+        AFTER UPDATE OF user_id, title, description, status, priority, due_date ON tasks
+        FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+        BEGIN
+            UPDATE tasks SET updated_at = {_SQLITE_NOW_MS} WHERE id = NEW.id;
+        END
+        """,
+    ]),
+    Migration(7, "Task tombstones for delta sync", [
+        f"""
+        CREATE TABLE IF NOT EXISTS task_tombstones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            deleted_at TIMESTAMP NOT NULL DEFAULT {_SQLITE_NOW_MS}
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_user_deleted ON task_tombstones (user_id, deleted_at)",
+        "CREATE INDEX IF NOT EXISTS idx_deleted ON task_tombstones (deleted_at)",
+    ]),
+]
+
+MIGRATIONS = {
+    "mysql": MYSQL_MIGRATIONS,
+    "sqlite": SQLITE_MIGRATIONS,
+}
+
+# Every query shape issued by routes/tasks.py, modules/task.py, modules/task_stats.py
+# and modules/user.py, with sample parameters; "{for_update}" stands for the
+# dialect's row-lock suffix. Keep this in sync when adding or changing queries there.
+QUERY_SHAPES = [
+    ("list_tasks",
+     "SELECT * FROM tasks WHERE user_id=%s"
+     " ORDER BY created_at DESC, id DESC LIMIT %s",
+     (1, 51)),
+    ("list_tasks status",
+     "SELECT * FROM tasks WHERE user_id=%s AND status=%s"
+     " ORDER BY created_at DESC, id DESC LIMIT %s",
+     (1, "pending", 51)),
+    ("list_tasks priority",
+     "SELECT * FROM tasks WHERE user_id=%s AND priority=%s"
+     " ORDER BY created_at DESC, id DESC LIMIT %s",
+     (1, "high", 51)),
+    ("list_tasks status+priority",
+     "SELECT * FROM tasks WHERE user_id=%s AND status=%s AND priority=%s"
+     " ORDER BY created_at DESC, id DESC LIMIT %s",
+     (1, "pending", "high", 51)),
+    ("list_tasks cursor",
+     "SELECT * FROM tasks WHERE user_id=%s"
+     " AND (created_at < %s OR (created_at = %s AND id < %s))"
+     " ORDER BY created_at DESC, id DESC LIMIT %s",
+     (1, "2030-01-01 00:00:00", "2030-01-01 00:00:00", 1000, 51)),
+    ("task list version",
+     "SELECT COUNT(*) AS total, MAX(updated_at) AS last_updated, MAX(id) AS last_id"
+     " FROM tasks WHERE user_id=%s",
+     (1,)),
+    ("update task",
+     "UPDATE tasks SET title=%s WHERE id=%s AND user_id=%s",
+     ("x", 1, 1)),
+    ("delete task",
+     "DELETE FROM tasks WHERE id=%s AND user_id=%s",
+     (1, 1)),
+    ("task state for update",
+     "SELECT id, status, priority, due_date FROM tasks WHERE user_id=%s AND id IN (%s){for_update}",
+     (1, 1)),
+    ("owned task states for update",
+     "SELECT id, status, priority, due_date FROM tasks WHERE user_id=%s AND id IN (%s, %s, %s){for_update}",
+     (1, 1, 2, 3)),
+    ("batch delete",
+     "DELETE FROM tasks WHERE user_id=%s AND id IN (%s, %s, %s)",
+     (1, 1, 2, 3)),
+    ("task stats for update",
+     "SELECT * FROM task_stats WHERE user_id=%s{for_update}",
+     (1,)),
+    ("task stats delta",
+     "UPDATE task_stats SET pending = pending + %s, priority_high = priority_high + %s,"
+     " overdue = overdue + (CASE WHEN %s <= overdue_as_of THEN %s ELSE 0 END),"
+     " next_due = CASE WHEN next_due IS NULL OR %s < next_due THEN %s ELSE next_due END"
+     " WHERE user_id=%s",
+     (1, 1, "2030-01-01 00:00:00", 1, "2030-01-01 00:00:00", "2030-01-01 00:00:00", 1)),
+    ("task stats",
+     "SELECT * FROM task_stats WHERE user_id=%s",
+     (1,)),
+    ("task stats overdue catch-up",
+     "SELECT COUNT(*) AS n FROM tasks WHERE user_id=%s AND due_date > %s AND due_date <= %s"
+     " AND status <> 'completed'",
+     (1, "2030-01-01 00:00:00", "2030-01-02 00:00:00")),
+    ("task stats next due",
+     "SELECT MIN(due_date) AS next_due FROM tasks WHERE user_id=%s AND due_date > %s"
+     " AND status <> 'completed'",
+     (1, "2030-01-01 00:00:00")),
+    ("task changes",
+     "SELECT id, title, updated_at FROM tasks WHERE user_id=%s AND updated_at >= %s"
+     " AND (updated_at > %s OR id > %s) AND updated_at <= %s ORDER BY updated_at, id LIMIT %s",
+     (1, "2030-01-01 00:00:00", "2030-01-01 00:00:00", 1, "2030-01-02 00:00:00", 501)),
+    ("task tombstones",
+     "SELECT id, task_id, deleted_at FROM task_tombstones WHERE user_id=%s AND deleted_at >= %s"
+     " AND (deleted_at > %s OR id > %s) AND deleted_at <= %s ORDER BY deleted_at, id LIMIT %s",
+     (1, "2030-01-01 00:00:00", "2030-01-01 00:00:00", 1, "2030-01-02 00:00:00", 501)),
+    ("reminder window",
+     "SELECT id, due_date FROM tasks WHERE due_date >= %s AND due_date <= %s"
+     " AND status <> 'completed' AND reminded_at IS NULL"
+     " ORDER BY due_date, id LIMIT %s",
+     ("2030-01-01 00:00:00", "2030-01-01 00:15:00", 10000)),
+    ("user by email",
+     "SELECT * FROM users WHERE email = %s AND is_active = TRUE",
+     ("someone@example.com",)),
+    ("user by id",
+     "SELECT * FROM users WHERE id = %s AND is_active = TRUE",
+     (1,)),
+]
+
+
+# Task search, per dialect (modules/task.py). Ranking sorts the matches by
+# relevance, so only full scans are checked for these; the sort is bounded
+# by the rank window.
+SEARCH_QUERY_SHAPES = {
+    "mysql": [
+        ("search tasks",
+         "SELECT id, title, MATCH(title, description) AGAINST (%s IN BOOLEAN MODE) AS score"
+         " FROM tasks WHERE user_id=%s AND MATCH(title, description) AGAINST (%s IN BOOLEAN MODE)"
+         " AND id >= %s ORDER BY score DESC, id DESC LIMIT %s OFFSET %s",
+         ("+rep*", 1, "+rep*", 1, 20, 0)),
+    ],
+    "sqlite": [
+        ("search tasks",
+         "SELECT tasks.id, tasks.title FROM tasks_fts JOIN tasks ON tasks.id = tasks_fts.rowid"
+         " WHERE tasks_fts MATCH %s AND tasks_fts.rowid >= %s ORDER BY tasks_fts.rank LIMIT %s OFFSET %s",
+         ('user_id : "1" AND {title description} : ("rep"*)', 1, 20, 0)),
+    ],
+}
+
+
+def _applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _lock(connection, cursor, dialect):
+    """Serialize concurrent boots so only one process runs the DDL"""
+    if dialect == "sqlite":
+        # DDL is transactional in sqlite; holding the write lock is enough
+        connection.start_transaction()
+        return
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        raise RuntimeError("Timed out waiting for the schema migration lock")
+
+
+def _unlock(connection, cursor, dialect, ok):
+    if dialect == "sqlite":
+        if ok:
+            connection.commit()
+        else:
+            connection.rollback()
+        return
+    cursor.execute("DO RELEASE_LOCK(%s)", (LOCK_NAME,))
+
+
+def is_current(db):
+    """One cheap read: True when every migration is already applied.
+
+    Lets boots skip the lock and the DDL entirely once the schema is up to date.
+    """
+    with db.connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in cursor.fetchall()}
+        except db.error_class:
+            # no version table yet
+            return False
+        finally:
+            cursor.close()
+    return all(m.version in applied for m in MIGRATIONS[db.dialect])
+
+
+def migrate(db, target=None):
+    """Apply pending migrations up to `target` (default: latest); returns versions applied"""
+    if target is None and is_current(db):
+        logger.info("Schema is up to date")
+        return []
+
+    applied_now = []
+    with db.connection() as connection:
+        cursor = connection.cursor()
+        try:
+            _lock(connection, cursor, db.dialect)
+            ok = False
+            try:
+                cursor.execute(VERSION_TABLE[db.dialect])
+                applied = _applied_versions(cursor)
+
+                for migration in MIGRATIONS[db.dialect]:
+                    if migration.version in applied:
+                        continue
+                    if target is not None and migration.version > target:
+                        break
+
+                    logger.info(f"Applying migration {migration.version}: {migration.description}")
+                    for statement in migration.statements:
+                        cursor.execute(statement)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                        (migration.version, migration.description)
+                    )
+                    applied_now.append(migration.version)
+                ok = True
+            finally:
+                _unlock(connection, cursor, db.dialect, ok)
+        finally:
+            cursor.close()
+
+    if applied_now:
+        logger.info(f"Schema migrated to version {applied_now[-1]}")
+    else:
+        logger.info("Schema is up to date")
+    return applied_now
+
+
+def status(db):
+    """Return (applied, pending) migration lists"""
+    db.execute_query(VERSION_TABLE[db.dialect])
+    rows = db.execute_query("SELECT version FROM schema_migrations", fetch=True)
+    applied = {row["version"] for row in rows}
+    done = [m for m in MIGRATIONS[db.dialect] if m.version in applied]
+    pending = [m for m in MIGRATIONS[db.dialect] if m.version not in applied]
+    return done, pending
+
+
+def _explain(db, query, params):
+    """All plan rows; execute_query only fetches one row for non-SELECT statements"""
+    with db.connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+
+def _plan_problems(db, query, params, allow_sort=False):
+    if db.dialect == "sqlite":
+        for row in _explain(db, f"EXPLAIN QUERY PLAN {query}", params):
+            detail = row["detail"]
+            # a virtual table scan is an FTS5 index lookup
+            if detail.startswith("SCAN") and "VIRTUAL TABLE INDEX" not in detail:
+                yield f"full scan: {detail}"
+            if "TEMP B-TREE" in detail and not allow_sort:
+                yield f"sort: {detail}"
+        return
+
+    for row in _explain(db, f"EXPLAIN {query}", params):
+        access = row.get("type")
+        extra = row.get("Extra") or ""
+        if isinstance(extra, (bytes, bytearray)):
+            extra = extra.decode()
+        if access == "ALL":
+            yield f"full table scan on {row.get('table')}"
+        if "Using filesort" in extra and not allow_sort:
+            yield f"filesort on {row.get('table')}"
+
+
+def check_query_plans(db):
+    """EXPLAIN every query shape; returns a list of (name, problem) for bad plans"""
+    problems = []
+    for name, query, params in QUERY_SHAPES:
+        query = query.replace("{for_update}", db.for_update)
+        for problem in _plan_problems(db, query, params):
+            problems.append((name, problem))
+    for name, query, params in SEARCH_QUERY_SHAPES.get(db.dialect, []):
+        for problem in _plan_problems(db, query, params, allow_sort=True):
+            problems.append((name, problem))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TaskFlux schema migrations")
+    sub = parser.add_subparsers(dest="command", required=True)
+    upgrade = sub.add_parser("upgrade", help="apply pending migrations")
+    upgrade.add_argument("--to", type=int, default=None, help="stop at this version")
+    sub.add_parser("status", help="show applied and pending migrations")
+    sub.add_parser("check", help="fail if any query shape does a full scan or filesort")
+    args = parser.parse_args(argv)
+
+    from utils.log import configure_logging
+    configure_logging()
+    from database import db
+
+    if args.command == "upgrade":
+        applied = migrate(db, target=args.to)
+        print(f"Applied {len(applied)} migration(s)")
+        return 0
+
+    if args.command == "status":
+        done, pending = status(db)
+        for m in done:
+            print(f"  [x] {m.version:03d} {m.description}")
+        for m in pending:
+            print(f"  [ ] {m.version:03d} {m.description}")
+        return 0
+
+    problems = check_query_plans(db)
+    for name, problem in problems:
+        print(f"FAIL {name}: {problem}")
+    if problems:
+        return 1
+    checked = len(QUERY_SHAPES) + len(SEARCH_QUERY_SHAPES.get(db.dialect, []))
+    print(f"OK: {checked} query shapes use indexes without filesort")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""Due-date reminders: fire an event when an open task reaches its due date.
+
+The scheduler keeps only the tasks whose reminder falls inside a lookahead
+window (REMINDER_LOOKAHEAD seconds, at most REMINDER_MAX_PENDING of them),
+loaded with a range scan on idx_due_date, in a heap ordered by fire time.
+The window is rescanned every REMINDER_RESCAN seconds, which picks up
+changes made by other processes; writes made through modules/task.py in this
+process reschedule immediately through notify().
+
+Every worker may run a scheduler. A reminder is claimed by setting
+tasks.reminded_at with a conditional UPDATE that also checks the task is
+still open and still due at that time, so it is sent once, by one process,
+and never for a task completed or rescheduled in the meantime. Changing a
+task's due date clears reminded_at.
+
+Sinks receive each reminder as a dict: task_id, user_id, title, due_date.
+REMINDER_SINK picks one: log (default), file (NDJSON lines appended to
+REMINDER_FILE), queue (in process), or "package.module:factory".
+"""
+import heapq
+import queue
+import logging
+import datetime
+import importlib
+import threading
+from database import get_db_connection
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_NO_ID = float("inf")  # horizon id when the whole window is loaded
+
+
+class LogSink:
+    """Writes each reminder to the application log"""
+
+    def emit(self, reminder):
+        logger.info("Reminder: task %s (%s) for user %s is due at %s", reminder["task_id"],
+                    reminder["title"], reminder["user_id"], reminder["due_date"])
+
+
+class FileSink:
+    """Appends each reminder to a file as one JSON line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, reminder):
+        from utils.json_provider import dumps
+        line = dumps(reminder) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+class QueueSink:
+    """Puts each reminder on a queue.Queue for an in-process consumer"""
+
+    def __init__(self, maxsize=0):
+        self.queue = queue.Queue(maxsize)
+
+    def emit(self, reminder):
+        try:
+            self.queue.put_nowait(reminder)
+        except queue.Full:
+            logger.warning("Reminder queue is full; dropped reminder for task %s", reminder["task_id"])
+
+
+def make_sink(spec):
+    """Sink for a REMINDER_SINK value"""
+    if spec == "log":
+        return LogSink()
+    if spec == "file":
+        return FileSink(Config.REMINDER_FILE)
+    if spec == "queue":
+        return QueueSink()
+    module, _, factory = spec.partition(":")
+    if not factory:
+        raise ValueError(f"Unknown REMINDER_SINK {spec!r}: use log, file, queue or module:factory")
+    return getattr(importlib.import_module(module), factory)()
+
+
+class ReminderScheduler:
+    """Holds the reminders of the lookahead window and fires them on time.
+
+    tick() does one round of work (rescan when due, fire what is due) and
+    returns when it next needs to run; start() runs it on a daemon thread.
+    """
+
+    def __init__(self, sink, lead=0, lookahead=900, rescan=60, grace=3600, max_pending=10000,
+                 clock=datetime.datetime.now):
+        self.sink = sink
+        self.lead = datetime.timedelta(seconds=lead)
+        self.lookahead = datetime.timedelta(seconds=lookahead)
+        self.rescan = datetime.timedelta(seconds=rescan)
+        self.grace = datetime.timedelta(seconds=grace)
+        self.max_pending = max_pending
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._heap = []         # (fire_at, task_id, due_date); superseded entries are skipped
+        self._scheduled = {}    # task_id -> due_date of its live heap entry
+        self._floor = None      # due dates before this are no longer reminded
+        self._horizon = None    # (due_date, id) of the last task the window covers
+        self._next_scan = None
+        self._replay = None     # changes notified while a rescan is reading
+        self._stop = threading.Event()
+        self._thread = None
+        self.fired = 0
+
+    def __len__(self):
+        return len(self._scheduled)
+
+    # ---- task changes ----
+
+    def task_changed(self, task_id, status, due_date):
+        """Reschedule a task after a write; `status` None means it was deleted"""
+        with self._cond:
+            if self._replay is not None:
+                self._replay.append((task_id, status, due_date))
+            self._apply(task_id, status, due_date)
+
+    def _apply(self, task_id, status, due_date):
+        if (status is None or status == "completed" or due_date is None or self._horizon is None
+                or due_date < self._floor or (due_date, task_id) > self._horizon):
+            # out of the window; a later rescan loads it if it moves into it
+            self._scheduled.pop(task_id, None)
+            return
+        if self._scheduled.get(task_id) == due_date:
+            return
+        self._scheduled[task_id] = due_date
+        fire_at = due_date - self.lead
+        heapq.heappush(self._heap, (fire_at, task_id, due_date))
+        if self._heap[0][1] == task_id:
+            self._cond.notify()  # earlier than what the thread is waiting for
+        if len(self._heap) > 2 * len(self._scheduled) + 64:
+            self._heap = [entry for entry in self._heap if self._scheduled.get(entry[1]) == entry[2]]
+            heapq.heapify(self._heap)
+
+    # ---- scanning and firing ----
+
+    def _load(self, floor, until):
+        """Open, unreminded tasks due in [floor, until], in (due_date, id) order, capped"""
+        return get_db_connection().execute_query(
+            "SELECT id, due_date FROM tasks WHERE due_date >= %s AND due_date <= %s"
+            " AND status <> 'completed' AND reminded_at IS NULL"
+            " ORDER BY due_date, id LIMIT %s",
+            (floor, until, self.max_pending), fetch=True)
+
+    def _rescan(self, now):
+        floor = now + self.lead - self.grace
+        until = now + self.lead + self.lookahead
+        with self._cond:
+            self._replay = []
+        try:
+            rows = self._load(floor, until)
+        except Exception:
+            with self._cond:
+                self._replay = None
+            raise
+        if len(rows) >= self.max_pending:
+            # capped: the window ends at the last task loaded and is rescanned before it fires
+            horizon = (rows[-1]["due_date"], rows[-1]["id"])
+        else:
+            horizon = (until, _NO_ID)
+        with self._cond:
+            self._floor, self._horizon = floor, horizon
+            self._scheduled = {row["id"]: row["due_date"] for row in rows}
+            self._heap = [(due - self.lead, task_id, due) for task_id, due in self._scheduled.items()]
+            heapq.heapify(self._heap)
+            for change in self._replay:
+                self._apply(*change)
+            self._replay = None
+            self._next_scan = min(now + self.rescan, horizon[0] - self.lead)
+        logger.debug("Reminder window rescanned: %s task(s) due by %s", len(rows), horizon[0])
+
+    def _pop_due(self, now):
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                _, task_id, due_date = heapq.heappop(self._heap)
+                if self._scheduled.get(task_id) == due_date:
+                    del self._scheduled[task_id]
+                    due.append((task_id, due_date))
+        return due
+
+    def _claim(self, due, now):
+        """Mark reminders as sent; returns the rows of the ones this process won"""
+        db = get_db_connection()
+        claimed = []
+        with db.transaction() as cur:
+            for task_id, due_date in due:
+                # updated_at = updated_at: the claim is not a change clients need to see
+                cur.execute(
+                    "UPDATE tasks SET reminded_at=%s, updated_at=updated_at"
+                    " WHERE id=%s AND due_date=%s AND status <> 'completed' AND reminded_at IS NULL",
+                    (now, task_id, due_date))
+                if cur.rowcount:
+                    claimed.append(task_id)
+            if not claimed:
+                return []
+            cur.execute(
+                f"SELECT id, user_id, title, due_date FROM tasks"
+                f" WHERE id IN ({', '.join(['%s'] * len(claimed))}) ORDER BY due_date, id",
+                tuple(claimed))
+            return cur.fetchall()
+
+    def tick(self, now=None):
+        """Rescan if due and fire every reminder due by `now`; returns the next time to run"""
+        now = now or self._clock()
+        if self._next_scan is None or now >= self._next_scan:
+            self._rescan(now)
+        due = self._pop_due(now)
+        if due:
+            for row in self._claim(due, now):
+                reminder = {"task_id": row["id"], "user_id": row["user_id"],
+                            "title": row["title"], "due_date": row["due_date"]}
+                try:
+                    self.sink.emit(reminder)
+                except Exception:
+                    logger.exception("Reminder sink failed for task %s", row["id"])
+                self.fired += 1
+        with self._cond:
+            return min(self._heap[0][0], self._next_scan) if self._heap else self._next_scan
+
+    # ---- background thread ----
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='reminders', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                wake = self.tick()
+            except Exception:
+                logger.exception("Reminder scheduling failed")
+                wake = self._clock() + self.rescan
+                self._next_scan = None
+            with self._cond:
+                if not self._stop.is_set():
+                    self._cond.wait(max(0.0, (wake - self._clock()).total_seconds()))
+
+    def stats(self):
+        with self._cond:
+            return {"pending": len(self._scheduled), "fired": self.fired}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide scheduler (not started), or None when REMINDERS_ENABLED is off"""
+    global _scheduler
+    if _scheduler is None and Config.REMINDERS_ENABLED:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = ReminderScheduler(
+                    make_sink(Config.REMINDER_SINK), lead=Config.REMINDER_LEAD,
+                    lookahead=Config.REMINDER_LOOKAHEAD, rescan=Config.REMINDER_RESCAN,
+                    grace=Config.REMINDER_GRACE, max_pending=Config.REMINDER_MAX_PENDING)
+    return _scheduler
+
+
+def notify(changes):
+    """Tell this process's scheduler, if any, about written tasks: (task_id, status, due_date),
+    status None for a deleted task"""
+    scheduler = _scheduler
+    if scheduler is not None:
+        for task_id, status, due_date in changes:
+            scheduler.task_changed(task_id, status, due_date)
+
+
+def reset_after_fork():
+    """The scheduler thread does not survive fork; the child starts its own"""
+    global _scheduler
+    _scheduler = None
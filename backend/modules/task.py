@@ -0,0 +1,340 @@
+from database import get_db_connection
+from modules.task_stats import TaskStats, STATE_FIELDS, state
+from modules import reminders
+from utils.replicas import primary_reads
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Columns a client may request through ?fields=
+TASK_FIELDS = ("id", "user_id", "title", "description", "status", "priority",
+               "due_date", "created_at", "updated_at")
+INSERT_CHUNK_SIZE = 500  # rows per multi-row INSERT statement
+SEARCH_MAX_TERMS = 8  # words of a search query that are used
+
+def _placeholders(n):
+    return ", ".join(["%s"] * n)
+
+def _set_clause(columns):
+    """SET list for changed columns; a new due date also re-arms its reminder"""
+    fields = [f"{c}=%s" for c in columns]
+    if "due_date" in columns:
+        fields.append("reminded_at=NULL")
+    return ", ".join(fields)
+
+def _after(db, column, position):
+    """Keyset condition for rows strictly after (timestamp, id) in (column, id) order"""
+    if position is None:
+        return "", ()
+    key, row_id = db.timestamp_key(position[0]), position[1]
+    return f" AND {column} >= %s AND ({column} > %s OR id > %s)", (key, key, row_id)
+
+def _filters(status, priority):
+    """Optional status/priority conditions shared by list and export"""
+    sql, params = "", []
+    if status:
+        sql += " AND status=%s"
+        params.append(status)
+    if priority:
+        sql += " AND priority=%s"
+        params.append(priority)
+    return sql, params
+
+def search_terms(text):
+    """Words of a search query, without any operator characters"""
+    return re.findall(r"\w+", text or "")[:SEARCH_MAX_TERMS]
+
+# Full-text search is the one place the dialects differ: MySQL uses the
+# FULLTEXT index ft_tasks_text, SQLite the FTS5 table tasks_fts that triggers
+# keep in sync with tasks (see migration 4). Every term must match; the last
+# one also as a prefix, for search-as-you-type. Earlier words are taken as
+# typed: prefix terms cost a merge of every matching word's postings.
+
+def _prefix_last(terms, exact, prefix):
+    return [exact.format(term) for term in terms[:-1]] + [prefix.format(terms[-1])]
+
+def _mysql_search(columns, user_id, terms, filters, filter_params):
+    match = "MATCH(title, description) AGAINST (%s IN BOOLEAN MODE)"
+    expr = " ".join(_prefix_last(terms, "+{}", "+{}*"))
+    where = f"user_id=%s AND {match}{filters}"
+    boundary = (f"SELECT id FROM tasks WHERE {where} ORDER BY id DESC LIMIT 2 OFFSET %s",
+                (user_id, expr, *filter_params))
+    ranked = (f"SELECT {', '.join(columns)}, {match} AS score FROM tasks WHERE {where}",
+              (expr, user_id, expr, *filter_params))
+    return boundary, ranked, ("id", "ORDER BY score DESC, id DESC")
+
+def _sqlite_search(columns, user_id, terms, filters, filter_params):
+    # user_id is an indexed FTS column, so the owner filter is a posting-list
+    # intersection inside the index rather than a join over every match
+    expr = (f'user_id : "{int(user_id)}" AND {{title description}} : ('
+            + " AND ".join(_prefix_last(terms, '"{}"', '"{}"*')) + ")")
+    joined = "FROM tasks_fts JOIN tasks ON tasks.id = tasks_fts.rowid WHERE tasks_fts MATCH %s"
+    # status/priority live in tasks; without them the index alone answers this
+    source = joined if filters else "FROM tasks_fts WHERE tasks_fts MATCH %s"
+    boundary = (f"SELECT tasks_fts.rowid AS id {source}{filters}"
+                " ORDER BY tasks_fts.rowid DESC LIMIT 2 OFFSET %s",
+                (expr, *filter_params))
+    ranked = (f"SELECT {', '.join(f'tasks.{c}' for c in columns)} {joined}{filters}",
+              (expr, *filter_params))
+    return boundary, ranked, ("tasks_fts.rowid", "ORDER BY tasks_fts.rank")
+
+_SEARCH = {"mysql": _mysql_search, "sqlite": _sqlite_search}
+
+class Task:
+    """Task storage; every statement goes through the configured Database backend.
+
+    The SQL here is the portable subset understood by both MySQL and SQLite,
+    so routes never build queries themselves. Full-text search is the
+    exception and is built per dialect.
+    """
+
+    @staticmethod
+    def create(user_id, values):
+        """Insert one task; returns {"id", "created_at", "updated_at"}.
+
+        The timestamps come from the column defaults, so they are on the
+        database clock like those of every other write path (batch, import,
+        update), and are read back on the same connection.
+        """
+        db = get_db_connection()
+        q = """INSERT INTO tasks (user_id, title, description, status, priority, due_date)
+               VALUES (%s, %s, %s, %s, %s, %s)"""
+        params = (user_id, values["title"], values["description"], values["status"],
+                  values["priority"], values["due_date"])
+        with db.transaction() as cur:
+            cur.execute(q, params)
+            task_id = cur.lastrowid
+            cur.execute("SELECT id, created_at, updated_at FROM tasks WHERE id=%s", (task_id,))
+            row = cur.fetchone()
+            TaskStats.apply(cur, user_id, added=[state(values)])
+        status, _, due_date = state(values)
+        reminders.notify([(task_id, status, due_date)])
+        return row
+
+    @staticmethod
+    def version(user_id):
+        """Row count and newest change for the user, answered from idx_user_updated"""
+        db = get_db_connection()
+        return db.execute_query(
+            "SELECT COUNT(*) AS total, MAX(updated_at) AS last_updated, MAX(id) AS last_id"
+            " FROM tasks WHERE user_id=%s",
+            (user_id,), fetch=True
+        )[0]
+
+    @staticmethod
+    def list_page(user_id, columns, status=None, priority=None, after=None, limit=50,
+                  as_tuples=False):
+        """Up to `limit` tasks newest first, starting after the (created_at, id) key `after`.
+
+        Rows are dicts, or tuples in `columns` order when `as_tuples` is set.
+        """
+        q = f"SELECT {', '.join(columns)} FROM tasks WHERE user_id=%s"
+        params = [user_id]
+        sql, extra = _filters(status, priority)
+        q += sql
+        params.extend(extra)
+        if after:
+            after_created, after_id = after
+            q += " AND (created_at < %s OR (created_at = %s AND id < %s))"
+            params.extend([after_created, after_created, after_id])
+        q += " ORDER BY created_at DESC, id DESC LIMIT %s"
+        params.append(limit)
+        return get_db_connection().execute_query(q, tuple(params), fetch=True,
+                                                 dictionary=not as_tuples)
+
+    @staticmethod
+    def search(user_id, columns, terms, status=None, priority=None, limit=20, offset=0,
+               rank_window=5000):
+        """Tasks whose title or description contain every term (the last one
+        as a word prefix), best match first; returns (rows, whether more matches exist than were ranked).
+
+        Scoring every match is what makes broad queries slow, so only the
+        newest `rank_window` matches are ranked; a query that matches more
+        than that should be narrowed.
+        """
+        db = get_db_connection()
+        filters, filter_params = _filters(status, priority)
+        (boundary_q, boundary_params), (q, params), (id_column, order) = _SEARCH[db.dialect](
+            columns, user_id, terms, filters, filter_params)
+
+        # id of the rank_window-th newest match; two rows means there are more
+        newest = db.execute_query(boundary_q, (*boundary_params, rank_window - 1), fetch=True)
+        truncated = len(newest) > 1
+        if newest:
+            q += f" AND {id_column} >= %s"
+            params += (newest[0]["id"],)
+        q += f" {order} LIMIT %s OFFSET %s"
+        rows = db.execute_query(q, (*params, limit, offset), fetch=True)
+        for row in rows:
+            row.pop("score", None)
+        return rows, truncated
+
+    @staticmethod
+    def update(user_id, task_id, changes):
+        """Apply column changes to one of the user's tasks; False if it does not exist"""
+        params = [*changes.values(), task_id, user_id]
+        db = get_db_connection()
+        q = f"UPDATE tasks SET {_set_clause(changes)} WHERE id=%s AND user_id=%s"
+        if not any(key in STATE_FIELDS for key in changes):
+            # title/description only: the counters are unaffected
+            return bool(db.execute_write(q, tuple(params)).rowcount)
+
+        with db.transaction() as cur:
+            before = Task._states(cur, db, user_id, [task_id]).get(task_id)
+            if before is None:
+                return False
+            cur.execute(q, tuple(params))
+            after = state({**dict(zip(STATE_FIELDS, before)), **changes})
+            if after != before:
+                TaskStats.apply(cur, user_id, removed=[before], added=[after])
+        if after != before:
+            reminders.notify([(task_id, after[0], after[2])])
+        return True
+
+    @staticmethod
+    def delete(user_id, task_id):
+        """Delete one of the user's tasks; False if it does not exist"""
+        db = get_db_connection()
+        with db.transaction() as cur:
+            before = Task._states(cur, db, user_id, [task_id]).get(task_id)
+            if before is None:
+                return False
+            cur.execute("DELETE FROM tasks WHERE id=%s AND user_id=%s", (task_id, user_id))
+            cur.execute("INSERT INTO task_tombstones (task_id, user_id) VALUES (%s, %s)",
+                        (task_id, user_id))
+            TaskStats.apply(cur, user_id, removed=[before])
+        reminders.notify([(task_id, None, None)])
+        return True
+
+    @staticmethod
+    def changes(user_id, columns, after, deleted_after, until, limit):
+        """Tasks written and tombstones of tasks deleted after the (timestamp, id)
+        positions `after` and `deleted_after`, up to `until`; at most `limit` of each.
+
+        Both are range scans in position order (idx_user_updated,
+        idx_user_deleted), so only the rows returned are read. A position of
+        None starts from the beginning. Read from the primary: a lagging
+        replica would let the token move past writes it has not applied yet.
+        """
+        db = get_db_connection()
+        with primary_reads():
+            cond, params = _after(db, "updated_at", after)
+            rows = db.execute_query(
+                f"SELECT {', '.join(columns)} FROM tasks WHERE user_id=%s{cond}"
+                " AND updated_at <= %s ORDER BY updated_at, id LIMIT %s",
+                (user_id, *params, until, limit), fetch=True)
+            cond, params = _after(db, "deleted_at", deleted_after)
+            tombstones = db.execute_query(
+                f"SELECT id, task_id, deleted_at FROM task_tombstones WHERE user_id=%s{cond}"
+                " AND deleted_at <= %s ORDER BY deleted_at, id LIMIT %s",
+                (user_id, *params, until, limit), fetch=True)
+        return rows, tombstones
+
+    @staticmethod
+    def prune_tombstones(before, batch_size=1000):
+        """Delete tombstones older than `before` in batches; returns how many"""
+        db = get_db_connection()
+        pruned = 0
+        while True:
+            # the derived table lets MySQL take a LIMIT inside IN (...)
+            res = db.execute_write(
+                "DELETE FROM task_tombstones WHERE id IN (SELECT id FROM ("
+                "SELECT id FROM task_tombstones WHERE deleted_at < %s ORDER BY deleted_at LIMIT %s"
+                ") AS expired)",
+                (before, batch_size))
+            pruned += res.rowcount
+            if res.rowcount < batch_size:
+                return pruned
+
+    @staticmethod
+    def stream(user_id, columns, status=None, priority=None, batch_size=1000):
+        """Generator of row batches covering all of the user's tasks, newest first"""
+        q = f"SELECT {', '.join(columns)} FROM tasks WHERE user_id=%s"
+        sql, params = _filters(status, priority)
+        q += sql + " ORDER BY created_at DESC, id DESC"
+        return get_db_connection().stream_query(q, (user_id, *params), batch_size)
+
+    # ---- statements run on a cursor inside Database.transaction() ----
+
+    @staticmethod
+    def _states(cur, db, user_id, task_ids):
+        """{id: (status, priority, due_date)} of those of `task_ids` the user owns, row-locked"""
+        if not task_ids:
+            return {}
+        cur.execute(
+            f"SELECT id, {', '.join(STATE_FIELDS)} FROM tasks"
+            f" WHERE user_id=%s AND id IN ({_placeholders(len(task_ids))}){db.for_update}",
+            (user_id, *task_ids)
+        )
+        return {row["id"]: state(row) for row in cur.fetchall()}
+
+    @staticmethod
+    def owned(cur, user_id, task_ids):
+        """{id: (status, priority, due_date)} for the subset of `task_ids` that belong to the user.
+
+        Pass the result to update_many/delete_many, which keep it current.
+        """
+        return Task._states(cur, get_db_connection(), user_id, task_ids)
+
+    @staticmethod
+    def insert_many(cur, user_id, rows):
+        """Insert validated task values with multi-row INSERTs.
+
+        Returns (new ids in order, reminder changes); pass the changes to reminders.notify
+        once the caller's transaction has committed.
+        """
+        db = get_db_connection()
+        cols = ("user_id", "title", "description", "status", "priority", "due_date")
+        row_sql = f"({_placeholders(len(cols))})"
+        new_ids = []
+        for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+            chunk = rows[start:start + INSERT_CHUNK_SIZE]
+            params = []
+            for values in chunk:
+                params.extend([user_id, values["title"], values["description"],
+                               values["status"], values["priority"], values["due_date"]])
+            cur.execute(
+                f"INSERT INTO tasks ({', '.join(cols)}) VALUES {', '.join([row_sql] * len(chunk))}",
+                tuple(params)
+            )
+            new_ids.extend(db.insert_ids(cur, len(chunk)))
+        added = [state(values) for values in rows]
+        TaskStats.apply(cur, user_id, added=added)
+        return new_ids, [(task_id, status, due_date)
+                         for task_id, (status, _, due_date) in zip(new_ids, added)]
+
+    @staticmethod
+    def update_many(cur, user_id, columns, items, owned):
+        """One executemany for (task_id, changes) pairs that change the same columns;
+        returns the reminder changes to notify after commit"""
+        cur.executemany(
+            f"UPDATE tasks SET {_set_clause(columns)} WHERE id=%s AND user_id=%s",
+            [(*changes.values(), task_id, user_id) for task_id, changes in items]
+        )
+        removed, added, changed = [], [], []
+        for task_id, changes in items:
+            before = owned[task_id]
+            owned[task_id] = state({**dict(zip(STATE_FIELDS, before)), **changes})
+            if owned[task_id] != before:
+                removed.append(before)
+                added.append(owned[task_id])
+                changed.append((task_id, owned[task_id][0], owned[task_id][2]))
+        TaskStats.apply(cur, user_id, removed, added)
+        return changed
+
+    @staticmethod
+    def delete_many(cur, user_id, task_ids, owned):
+        """A single DELETE ... WHERE id IN (...); returns the reminder changes to notify after commit"""
+        if task_ids:
+            cur.execute(
+                f"DELETE FROM tasks WHERE user_id=%s AND id IN ({_placeholders(len(task_ids))})",
+                (user_id, *task_ids)
+            )
+            cur.execute(
+                "INSERT INTO task_tombstones (task_id, user_id) VALUES "
+                + ", ".join(["(%s, %s)"] * len(task_ids)),
+                tuple(param for task_id in task_ids for param in (task_id, user_id))
+            )
+            TaskStats.apply(cur, user_id, removed=[owned.pop(task_id) for task_id in task_ids])
+        return [(task_id, None, None) for task_id in task_ids]
@@ -0,0 +1,323 @@
+"""Per-user task counters behind GET /api/tasks/stats.
+
+task_stats holds one row per user with task counts by status and priority
+and the number of overdue tasks (not completed, due_date passed). Every
+write path in modules/task.py adjusts the row in the same transaction as the
+task change, so reading stats is a single primary-key lookup however many
+tasks the user has.
+
+Overdue counts depend on the clock as well as on writes. The row counts
+open tasks due at or before `overdue_as_of`, and `next_due` is a lower bound
+on the earliest open due date after it. A read only has to catch up when the
+clock has passed `next_due`, and then only counts the tasks that became
+overdue in between (idx_user_due).
+
+Counters can still drift (a write made outside this module, a row built
+while tasks were being written), so reconcile()/reconcile_all() recompute
+them from the tasks table; the Reconciler runs that periodically.
+
+    python -m modules.task_stats reconcile [--user ID]
+"""
+import sys
+import time
+import logging
+import argparse
+import datetime
+import threading
+from collections import Counter
+from database import get_db_connection, is_duplicate_entry
+from utils.replicas import primary_reads
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+STATUS_COLUMNS = {"pending": "pending", "in_progress": "in_progress", "completed": "completed"}
+PRIORITY_COLUMNS = {"low": "priority_low", "medium": "priority_medium", "high": "priority_high"}
+COUNT_COLUMNS = (*STATUS_COLUMNS.values(), *PRIORITY_COLUMNS.values(), "overdue")
+STATE_FIELDS = ("status", "priority", "due_date")  # task columns the counters depend on
+RECONCILE_LOCK = "taskflux_stats_reconcile"
+
+
+def state(values):
+    """The (status, priority, due_date) of a task row or create payload"""
+    return (values.get("status") or "pending", values.get("priority") or "medium",
+            values.get("due_date"))
+
+
+def _is_open(status):
+    return status != "completed"
+
+
+class TaskStats:
+    """Reads, incremental updates and reconciliation of the task_stats rows"""
+
+    @staticmethod
+    def apply(cur, user_id, removed=(), added=()):
+        """Adjust the user's counters for tasks leaving (`removed`) and entering
+        (`added`) the given states, as one UPDATE on `cur`.
+
+        Whether a due date counts as overdue is decided in SQL against the
+        row's own overdue_as_of, so a concurrent catch-up cannot be missed.
+        Users without a stats row are skipped; theirs is built on first read.
+        """
+        deltas = Counter()
+        due_deltas = Counter()   # open due date -> net number of tasks
+        earliest = None          # earliest open due date entering
+        for sign, states in ((-1, removed), (1, added)):
+            for status, priority, due_date in states:
+                deltas[STATUS_COLUMNS[status]] += sign
+                deltas[PRIORITY_COLUMNS[priority]] += sign
+                if due_date is not None and _is_open(status):
+                    due_deltas[due_date] += sign
+                    if sign > 0 and (earliest is None or due_date < earliest):
+                        earliest = due_date
+
+        sets, params = [], []
+        for column in COUNT_COLUMNS[:-1]:
+            if deltas[column]:
+                sets.append(f"{column} = {column} + %s")
+                params.append(deltas[column])
+        overdue_terms = [(due_date, n) for due_date, n in due_deltas.items() if n]
+        if overdue_terms:
+            sets.append("overdue = overdue"
+                        + " + (CASE WHEN %s <= overdue_as_of THEN %s ELSE 0 END)" * len(overdue_terms))
+            for due_date, n in overdue_terms:
+                params.extend([due_date, n])
+        if earliest is not None:
+            # next_due only has to stay a lower bound; removals never raise it
+            sets.append("next_due = CASE WHEN next_due IS NULL OR %s < next_due THEN %s ELSE next_due END")
+            params.extend([earliest, earliest])
+        if sets:
+            cur.execute(f"UPDATE task_stats SET {', '.join(sets)} WHERE user_id=%s", (*params, user_id))
+
+    @staticmethod
+    def get(user_id, now=None):
+        """Counters for the user as of `now`; one indexed lookup in the common case"""
+        now = now or datetime.datetime.now()
+        db = get_db_connection()
+        rows = db.execute_query("SELECT * FROM task_stats WHERE user_id=%s", (user_id,), fetch=True)
+        row = rows[0] if rows else None
+        if row is None:
+            row = TaskStats.build(user_id, now)
+        elif row["next_due"] is not None and row["next_due"] <= now:
+            row = TaskStats.catch_up(user_id, now)
+        return {
+            "total": sum(row[c] for c in STATUS_COLUMNS.values()),
+            "by_status": {status: row[c] for status, c in STATUS_COLUMNS.items()},
+            "by_priority": {priority: row[c] for priority, c in PRIORITY_COLUMNS.items()},
+            "overdue": row["overdue"],
+        }
+
+    @staticmethod
+    def catch_up(user_id, now):
+        """Count the open tasks that became overdue since overdue_as_of"""
+        db = get_db_connection()
+        with db.transaction() as cur:
+            cur.execute(f"SELECT * FROM task_stats WHERE user_id=%s{db.for_update}", (user_id,))
+            row = cur.fetchone()
+            if row["next_due"] is None or row["next_due"] > now:
+                return row  # another request caught up first
+            cur.execute(
+                "SELECT COUNT(*) AS n FROM tasks WHERE user_id=%s AND due_date > %s AND due_date <= %s"
+                " AND status <> 'completed'",
+                (user_id, row["overdue_as_of"], now))
+            newly_overdue = cur.fetchone()["n"]
+            next_due = TaskStats._next_due(cur, user_id, now)
+            cur.execute(
+                "UPDATE task_stats SET overdue = overdue + %s, overdue_as_of=%s, next_due=%s WHERE user_id=%s",
+                (newly_overdue, now, next_due, user_id))
+        return {**row, "overdue": row["overdue"] + newly_overdue,
+                "overdue_as_of": now, "next_due": next_due}
+
+    @staticmethod
+    def _next_due(cur, user_id, now):
+        cur.execute(
+            "SELECT MIN(due_date) AS next_due FROM tasks WHERE user_id=%s AND due_date > %s"
+            " AND status <> 'completed'",
+            (user_id, now))
+        return cur.fetchone()["next_due"]
+
+    @staticmethod
+    def _compute(cur, user_id, now):
+        """Counters recomputed from the tasks table"""
+        cur.execute(
+            "SELECT status, priority, COUNT(*) AS n,"
+            " SUM(CASE WHEN status <> 'completed' AND due_date <= %s THEN 1 ELSE 0 END) AS overdue"
+            " FROM tasks WHERE user_id=%s GROUP BY status, priority",
+            (now, user_id))
+        fresh = dict.fromkeys(COUNT_COLUMNS, 0)
+        for group in cur.fetchall():
+            fresh[STATUS_COLUMNS[group["status"]]] += group["n"]
+            fresh[PRIORITY_COLUMNS[group["priority"]]] += group["n"]
+            fresh["overdue"] += int(group["overdue"] or 0)
+        fresh["overdue_as_of"] = now
+        fresh["next_due"] = TaskStats._next_due(cur, user_id, now)
+        return fresh
+
+    @staticmethod
+    def build(user_id, now):
+        """Create the stats row of a user who has none yet"""
+        db = get_db_connection()
+        columns = ("user_id", *COUNT_COLUMNS, "overdue_as_of", "next_due", "reconciled_at")
+        try:
+            with db.transaction() as cur:
+                fresh = TaskStats._compute(cur, user_id, now)
+                fresh.update(user_id=user_id, reconciled_at=now)
+                cur.execute(
+                    f"INSERT INTO task_stats ({', '.join(columns)})"
+                    f" VALUES ({', '.join(['%s'] * len(columns))})",
+                    tuple(fresh[c] for c in columns))
+        except Exception as e:
+            if not is_duplicate_entry(e):
+                raise
+            # built by a concurrent request, or already on the primary but not yet on the replica read
+            with primary_reads():
+                return db.execute_query("SELECT * FROM task_stats WHERE user_id=%s", (user_id,), fetch=True)[0]
+        return fresh
+
+    @staticmethod
+    def reconcile(user_id, now=None):
+        """Recompute the user's counters from tasks; returns {column: (was, now)} for any drift"""
+        now = now or datetime.datetime.now()
+        db = get_db_connection()
+        with db.transaction() as cur:
+            cur.execute(f"SELECT * FROM task_stats WHERE user_id=%s{db.for_update}", (user_id,))
+            current = cur.fetchone()
+            if current is None:
+                return {}
+            fresh = TaskStats._compute(cur, user_id, now)
+            drift = {c: (current[c], fresh[c]) for c in COUNT_COLUMNS if current[c] != fresh[c]}
+            cur.execute(
+                f"UPDATE task_stats SET {', '.join(f'{c}=%s' for c in COUNT_COLUMNS)},"
+                " overdue_as_of=%s, next_due=%s, reconciled_at=%s WHERE user_id=%s",
+                (*(fresh[c] for c in COUNT_COLUMNS), now, fresh["next_due"], now, user_id))
+        if drift:
+            logger.warning("Repaired task stats drift for user %s: %s", user_id, drift)
+        return drift
+
+    @staticmethod
+    def reconcile_all(batch_size=500):
+        """Reconcile every stats row; returns (rows checked, rows repaired)"""
+        db = get_db_connection()
+        checked = repaired = 0
+        last_id = 0
+        while True:
+            rows = db.execute_query(
+                "SELECT user_id FROM task_stats WHERE user_id > %s ORDER BY user_id LIMIT %s",
+                (last_id, batch_size), fetch=True)
+            if not rows:
+                break
+            for row in rows:
+                checked += 1
+                if TaskStats.reconcile(row["user_id"]):
+                    repaired += 1
+            last_id = rows[-1]["user_id"]
+        logger.info("Task stats reconciled: %s checked, %s repaired", checked, repaired)
+        return checked, repaired
+
+
+class Reconciler:
+    """Runs TaskStats.reconcile_all every `interval` seconds on a daemon thread,
+    and prunes expired delta-sync tombstones.
+
+    With several worker processes on MySQL, a named lock lets only one of
+    them run each round.
+    """
+
+    def __init__(self, interval, batch_size=500):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_run = None
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='stats-reconciler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Task stats reconciliation failed")
+
+    def run_once(self):
+        """One round, unless another process holds the lock; returns (checked, repaired) or None"""
+        db = get_db_connection()
+        if db.dialect != "mysql":
+            result = self._round()
+        else:
+            with db.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute("SELECT GET_LOCK(%s, 0)", (RECONCILE_LOCK,))
+                    if cursor.fetchone()[0] != 1:
+                        return None
+                    try:
+                        result = self._round()
+                    finally:
+                        cursor.execute("DO RELEASE_LOCK(%s)", (RECONCILE_LOCK,))
+                finally:
+                    cursor.close()
+        self.last_run = time.time()
+        return result
+
+    def _round(self):
+        result = TaskStats.reconcile_all(self.batch_size)
+        # the same hourly pass expires delta-sync tombstones
+        from modules.task import Task
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=Config.SYNC_TOMBSTONE_DAYS)
+        pruned = Task.prune_tombstones(cutoff)
+        if pruned:
+            logger.info("Pruned %s task tombstone(s) older than %s", pruned, cutoff)
+        return result
+
+
+_reconciler = None
+_reconciler_lock = threading.Lock()
+
+
+def get_reconciler():
+    """Return the process-wide reconciler (not started)"""
+    global _reconciler
+    if _reconciler is None:
+        with _reconciler_lock:
+            if _reconciler is None:
+                _reconciler = Reconciler(Config.STATS_RECONCILE_INTERVAL, Config.STATS_RECONCILE_BATCH)
+    return _reconciler
+
+
+def reset_after_fork():
+    """The reconciler thread does not survive fork; the child starts its own"""
+    global _reconciler
+    _reconciler = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TaskFlux task statistics")
+    sub = parser.add_subparsers(dest="command", required=True)
+    reconcile = sub.add_parser("reconcile", help="recompute counters from the tasks table")
+    reconcile.add_argument("--user", type=int, help="only this user")
+    args = parser.parse_args(argv)
+
+    from utils.log import configure_logging
+    configure_logging()
+
+    if args.user is not None:
+        drift = TaskStats.reconcile(args.user)
+        print(f"User {args.user}: {'repaired ' + str(drift) if drift else 'no drift'}")
+        return 0
+    checked, repaired = TaskStats.reconcile_all(Config.STATS_RECONCILE_BATCH)
+    print(f"Checked {checked} user(s), repaired {repaired}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
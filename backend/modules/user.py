@@ -1,10 +1,9 @@
-from database import get_db_connection
-from flask_bcrypt import Bcrypt
+from database import get_db_connection, is_duplicate_entry
+from utils.hashing import get_password_hasher, HasherBusy
 import re
 import logging
 
 logger = logging.getLogger(__name__)
-bcrypt = Bcrypt()
 
 class User:
     def __init__(self, user_id=None, name=None, email=None, password_hash=None, 
@@ -43,21 +42,22 @@ class User:
     
     @staticmethod
     def hash_password(password):
-        """Hash password using bcrypt"""
-        return bcrypt.generate_password_hash(password).decode('utf-8')
+        """Hash password using bcrypt on the hashing worker pool"""
+        return get_password_hasher().hash(password)
     
     @staticmethod
     def check_password(password_hash, password):
         """Check if password matches hash"""
-        return bcrypt.check_password_hash(password_hash, password)
+        return get_password_hasher().check(password_hash, password)
     
     @classmethod
     def create_user(cls, name, email, password):
         """Create a new user in database"""
         try:
             # Validate input data
-            if not cls.validate_name(name)[0]:
-                return None, cls.validate_name(name)[1]
+            is_valid_name, name_message = cls.validate_name(name)
+            if not is_valid_name:
+                return None, name_message
             
             if not cls.validate_email(email):
                 return None, "Invalid email format"
@@ -66,27 +66,45 @@ class User:
             if not is_valid_password:
                 return None, password_message
             
-            # Check if user already exists
-            if cls.find_by_email(email):
-                return None, "User with this email already exists"
-            
             # Hash password
             password_hash = cls.hash_password(password)
             
-            # Insert user into database
+            # Insert user into database; the UNIQUE(email) constraint rejects
+            # duplicates, and the column defaults stamp the row on the database
+            # clock, read back on the same connection
+            name = name.strip()
+            email = email.lower().strip()
             db = get_db_connection()
             query = """
                 INSERT INTO users (name, email, password_hash) 
                 VALUES (%s, %s, %s)
             """
-            db.execute_query(query, (name.strip(), email.lower().strip(), password_hash))
-            
-            # Get the created user
-            user = cls.find_by_email(email)
-            logger.info(f"User created successfully: {email}")
+            try:
+                with db.transaction() as cur:
+                    cur.execute(query, (name, email, password_hash))
+                    cur.execute("SELECT id, created_at, updated_at FROM users WHERE id=%s",
+                                (cur.lastrowid,))
+                    row = cur.fetchone()
+            except Exception as e:
+                if is_duplicate_entry(e):
+                    return None, "User with this email already exists"
+                raise
+            
+            user = cls(
+                user_id=row['id'],
+                name=name,
+                email=email,
+                password_hash=password_hash,
+                is_active=True,
+                created_at=row['created_at'],
+                updated_at=row['updated_at']
+            )
+            logger.info("User created successfully: %s", email)
             
             return user, "User created successfully"
             
+        except HasherBusy:
+            raise
         except Exception as e:
             logger.error(f"Error creating user: {e}")
             return None, f"Error creating user: {str(e)}"
@@ -147,14 +165,33 @@ class User:
         try:
             user = cls.find_by_email(email)
             if user and cls.check_password(user.password_hash, password):
-                logger.info(f"User authenticated successfully: {email}")
+                logger.debug("User authenticated successfully: %s", email)
+                if get_password_hasher().needs_rehash(user.password_hash):
+                    user.rehash_password(password)
                 return user
             return None
             
+        except HasherBusy:
+            raise
         except Exception as e:
             logger.error(f"Error authenticating user: {e}")
             return None
     
+    def rehash_password(self, password):
+        """Re-hash with the configured work factor after a successful login"""
+        try:
+            password_hash = self.hash_password(password)
+            db = get_db_connection()
+            db.execute_query(
+                "UPDATE users SET password_hash = %s WHERE id = %s",
+                (password_hash, self.id)
+            )
+            self.password_hash = password_hash
+            logger.info("Password hash upgraded for: %s", self.email)
+        except Exception as e:
+            # The login already succeeded; try again next time
+            logger.warning(f"Could not upgrade password hash for {self.email}: {e}")
+    
     def update_profile(self, name=None, email=None):
         """Update user profile"""
         try:
@@ -167,20 +204,23 @@ class User:
                 self.name = name.strip()
             
             if email and self.validate_email(email):
-                # Check if email is already taken by another user
-                existing_user = self.find_by_email(email)
-                if existing_user and existing_user.id != self.id:
-                    return False, "Email is already taken"
                 updates.append("email = %s")
                 params.append(email.lower().strip())
-                self.email = email.lower().strip()
             
             if updates:
                 params.append(self.id)
                 db = get_db_connection()
                 query = f"UPDATE users SET {', '.join(updates)} WHERE id = %s"
-                db.execute_query(query, params)
-                logger.info(f"User profile updated: {self.email}")
+                try:
+                    db.execute_write(query, params)
+                except Exception as e:
+                    # UNIQUE(email) rejects an address used by another user
+                    if is_duplicate_entry(e):
+                        return False, "Email is already taken"
+                    raise
+                if email and self.validate_email(email):
+                    self.email = email.lower().strip()
+                logger.info("User profile updated: %s", self.email)
                 return True, "Profile updated successfully"
             
             return False, "No valid updates provided"
@@ -3,12 +3,24 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from modules.user import User
 from utils.security import SecurityUtils
+from utils.hashing import HasherBusy
+from utils.etag import compute_etag, is_not_modified, not_modified
+from utils.replicas import set_request_user
 import logging
-import traceback
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+def _server_busy():
+    """Fast 503 when the password hashing pool is saturated"""
+    response = jsonify({
+        'success': False,
+        'message': 'Server is busy, please retry shortly',
+        'error_type': 'server_busy'
+    })
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 # Create Blueprint for authentication routes
 auth_bp = Blueprint('auth', __name__, url_prefix='/api')
 
@@ -16,18 +28,15 @@ auth_bp = Blueprint('auth', __name__, url_prefix='/api')
 def register():
     """Register a new user with enhanced error handling"""
     try:
-        logger.info(" Registration request received")
-        
         # Get JSON data from request
         data = request.get_json()
-        logger.info(f"Request data received: {data}")
         
         # Validate required fields
         required_fields = ['name', 'email', 'password']
         is_valid, message = SecurityUtils.validate_request_data(data, required_fields)
         
         if not is_valid:
-            logger.warning(f"Validation failed: {message}")
+            logger.warning("Validation failed: %s", message)
             return jsonify({
                 'success': False,
                 'message': message,
@@ -39,16 +48,16 @@ def register():
         email = SecurityUtils.sanitize_input(data.get('email'))
         password = data.get('password')
         
-        logger.info(f"Processing registration for: {email}")
-        
         # Create user
         user, create_message = User.create_user(name, email, password)
         
         if user:
+            # no JWT on this request: name the new user so its reads stay on the primary
+            set_request_user(user.id)
             # Create access token
-            access_token = create_access_token(identity=user.id)
+            access_token = create_access_token(identity=str(user.id))
             
-            logger.info(f"User registered successfully: {email} (ID: {user.id})")
+            logger.info("User registered successfully: %s", email, extra={"user_id": user.id})
             return jsonify({
                 'success': True,
                 'message': 'User registered successfully',
@@ -56,42 +65,39 @@ def register():
                 'access_token': access_token
             }), 201
         else:
-            logger.warning(f"User creation failed: {create_message}")
+            logger.warning("User creation failed: %s", create_message)
             return jsonify({
                 'success': False,
                 'message': create_message,
                 'error_type': 'user_creation_error'
             }), 400
             
+    except HasherBusy as e:
+        logger.warning("Registration rejected: %s", e)
+        return _server_busy()
     except Exception as e:
-        # Log the full error traceback
-        error_traceback = traceback.format_exc()
-        logger.error(f"Registration error: {e}")
-        logger.error(f"Full traceback: {error_traceback}")
+        logger.exception("Registration error: %s", e)
         
         return jsonify({
             'success': False,
             'message': 'Internal server error occurred during registration',
             'error_type': 'internal_error',
-            'debug_info': str(e) if logger.level <= logging.DEBUG else None
+            'debug_info': str(e) if logger.isEnabledFor(logging.DEBUG) else None
         }), 500
 
 @auth_bp.route('/', methods=['POST'])
 def login():
     """Login user with enhanced error handling"""
     try:
-        logger.info("Login request received")
-        
         # Get JSON data from request
         data = request.get_json()
-        logger.info(f"Login attempt for: {data.get('email', 'unknown') if data else 'no data'}")
         
         # Validate required fields
         required_fields = ['email', 'password']
         is_valid, message = SecurityUtils.validate_request_data(data, required_fields)
         
         if not is_valid:
-            logger.warning(f"Login validation failed: {message}")
+            logger.warning("Login validation failed: %s", message)
             return jsonify({
                 'success': False,
                 'message': message,
@@ -107,9 +113,9 @@ def login():
         
         if user:
             # Create access token
-            access_token = create_access_token(identity=user.id)
+            access_token = create_access_token(identity=str(user.id))
             
-            logger.info(f"User logged in successfully: {email}")
+            logger.info("User logged in successfully: %s", email, extra={"user_id": user.id})
             return jsonify({
                 'success': True,
                 'message': 'Login successful',
@@ -117,24 +123,24 @@ def login():
                 'access_token': access_token
             }), 200
         else:
-            logger.warning(f"Login failed for: {email}")
+            logger.warning("Login failed for: %s", email)
             return jsonify({
                 'success': False,
                 'message': 'Invalid email or password',
                 'error_type': 'authentication_error'
             }), 401
             
+    except HasherBusy as e:
+        logger.warning("Login rejected: %s", e)
+        return _server_busy()
     except Exception as e:
-        # Log the full error traceback
-        error_traceback = traceback.format_exc()
-        logger.error(f"Login error: {e}")
-        logger.error(f"Full traceback: {error_traceback}")
+        logger.exception("Login error: %s", e)
         
         return jsonify({
             'success': False,
             'message': 'Internal server error occurred during login',
             'error_type': 'internal_error',
-            'debug_info': str(e) if logger.level <= logging.DEBUG else None
+            'debug_info': str(e) if logger.isEnabledFor(logging.DEBUG) else None
         }), 500
 
 @auth_bp.route('/profile', methods=['GET'])
@@ -142,23 +148,25 @@ def login():
 def get_profile():
     """Get user profile with enhanced error handling"""
     try:
-        logger.info(" Profile request received")
-        
         # Get current user ID from JWT token
         current_user_id = get_jwt_identity()
-        logger.info(f"Profile request for user ID: {current_user_id}")
         
         # Find user by ID
         user = User.find_by_id(current_user_id)
         
         if user:
-            logger.info(f"Profile retrieved for: {user.email}")
-            return jsonify({
+            etag = compute_etag(user.id, user.updated_at)
+            if is_not_modified(etag):
+                return not_modified(etag)
+            
+            response = jsonify({
                 'success': True,
                 'user': user.to_dict()
-            }), 200
+            })
+            response.set_etag(etag)
+            return response, 200
         else:
-            logger.warning(f"Profile not found for user ID: {current_user_id}")
+            logger.warning("Profile not found for user ID: %s", current_user_id)
             return jsonify({
                 'success': False,
                 'message': 'User not found',
@@ -166,16 +174,13 @@ def get_profile():
             }), 404
             
     except Exception as e:
-        # Log the full error traceback
-        error_traceback = traceback.format_exc()
-        logger.error(f"Profile error: {e}")
-        logger.error(f"Full traceback: {error_traceback}")
+        logger.exception("Profile error: %s", e)
         
         return jsonify({
             'success': False,
             'message': 'Internal server error occurred while retrieving profile',
             'error_type': 'internal_error',
-            'debug_info': str(e) if logger.level <= logging.DEBUG else None
+            'debug_info': str(e) if logger.isEnabledFor(logging.DEBUG) else None
         }), 500
 
 # Test endpoint for debugging
@@ -186,7 +191,7 @@ def test_endpoint():
         method = request.method
         data = request.get_json() if request.method == 'POST' else None
         
-        logger.info(f"Test endpoint called with method: {method}")
+        logger.info("Test endpoint called with method: %s", method)
         
         response_data = {
             'success': True,
@@ -199,7 +204,7 @@ def test_endpoint():
         return jsonify(response_data), 200
         
     except Exception as e:
-        logger.error(f"Test endpoint error: {e}")
+        logger.error("Test endpoint error: %s", e)
         return jsonify({
             'success': False,
             'message': f'Test endpoint error: {str(e)}'
@@ -209,7 +214,7 @@ def test_endpoint():
 @auth_bp.errorhandler(422)
 def handle_unprocessable_entity(e):
     """Handle JWT decode errors"""
-    logger.warning(f"JWT decode error: {e}")
+    logger.warning("JWT decode error: %s", e)
     return jsonify({
         'success': False,
         'message': 'Invalid token format',
@@ -219,13 +224,9 @@ def handle_unprocessable_entity(e):
 @auth_bp.errorhandler(401)
 def handle_unauthorized(e):
     """Handle unauthorized access"""
-    logger.warning(f"Unauthorized access: {e}")
+    logger.warning("Unauthorized access: %s", e)
     return jsonify({
         'success': False,
         'message': 'Authorization required',
         'error_type': 'authorization_error'
     }), 401
-
-# Add this at the end of the file for debugging
-print("routes/auth.py loaded successfully!")
-logger.info("Auth routes module initialized")
\ No newline at end of file
@@ -1,22 +1,103 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from flask_jwt_extended import (jwt_required, get_jwt_identity, get_jwt, get_jwt_request_location,
+                                create_access_token)
 from database import get_db_connection
+from modules.task import Task, TASK_FIELDS, INSERT_CHUNK_SIZE, search_terms
+from modules import reminders
+from modules.task_stats import TaskStats
+from config import Config
+from utils.cache import get_task_cache
+from utils.etag import compute_etag, is_not_modified, not_modified, with_etag
+from utils.json_provider import RowSet, dumps as json_dumps
+from utils import pubsub
 import datetime
+import base64
+import json
+import csv
+import io
 
 tasks_bp = Blueprint("tasks", __name__, url_prefix="/api/tasks")
 
+TASK_STATUSES = ("pending", "in_progress", "completed")
+TASK_PRIORITIES = ("low", "medium", "high")
+DEFAULT_PAGE_SIZE = 50
+SEARCH_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+MAX_BATCH_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000  # rows fetched from the server per round trip while exporting
+IMPORT_MAX_ERRORS = 100  # rejected rows reported back in detail
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 1000
+SYNC_END = 2 ** 63 - 1  # id past every row: everything up to the timestamp was sent
+STREAM_RETRY_MS = 5000  # how long EventSource waits before reconnecting
+STREAM_SCOPE = "stream"  # "scope" claim of tokens that only open the event stream
+
 def _ok(data=None, status=200):
     return jsonify({"success": True, **(data or {})}), status
 
 def _err(msg, status=400):
     return jsonify({"success": False, "message": msg}), status
 
-@tasks_bp.post("")
-@jwt_required()
-def create_task():
-    """Create a new task for the logged-in user"""
-    uid = get_jwt_identity()
-    data = request.get_json(silent=True) or {}
+def _current_user_id():
+    # token subjects are strings (JWT "sub" claim), or ints in tokens issued before
+    # that change; ids are ints everywhere else
+    return int(get_jwt_identity())
+
+def _encode_cursor(row):
+    """Opaque cursor pointing just past `row` in (created_at, id) DESC order"""
+    raw = json.dumps([row["created_at"].isoformat(), row["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor):
+    """Inverse of _encode_cursor; raises ValueError on malformed input"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, task_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(created_at), int(task_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def _encode_sync_token(tasks_position, deleted_position):
+    """Opaque delta-sync token: the (timestamp, id) reached in tasks and in tombstones"""
+    raw = json.dumps([tasks_position[0].isoformat(), tasks_position[1],
+                      deleted_position[0].isoformat(), deleted_position[1]])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_sync_token(token):
+    """Inverse of _encode_sync_token; raises ValueError on malformed input"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        tasks_at, task_id, deleted_at, tombstone_id = json.loads(raw)
+        return ((datetime.datetime.fromisoformat(tasks_at), int(task_id)),
+                (datetime.datetime.fromisoformat(deleted_at), int(tombstone_id)))
+    except Exception as e:
+        raise ValueError("Invalid sync token") from e
+
+def _parse_fields(fields):
+    """Validate a comma separated ?fields= value; None means all columns"""
+    if not fields:
+        return None
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in TASK_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    # keep the column order stable and always return the id
+    return [f for f in TASK_FIELDS if f == "id" or f in wanted]
+
+def _parse_due_date(due_date):
+    """Accept "YYYY-MM-DD" or ISO 8601 with time; raises ValueError"""
+    try:
+        if len(due_date) == 10:
+            return datetime.datetime.strptime(due_date, "%Y-%m-%d")
+        return datetime.datetime.fromisoformat(due_date)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid due_date format. Use YYYY-MM-DD or ISO 8601.") from e
+
+def _new_task_values(data):
+    """Validate a create payload; returns (values, error message)"""
+    for key in ("title", "description", "status", "priority"):
+        if data.get(key) is not None and not isinstance(data[key], str):
+            return None, f"{key} must be a string"
     title = (data.get("title") or "").strip()
     description = (data.get("description") or "").strip()
     priority = (data.get("priority") or "medium").lower()
@@ -24,106 +105,616 @@ def create_task():
     due_date = data.get("due_date")  # ISO string: "2025-09-10T12:30"
 
     if not title:
-        return _err("title is required", 400)
+        return None, "title is required"
+    if status not in TASK_STATUSES:
+        return None, f"status must be one of: {', '.join(TASK_STATUSES)}"
+    if priority not in TASK_PRIORITIES:
+        return None, f"priority must be one of: {', '.join(TASK_PRIORITIES)}"
 
-    # parse due_date if provided
     due_dt = None
     if due_date:
         try:
-            # accept "YYYY-MM-DD" or ISO with time
-            if len(due_date) == 10:
-                due_dt = datetime.datetime.strptime(due_date, "%Y-%m-%d")
-            else:
-                due_dt = datetime.datetime.fromisoformat(due_date)
-        except Exception:
-            return _err("Invalid due_date format. Use YYYY-MM-DD or ISO 8601.", 400)
+            due_dt = _parse_due_date(due_date)
+        except ValueError as e:
+            return None, str(e)
 
-    db = get_db_connection()
-    q = """INSERT INTO tasks (user_id, title, description, status, priority, due_date)
-           VALUES (%s, %s, %s, %s, %s, %s)"""
-    params = (uid, title, description or None, status, priority, due_dt)
+    return {
+        "title": title,
+        "description": description or None,
+        "status": status,
+        "priority": priority,
+        "due_date": due_dt,
+    }, None
+
+def _task_changes(data):
+    """Validate an update payload; returns (column -> value, error message)"""
+    changes = {}
+    for key in ("title", "description", "status", "priority"):
+        if data.get(key) is None:
+            continue
+        if not isinstance(data[key], str):
+            return None, f"{key} must be a string"
+        changes[key] = data[key].strip()
+
+    if "title" in changes and not changes["title"]:
+        return None, "title cannot be empty"
+    if "description" in changes:
+        changes["description"] = changes["description"] or None
+    for key in ("status", "priority"):
+        if key in changes:
+            changes[key] = changes[key].lower()
+    if "status" in changes and changes["status"] not in TASK_STATUSES:
+        return None, f"status must be one of: {', '.join(TASK_STATUSES)}"
+    if "priority" in changes and changes["priority"] not in TASK_PRIORITIES:
+        return None, f"priority must be one of: {', '.join(TASK_PRIORITIES)}"
+
+    if "due_date" in data:
+        if data["due_date"]:
+            try:
+                changes["due_date"] = _parse_due_date(data["due_date"])
+            except ValueError as e:
+                return None, str(e)
+        else:
+            changes["due_date"] = None
+
+    if not changes:
+        return None, "No fields to update"
+    return changes, None
+
+@tasks_bp.post("")
+@jwt_required()
+def create_task():
+    """Create a new task for the logged-in user"""
+    uid = _current_user_id()
+    data = request.get_json(silent=True) or {}
 
-    res = db.execute_query(q, params, fetch=False)  # your helper commits (autocommit True)
-    new_id = res["lastrowid"] if isinstance(res, dict) and "lastrowid" in res else None
+    values, error = _new_task_values(data)
+    if error:
+        return _err(error, 400)
 
-    # return the created row
-    sel = db.execute_query("SELECT * FROM tasks WHERE id=%s AND user_id=%s", (new_id, uid), fetch=True)
-    return _ok({"task": sel[0]} if sel else {"id": new_id}, 201)
+    created = Task.create(uid, values)
+    get_task_cache().invalidate(uid)
+
+    task = {"id": created["id"], "user_id": uid, **values,
+            "created_at": created["created_at"], "updated_at": created["updated_at"]}
+    pubsub.publish(uid, "task.created", {"task": task})
+    return _ok({"task": task}, 201)
 
 @tasks_bp.get("")
 @jwt_required()
 def list_tasks():
-    """List tasks for logged-in user; optional ?status=&priority="""
-    uid = get_jwt_identity()
+    """List tasks for logged-in user, newest first, one page at a time.
+
+    Optional ?status=&priority= filters, ?limit= page size (max 200),
+    ?cursor= from a previous response's next_cursor, and ?fields=id,title,...
+    to return only some columns. With ?shape=rows, tasks come back as
+    {"columns": [...], "rows": [[...], ...]} instead of one object per task.
+    """
+    uid = _current_user_id()
     status = request.args.get("status")
     priority = request.args.get("priority")
 
-    base = "SELECT * FROM tasks WHERE user_id=%s"
-    params = [uid]
-    if status:
-        base += " AND status=%s"
-        params.append(status)
-    if priority:
-        base += " AND priority=%s"
-        params.append(priority)
-    base += " ORDER BY created_at DESC"
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return _err("limit must be an integer", 400)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
 
-    db = get_db_connection()
-    rows = db.execute_query(base, tuple(params), fetch=True)
-    return _ok({"tasks": rows})
+    try:
+        fields = _parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return _err(str(e), 400)
 
-@tasks_bp.put("/<int:task_id>")
+    shape = request.args.get("shape", "objects")
+    if shape not in ("objects", "rows"):
+        return _err("shape must be objects or rows", 400)
+    as_rows = shape == "rows"
+
+    cache = get_task_cache()
+    cache_key = cache.key(uid, {
+        "status": status, "priority": priority, "limit": limit,
+        "cursor": request.args.get("cursor"), "fields": ",".join(fields or []) or None,
+        "shape": shape,
+    })
+    cached = cache.get(cache_key)
+    if cached is not None:
+        if is_not_modified(cached["etag"]):
+            return not_modified(cached["etag"])
+        return with_etag(_ok(cached["page"]), cached["etag"])
+
+    # Cheap version check: answered from idx_user_updated without touching rows
+    version = Task.version(uid)
+    etag = compute_etag(uid, version["total"], version["last_updated"], version["last_id"],
+                        request.query_string.decode())
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    # created_at is needed to build the next cursor even when not requested
+    columns = fields or list(TASK_FIELDS)
+    select_cols = columns if "created_at" in columns else columns + ["created_at"]
+
+    after = None
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            after = _decode_cursor(cursor)
+        except ValueError as e:
+            return _err(str(e), 400)
+
+    # fetch one extra row to learn whether another page exists
+    rows = Task.list_page(uid, select_cols, status, priority, after, limit + 1,
+                          as_tuples=as_rows)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = dict(zip(select_cols, rows[-1])) if as_rows else rows[-1]
+        next_cursor = _encode_cursor(last)
+
+    if as_rows:
+        # an added created_at is the last column; slice it off
+        if len(select_cols) > len(columns):
+            rows = [row[:len(columns)] for row in rows]
+        tasks = RowSet(columns, rows)
+    else:
+        if "created_at" not in columns:
+            for row in rows:
+                row.pop("created_at", None)
+        tasks = rows
+
+    page = {"tasks": tasks, "next_cursor": next_cursor}
+    cache.set(cache_key, {"page": page, "etag": etag})
+    return with_etag(_ok(page), etag)
+
+@tasks_bp.get("/stats")
 @jwt_required()
-def update_task(task_id):
-    """Update fields of a task that belongs to the user"""
-    uid = get_jwt_identity()
-    data = request.get_json(silent=True) or {}
+def task_stats():
+    """Task counts by status and priority, and how many open tasks are overdue.
 
-    fields = []
-    params = []
-    for key in ("title","description","status","priority"):
-        if key in data and data[key] is not None:
-            fields.append(f"{key}=%s")
-            params.append(data[key])
+    Served from counters kept up to date by every write, not by counting tasks.
+    """
+    return _ok({"stats": TaskStats.get(_current_user_id())})
 
-    if "due_date" in data:
-        due_date = data["due_date"]
-        if due_date:
-            try:
-                if len(due_date) == 10:
-                    due_dt = datetime.datetime.strptime(due_date, "%Y-%m-%d")
-                else:
-                    due_dt = datetime.datetime.fromisoformat(due_date)
-            except Exception:
-                return _err("Invalid due_date format", 400)
-            fields.append("due_date=%s")
-            params.append(due_dt)
+@tasks_bp.get("/changes")
+@jwt_required()
+def task_changes():
+    """Tasks created or changed and ids of tasks deleted since a sync token.
+
+    Without ?since= the first response starts from scratch and pages through
+    every task. Keep calling with next_token while has_more is set, then
+    again whenever the client wants to sync. Apply `deleted` before `tasks`.
+    Changes from the last SYNC_SETTLE seconds are left for the next sync,
+    so that writes still committing are not skipped.
+    """
+    uid = _current_user_id()
+    try:
+        limit = int(request.args.get("limit", SYNC_PAGE_SIZE))
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        limit = min(limit, SYNC_MAX_PAGE_SIZE)
+        columns = _parse_fields(request.args.get("fields")) or list(TASK_FIELDS)
+        since = request.args.get("since")
+        after, deleted_after = _decode_sync_token(since) if since else (None, None)
+    except ValueError as e:
+        return _err(str(e))
+
+    # updated_at and deleted_at are stamped by the database, so measure against its clock
+    now = get_db_connection().now()
+    until = now - datetime.timedelta(seconds=Config.SYNC_SETTLE)
+    if deleted_after is None:
+        # a fresh copy has nothing to delete yet
+        deleted_after = (until, SYNC_END)
+    elif deleted_after[0] < now - datetime.timedelta(days=Config.SYNC_TOMBSTONE_DAYS):
+        return _err("Sync token has expired; sync again without since", 410)
+    if "updated_at" not in columns:
+        columns.append("updated_at")  # the position is read from it
+
+    rows, tombstones = Task.changes(uid, columns, after, deleted_after, until, limit + 1)
+    more_rows, more_tombstones = len(rows) > limit, len(tombstones) > limit
+    rows, tombstones = rows[:limit], tombstones[:limit]
+    # a side that returned everything up to `until` resumes from there
+    after = (rows[-1]["updated_at"], rows[-1]["id"]) if more_rows else (until, SYNC_END)
+    deleted_after = ((tombstones[-1]["deleted_at"], tombstones[-1]["id"]) if more_tombstones
+                     else (until, SYNC_END))
+    return _ok({
+        "tasks": rows,
+        "deleted": [t["task_id"] for t in tombstones],
+        "next_token": _encode_sync_token(after, deleted_after),
+        "has_more": more_rows or more_tombstones,
+    })
+
+@tasks_bp.post("/stream/token")
+@jwt_required()
+def stream_token():
+    """A token for ?jwt= on /api/tasks/stream, good for SSE_TOKEN_TTL seconds.
+
+    A URL ends up in proxy and access logs, so the access token never goes
+    there; this one expires quickly and every other endpoint refuses it.
+    """
+    token = create_access_token(identity=str(_current_user_id()),
+                                expires_delta=datetime.timedelta(seconds=Config.SSE_TOKEN_TTL),
+                                additional_claims={"scope": STREAM_SCOPE})
+    return _ok({"token": token, "expires_in": Config.SSE_TOKEN_TTL})
+
+@tasks_bp.get("/stream")
+@jwt_required(locations=["headers", "query_string"])
+def stream_tasks():
+    """Server-Sent Events for the user's task writes, from any device.
+
+    Events: task.created, task.updated, task.deleted, and tasks.changed for
+    batches and imports. EventSource cannot set headers, so it passes a
+    token from POST /api/tasks/stream/token as ?jwt=; an access token is
+    only accepted in the Authorization header. The token is checked when
+    the stream opens, so an open stream outlives it. A comment goes out
+    every SSE_HEARTBEAT seconds while idle. A stream that falls SSE_BUFFER
+    events behind gets `resync` and is closed. After any reconnect, catch up
+    with /api/tasks/changes, because events published while disconnected
+    are not replayed.
+    """
+    if get_jwt_request_location() == "query_string" and get_jwt().get("scope") != STREAM_SCOPE:
+        return _err("Pass a token from POST /api/tasks/stream/token as ?jwt=", 401)
+    if Config.PUBSUB_BACKEND == "none":
+        return _err("Event streams are turned off; poll instead", 503)
+    uid = _current_user_id()
+    broker = pubsub.get_broker()
+    subscription = broker.subscribe(uid)
+    if subscription is None:
+        resp, status = _err("Too many open event streams; poll instead", 503)
+        resp.headers["Retry-After"] = str(STREAM_RETRY_MS // 1000)
+        return resp, status
+    heartbeat = Config.SSE_HEARTBEAT
+
+    def generate():
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n: connected\n\n"
+            while True:
+                frames = subscription.next_frames(heartbeat)
+                if frames:
+                    yield "".join(frames)
+                if subscription.closed:
+                    if subscription.closed == "slow":
+                        yield pubsub.sse_frame("resync", {"reason": "too far behind"})
+                    return
+                if not frames:
+                    yield ": heartbeat\n\n"
+        finally:
+            # also reached when the client goes away and the next write fails
+            broker.unsubscribe(subscription)
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@tasks_bp.get("/search")
+@jwt_required()
+def search_tasks():
+    """Full-text search over title and description, best match first.
+
+    ?q= words that must all appear (the last also matches as a prefix, so
+    "rep" finds "report"); optional ?status=&priority=&fields= as in list_tasks;
+    ?limit= and ?offset= page through the results. "truncated" is true when
+    more tasks matched than are ranked (SEARCH_RANK_WINDOW, newest first).
+    """
+    uid = _current_user_id()
+    terms = search_terms(request.args.get("q"))
+    if not terms:
+        return _err("q must contain at least one word", 400)
+    status = request.args.get("status")
+    priority = request.args.get("priority")
+
+    try:
+        limit = int(request.args.get("limit", SEARCH_PAGE_SIZE))
+        offset = int(request.args.get("offset", 0))
+    except ValueError:
+        return _err("limit and offset must be integers", 400)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+
+    try:
+        columns = _parse_fields(request.args.get("fields")) or list(TASK_FIELDS)
+    except ValueError as e:
+        return _err(str(e), 400)
+
+    # same generation-token cache as list_tasks: any write by the user invalidates it
+    cache = get_task_cache()
+    cache_key = cache.key(uid, {
+        "search": " ".join(terms), "status": status, "priority": priority,
+        "limit": limit, "offset": offset, "fields": ",".join(columns),
+    })
+    page = cache.get(cache_key)
+    if page is None:
+        if offset >= Config.SEARCH_RANK_WINDOW:
+            rows, truncated = [], True
         else:
-            fields.append("due_date=%s")
-            params.append(None)
+            # one extra row tells whether another page exists
+            rows, truncated = Task.search(uid, columns, terms, status, priority,
+                                          min(limit + 1, Config.SEARCH_RANK_WINDOW - offset),
+                                          offset, Config.SEARCH_RANK_WINDOW)
+        next_offset = offset + limit if len(rows) > limit else None
+        page = {"tasks": rows[:limit], "next_offset": next_offset, "truncated": truncated}
+        cache.set(cache_key, page)
+    return _ok(page)
 
-    if not fields:
-        return _err("No fields to update", 400)
+@tasks_bp.put("/<int:task_id>")
+@jwt_required()
+def update_task(task_id):
+    """Update fields of a task that belongs to the user.
 
-    params.extend([task_id, uid])
+    The response echoes the task id and the fields that were changed.
+    """
+    uid = _current_user_id()
+    data = request.get_json(silent=True) or {}
 
-    db = get_db_connection()
-    q = f"UPDATE tasks SET {', '.join(fields)} WHERE id=%s AND user_id=%s"
-    db.execute_query(q, tuple(params), fetch=False)
+    changes, error = _task_changes(data)
+    if error:
+        return _err(error, 400)
 
-    sel = db.execute_query("SELECT * FROM tasks WHERE id=%s AND user_id=%s", (task_id, uid), fetch=True)
-    if not sel:
+    if not Task.update(uid, task_id, changes):
         return _err("Task not found", 404)
-    return _ok({"task": sel[0]})
+    get_task_cache().invalidate(uid)
+    pubsub.publish(uid, "task.updated", {"task": {"id": task_id, **changes}})
+    return _ok({"task": {"id": task_id, **changes}})
 
 @tasks_bp.delete("/<int:task_id>")
 @jwt_required()
 def delete_task(task_id):
-    uid = get_jwt_identity()
-    db = get_db_connection()
-    # check exists
-    sel = db.execute_query("SELECT id FROM tasks WHERE id=%s AND user_id=%s", (task_id, uid), fetch=True)
-    if not sel: 
+    uid = _current_user_id()
+    if not Task.delete(uid, task_id):
         return _err("Task not found", 404)
-    db.execute_query("DELETE FROM tasks WHERE id=%s AND user_id=%s", (task_id, uid), fetch=False)
+    get_task_cache().invalidate(uid)
+    pubsub.publish(uid, "task.deleted", {"id": task_id})
     return _ok({"deleted": task_id})
+
+@tasks_bp.post("/batch")
+@jwt_required()
+def batch_tasks():
+    """Apply many create/update/delete operations in one transaction.
+
+    Body: {"operations": [{"op": "create", "title": ...},
+                          {"op": "update", "id": 7, "status": "completed"},
+                          {"op": "delete", "id": 9}]}
+
+    Every operation is validated before anything is written; if any is
+    invalid nothing is applied and the per-item errors are returned.
+    Creates are applied first, then updates, then deletes. Updates and
+    deletes of tasks the user does not own are reported as not found
+    without failing the rest of the batch.
+    """
+    uid = _current_user_id()
+    data = request.get_json(silent=True) or {}
+    operations = data.get("operations")
+
+    if not isinstance(operations, list) or not operations:
+        return _err("operations must be a non-empty list", 400)
+    if len(operations) > MAX_BATCH_SIZE:
+        return _err(f"A batch may contain at most {MAX_BATCH_SIZE} operations", 400)
+
+    # ---- validate everything up front ----
+    creates, updates, deletes, errors = [], [], [], []
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict):
+            errors.append({"index": index, "message": "operation must be an object"})
+            continue
+        kind = op.get("op")
+        if kind == "create":
+            values, error = _new_task_values(op)
+            if not error:
+                creates.append((index, values))
+        elif kind in ("update", "delete"):
+            task_id = op.get("id")
+            if not isinstance(task_id, int) or isinstance(task_id, bool):
+                error = "id must be an integer"
+            elif kind == "update":
+                changes, error = _task_changes(op)
+                if not error:
+                    updates.append((index, task_id, changes))
+            else:
+                error = None
+                deletes.append((index, task_id))
+        else:
+            error = "op must be one of: create, update, delete"
+        if error:
+            errors.append({"index": index, "message": error})
+
+    if errors:
+        return jsonify({"success": False, "message": "Invalid operations",
+                        "errors": errors}), 400
+
+    results = [None] * len(operations)
+    db = get_db_connection()
+    with db.transaction() as cur:
+        # which of the referenced tasks belong to this user (one statement)
+        target_ids = list({task_id for _, task_id, _ in updates} |
+                          {task_id for _, task_id in deletes})
+        owned = Task.owned(cur, uid, target_ids)
+
+        # creates: chunked multi-row INSERTs
+        # reminder changes are only passed on once the transaction has committed
+        new_ids, reminder_changes = Task.insert_many(cur, uid, [values for _, values in creates])
+        for (index, _), new_id in zip(creates, new_ids):
+            results[index] = {"index": index, "op": "create", "success": True, "id": new_id}
+
+        # updates: one executemany per distinct set of changed columns
+        groups = {}
+        for index, task_id, changes in updates:
+            if task_id not in owned:
+                results[index] = {"index": index, "op": "update", "success": False,
+                                  "id": task_id, "message": "Task not found"}
+                continue
+            groups.setdefault(tuple(changes), []).append((index, task_id, changes))
+        for columns, items in groups.items():
+            reminder_changes += Task.update_many(cur, uid, columns,
+                                                 [(task_id, changes) for _, task_id, changes in items],
+                                                 owned)
+            for index, task_id, _ in items:
+                results[index] = {"index": index, "op": "update", "success": True, "id": task_id}
+
+        # deletes: a single DELETE ... WHERE id IN (...)
+        delete_ids = list({task_id for _, task_id in deletes if task_id in owned})
+        reminder_changes += Task.delete_many(cur, uid, delete_ids, owned)
+        deleted = set(delete_ids)
+        for index, task_id in deletes:
+            if task_id in deleted:
+                results[index] = {"index": index, "op": "delete", "success": True, "id": task_id}
+                deleted.discard(task_id)  # a repeated delete of the same id is not found
+            else:
+                results[index] = {"index": index, "op": "delete", "success": False,
+                                  "id": task_id, "message": "Task not found"}
+    reminders.notify(reminder_changes)
+    get_task_cache().invalidate(uid)
+    changed = {op: [r["id"] for r in results if r["op"] == op and r["success"]]
+               for op in ("create", "update", "delete")}
+    if any(changed.values()):
+        pubsub.publish(uid, "tasks.changed", {"created": changed["create"], "updated": changed["update"],
+                                              "deleted": changed["delete"]})
+
+    return _ok({
+        "results": results,
+        "created": sum(1 for r in results if r["op"] == "create" and r["success"]),
+        "updated": sum(1 for r in results if r["op"] == "update" and r["success"]),
+        "deleted": sum(1 for r in results if r["op"] == "delete" and r["success"]),
+    })
+
+def _export_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+def _ndjson_chunks(batches):
+    # exports keep ISO 8601 dates; only API responses use HTTP dates
+    for rows in batches:
+        yield "".join(json_dumps(row) + "\n" for row in rows)
+
+def _csv_chunks(batches, columns):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    yield buf.getvalue()
+    for rows in batches:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows([_export_value(row[c]) for c in columns] for row in rows)
+        yield buf.getvalue()
+
+@tasks_bp.get("/export")
+@jwt_required()
+def export_tasks():
+    """Stream all of the user's tasks as ?format=ndjson (default) or csv.
+
+    Rows are read with an unbuffered cursor in batches and written out as
+    they arrive, so memory use does not grow with the number of tasks.
+    Accepts the same ?status=&priority=&fields= filters as list_tasks.
+    """
+    uid = _current_user_id()
+    fmt = (request.args.get("format") or "ndjson").lower()
+    if fmt not in ("ndjson", "csv"):
+        return _err("format must be ndjson or csv", 400)
+
+    try:
+        columns = _parse_fields(request.args.get("fields")) or list(TASK_FIELDS)
+    except ValueError as e:
+        return _err(str(e), 400)
+
+    batches = Task.stream(uid, columns, request.args.get("status"),
+                          request.args.get("priority"), EXPORT_BATCH_SIZE)
+    if fmt == "csv":
+        body, mimetype = _csv_chunks(batches, columns), "text/csv"
+    else:
+        body, mimetype = _ndjson_chunks(batches), "application/x-ndjson"
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=tasks.{fmt}"},
+    )
+
+def _import_rows(stream, fmt):
+    """Yield (line number, row dict or None) from an uploaded CSV/NDJSON text stream"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_no, row if isinstance(row, dict) else None
+
+def _import_format():
+    fmt = (request.args.get("format") or "").lower()
+    if fmt:
+        return fmt
+    upload = request.files.get("file")
+    name = (upload.filename or "") if upload else ""
+    mimetype = upload.mimetype if upload else request.mimetype
+    if name.endswith(".csv") or mimetype == "text/csv":
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or mimetype in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return None
+
+@tasks_bp.post("/import")
+@jwt_required()
+def import_tasks():
+    """Bulk import tasks from a CSV or NDJSON upload.
+
+    The file may be sent as multipart field "file" or as the raw request
+    body; the format comes from ?format=csv|ndjson, the file extension or
+    the Content-Type. Rows are parsed incrementally, validated with the same
+    rules as create_task, and inserted in multi-row batches, each committed
+    on its own. Returns how many rows were accepted (committed) and rejected;
+    if the upload turns out not to be UTF-8, the 400 reports how many rows
+    earlier batches already committed.
+    """
+    uid = _current_user_id()
+    fmt = _import_format()
+    if fmt not in ("csv", "ndjson"):
+        return _err("format must be csv or ndjson", 400)
+
+    upload = request.files.get("file")
+    stream = io.TextIOWrapper(upload.stream if upload else request.stream,
+                              encoding="utf-8-sig", newline="")
+
+    db = get_db_connection()
+    accepted, rejected, errors = 0, 0, []
+    pending = []
+
+    def flush():
+        nonlocal accepted
+        with db.transaction() as cur:
+            _, reminder_changes = Task.insert_many(cur, uid, pending)
+        reminders.notify(reminder_changes)
+        accepted += len(pending)  # only once the batch is committed
+        pending.clear()
+
+    try:
+        for line_no, row in _import_rows(stream, fmt):
+            if row is None:
+                values, error = None, "Invalid JSON object"
+            else:
+                values, error = _new_task_values(row)
+            if error:
+                rejected += 1
+                if len(errors) < IMPORT_MAX_ERRORS:
+                    errors.append({"line": line_no, "message": error})
+                continue
+
+            pending.append(values)
+            if len(pending) >= INSERT_CHUNK_SIZE:
+                flush()
+        if pending:
+            flush()
+    except UnicodeDecodeError:
+        # earlier batches are committed; say how many so the client can resume after them
+        return jsonify({"success": False, "accepted": accepted,
+                        "message": f"Upload must be UTF-8 encoded; {accepted} task(s) before the"
+                                   f" invalid bytes were imported"}), 400
+    finally:
+        if accepted:
+            get_task_cache().invalidate(uid)
+            pubsub.publish(uid, "tasks.changed", {"imported": accepted})
+
+    return _ok({"accepted": accepted, "rejected": rejected, "errors": errors})
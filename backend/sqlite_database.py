@@ -0,0 +1,150 @@
+import sqlite3
+import datetime
+import logging
+from config import Config
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+
+# Store datetimes as ISO text and read TIMESTAMP/DATETIME/BOOLEAN columns
+# back as the same Python types mysql.connector returns
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("DATETIME", lambda raw: datetime.datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("BOOLEAN", lambda raw: raw not in (b"0", b""))
+
+
+def _translate(query):
+    """Rewrite the %s placeholders used throughout the app to sqlite's ?"""
+    return query.replace("%s", "?")
+
+
+class SQLiteCursor:
+    """Wraps a sqlite3 cursor with the subset of the mysql.connector cursor API the app uses"""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self.dictionary = dictionary
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return {col[0]: value for col, value in zip(self._cursor.description, row)}
+
+    def execute(self, query, params=()):
+        self._cursor.execute(_translate(query), tuple(params or ()))
+
+    def executemany(self, query, seq_params):
+        self._cursor.executemany(_translate(query), [tuple(p) for p in seq_params])
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Wraps a sqlite3 connection so pooled connections look like mysql.connector ones"""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, dictionary=False, buffered=None):
+        return SQLiteCursor(self._connection.cursor(), dictionary=dictionary)
+
+    def start_transaction(self):
+        # IMMEDIATE takes the write lock up front instead of failing on upgrade
+        self._connection.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def is_connected(self):
+        try:
+            self._connection.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._connection.close()
+
+
+class SQLiteDatabase(Database):
+    """Embedded storage backend for small deployments, CI and local benchmarks.
+
+    Uses WAL journaling so readers never block the single writer, and the
+    same pooled, %s-placeholder interface as the MySQL backend.
+    """
+    dialect = 'sqlite'
+    display_name = 'SQLite'
+    for_update = ''  # BEGIN IMMEDIATE already holds the write lock
+    now_sql = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"  # as the column defaults
+    error_class = sqlite3.Error
+    connection_errors = ()  # no replicas to eject
+
+    def __init__(self, path=None):
+        super().__init__(config={'path': path or Config.SQLITE_PATH})
+
+    def _open_connection(self):
+        """Open a sqlite connection configured for concurrent use"""
+        try:
+            connection = sqlite3.connect(
+                self.config['path'],
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                isolation_level=None,       # autocommit, like the MySQL backend
+                check_same_thread=False,    # pooled connections move between threads
+                timeout=Config.DB_POOL_TIMEOUT
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            logger.debug("Opened new pooled SQLite connection")
+            return SQLiteConnection(connection)
+        except sqlite3.Error as e:
+            logger.error(f"Error opening SQLite database: {e}")
+            raise e
+
+    def now(self):
+        # an expression has no declared type, so it comes back as text
+        return datetime.datetime.fromisoformat(super().now())
+
+    def timestamp_key(self, value):
+        """Timestamps are stored as text: whole seconds when written from Python,
+        milliseconds when written by SQLite (column defaults, the updated_at
+        trigger). Render a value read back the same way, so keyset comparisons
+        against the stored text neither skip nor repeat it.
+        """
+        if value.microsecond == 0:
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        if value.microsecond % 1000 == 0:
+            return value.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        return value.isoformat(' ')
+
+    def insert_ids(self, cursor, count):
+        """Ids generated by the multi-row INSERT just run on `cursor`, in row order.
+
+        sqlite reports the last id; AUTOINCREMENT ids within one statement are
+        consecutive because the statement holds the database write lock.
+        """
+        return list(range(cursor.lastrowid - count + 1, cursor.lastrowid + 1))
@@ -0,0 +1,141 @@
+import os
+import sys
+import datetime
+import pytest
+import mysql.connector
+from mysql.connector import errorcode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# the suite runs in one process, where the default in-memory task list cache applies
+os.environ["WEB_WORKERS"] = "1"
+
+import database  # noqa: E402
+import utils.cache  # noqa: E402
+import utils.metrics  # noqa: E402
+from app import create_app  # noqa: E402
+from modules.user import User  # noqa: E402
+
+
+class FakeCursor:
+    """Stands in for a mysql.connector cursor and records every statement"""
+
+    def __init__(self, server):
+        self.server = server
+        self.rows = []
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def execute(self, query, params=()):
+        self.server.statements.append(" ".join(query.split()))
+        self.rows, self.rowcount, self.lastrowid = self.server.respond(query, params)
+
+    def executemany(self, query, seq_params):
+        for params in seq_params:
+            self.execute(query, params)
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchmany(self, size=1):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self.server)
+
+    def is_connected(self):
+        return True
+
+    def start_transaction(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeServer:
+    """Answers queries with canned rows so endpoints can run without MySQL"""
+
+    def __init__(self):
+        self.statements = []
+        self.users = {}
+        self.stats = None
+        self.now = datetime.datetime(2030, 1, 1, 9, 30)
+
+    def respond(self, query, params):
+        q = " ".join(query.split()).upper()
+        if q.startswith("INSERT INTO USERS"):
+            if any(u["email"] == params[1] for u in self.users.values()):
+                raise mysql.connector.IntegrityError(
+                    errno=errorcode.ER_DUP_ENTRY, msg="Duplicate entry")
+            user_id = len(self.users) + 1
+            self.users[user_id] = {
+                "id": user_id, "name": params[0], "email": params[1],
+                "password_hash": params[2], "is_active": True,
+                "created_at": self.now, "updated_at": self.now,
+            }
+            return [], 1, user_id
+        if q.startswith("SELECT ID, CREATED_AT, UPDATED_AT FROM"):
+            # a row just inserted, read back for its column-default timestamps
+            return [{"id": params[0], "created_at": self.now, "updated_at": self.now}], -1, None
+        if q.startswith("SELECT NOW(6)"):
+            return [{"now": self.now}], -1, None
+        if q.startswith("SELECT * FROM USERS WHERE EMAIL"):
+            return [u for u in self.users.values() if u["email"] == params[0]], -1, None
+        if q.startswith("SELECT * FROM USERS WHERE ID"):
+            return [u for u in self.users.values() if u["id"] == int(params[0])], -1, None
+        if q.startswith("SELECT ID, STATUS, PRIORITY, DUE_DATE FROM TASKS"):
+            # every referenced task exists and belongs to the user
+            return [{"id": task_id, "status": "pending", "priority": "medium", "due_date": None}
+                    for task_id in params[1:]], -1, None
+        if q.startswith("SELECT * FROM TASK_STATS"):
+            return [self.stats] if self.stats else [], -1, None
+        if q.startswith("SELECT COUNT(*)"):
+            return [{"total": 0, "last_updated": None, "last_id": None}], -1, None
+        if q.startswith("INSERT"):
+            return [], 1, 1
+        if q.startswith(("UPDATE", "DELETE")):
+            return [], 1, None
+        return [], -1, None
+
+    def reset(self):
+        self.statements.clear()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    fake = FakeServer()
+    monkeypatch.setattr(database.db, "_open_connection", lambda: FakeConnection(fake))
+    monkeypatch.setattr(utils.cache, "_task_cache", None)
+    monkeypatch.setattr(utils.metrics, "_registry", None)
+    # bcrypt runs on a process pool; the query count does not depend on it
+    monkeypatch.setattr(User, "hash_password", staticmethod(lambda password: "plain:" + password))
+    monkeypatch.setattr(User, "check_password",
+                        staticmethod(lambda password_hash, password: password_hash == "plain:" + password))
+    yield fake
+    database.db.disconnect()
+
+
+@pytest.fixture
+def client(server):
+    app = create_app()
+    app.config["TESTING"] = True
+    return app.test_client()
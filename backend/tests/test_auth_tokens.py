@@ -0,0 +1,46 @@
+"""Access tokens carry the user id as the JWT subject and resolve back to it."""
+import datetime
+
+import jwt
+import pytest
+from flask_jwt_extended import verify_jwt_in_request
+from jwt.exceptions import InvalidSubjectError
+
+from app import create_app
+from config import Config
+from routes.tasks import _current_user_id
+
+
+def _user_id_of(client, token):
+    with client.application.test_request_context(headers={"Authorization": f"Bearer {token}"}):
+        verify_jwt_in_request()
+        return _current_user_id()
+
+
+def test_login_token_round_trips_to_the_user_id(client, server):
+    client.post("/api/register", json={
+        "name": "Jane Doe", "email": "jane@example.com", "password": "secret123"})
+    resp = client.post("/api/", json={"email": "jane@example.com", "password": "secret123"})
+    token = resp.get_json()["access_token"]
+    assert jwt.decode(token, options={"verify_signature": False})["sub"] == "1"
+    assert _user_id_of(client, token) == 1
+
+
+def _legacy_token(client):
+    # issued before subjects became strings
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return jwt.encode({"sub": 7, "type": "access", "fresh": False, "jti": "legacy",
+                       "iat": now, "nbf": now, "exp": now + datetime.timedelta(hours=1)},
+                      client.application.config["JWT_SECRET_KEY"], algorithm="HS256")
+
+
+def test_token_with_an_integer_subject_is_accepted_during_the_transition(client):
+    assert _user_id_of(client, _legacy_token(client)) == 7
+
+
+def test_subject_verification_returns_once_the_transition_is_over(client, monkeypatch):
+    monkeypatch.setattr(Config, "JWT_ACCEPT_INT_SUBJECTS", False)
+    app = create_app()
+    with app.test_request_context(headers={"Authorization": f"Bearer {_legacy_token(client)}"}):
+        with pytest.raises(InvalidSubjectError):
+            verify_jwt_in_request()
@@ -0,0 +1,86 @@
+"""Accept-Encoding negotiation, the size threshold, streaming and the ETag-keyed body cache."""
+import gzip
+import zlib
+
+import pytest
+from flask import Flask, Response
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from config import Config
+from utils import compression
+from utils.etag import is_not_modified, not_modified
+
+BODY = b'{"tasks": [' + b",".join(b'{"title": "task %d"}' % i for i in range(200)) + b"]}"
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(compression, "_body_cache", None)
+    monkeypatch.setattr(Config, "COMPRESSION_MIN_SIZE", 1024)
+    app = Flask(__name__)
+    compression.init_app(app)
+
+    @app.get("/tasks")
+    def tasks():
+        if is_not_modified("v1"):
+            return not_modified("v1")
+        response = Response(BODY, mimetype="application/json")
+        response.set_etag("v1")
+        return response
+
+    @app.get("/small")
+    def small():
+        return Response(b'{"ok": true}', mimetype="application/json")
+
+    @app.get("/export")
+    def export():
+        return Response((f'{{"n": {i}}}\n' for i in range(3)), mimetype="application/x-ndjson")
+
+    return app
+
+
+def test_gzip_is_negotiated_and_round_trips(app):
+    resp = app.test_client().get("/tasks", headers={"Accept-Encoding": "gzip, deflate"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    assert gzip.decompress(resp.get_data()) == BODY
+    assert len(resp.get_data()) < len(BODY) / 4
+
+
+def test_identity_without_accept_encoding_or_below_threshold(app):
+    client = app.test_client()
+    assert "Content-Encoding" not in client.get("/tasks").headers
+    assert "Content-Encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_repeated_etag_response_is_compressed_once(app):
+    client = app.test_client()
+    first = client.get("/tasks", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/tasks", headers={"Accept-Encoding": "gzip"})
+    assert first.get_data() == second.get_data()
+    assert compression.get_body_cache().stats()["hits"] == 1
+    # the compressed representation is only weakly equal, and still revalidates
+    assert first.headers["ETag"] == 'W/"v1"'
+    again = client.get("/tasks", headers={"Accept-Encoding": "gzip", "If-None-Match": 'W/"v1"'})
+    assert again.status_code == 304
+
+
+def test_streamed_responses_are_flushed_per_chunk(app):
+    resp = app.test_client().get("/export", headers={"Accept-Encoding": "gzip"}, buffered=False)
+    assert resp.headers["Content-Encoding"] == "gzip"
+    decoder = zlib.decompressobj(31)
+    chunks = iter(resp.response)
+    # every chunk decodes on its own, before the stream has finished
+    assert decoder.decompress(next(chunks)) == b'{"n": 0}\n'
+    rest = b"".join(decoder.decompress(chunk) for chunk in chunks)
+    assert rest == b'{"n": 1}\n{"n": 2}\n'
+    resp.close()
+
+
+def test_negotiation_prefers_higher_quality_then_server_order():
+    codecs = {"br": None, "gzip": None}
+    accept = lambda value: parse_accept_header(value, Accept)  # noqa: E731
+    assert compression.negotiate(accept("gzip, br"), codecs) == "br"
+    assert compression.negotiate(accept("gzip;q=1.0, br;q=0.5"), codecs) == "gzip"
+    assert compression.negotiate(accept("identity"), codecs) is None
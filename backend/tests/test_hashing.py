@@ -0,0 +1,40 @@
+"""The password hasher's queue bound and recovery from a broken worker pool."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from utils import hashing
+
+
+class BrokenExecutor:
+    def submit(self, fn, *args):
+        raise BrokenProcessPool("A child process terminated abruptly")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def test_timed_out_job_keeps_its_slot_until_it_finishes():
+    hasher = hashing.PasswordHasher(max_pending=1, timeout=0.01)
+    hasher._executor = ThreadPoolExecutor(1)
+    release = threading.Event()
+    with pytest.raises(hashing.HasherBusy, match="timed out"):
+        hasher._run(release.wait)
+    with pytest.raises(hashing.HasherBusy, match="queue is full"):
+        hasher._run(release.wait)
+    assert hasher.stats()["pending"] == 1
+
+    release.set()
+    hasher._executor.shutdown(wait=True)
+    assert hasher.stats()["pending"] == 0
+
+
+def test_broken_pool_is_replaced(monkeypatch):
+    monkeypatch.setattr(hashing, "ProcessPoolExecutor", lambda **kwargs: ThreadPoolExecutor(1))
+    hasher = hashing.PasswordHasher(max_pending=1)
+    hasher._executor = BrokenExecutor()
+    assert hasher._run(sum, (1, 2)) == 3
+    assert isinstance(hasher._executor, ThreadPoolExecutor)
+    assert hasher.stats()["pending"] == 0
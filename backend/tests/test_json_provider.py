@@ -0,0 +1,82 @@
+"""Both encoders give the same JSON for the types rows come back with, and API
+responses keep the date format of Flask's default provider."""
+import enum
+import json
+import decimal
+import datetime
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from utils import json_provider
+
+
+class Status(enum.Enum):
+    DONE = "completed"
+
+
+ROW = {
+    "id": 7,
+    "due_date": datetime.date(2025, 9, 10),
+    "created_at": datetime.datetime(2025, 9, 10, 12, 30, 5, 250000),
+    "amount": decimal.Decimal("12.50"),
+    "status": Status.DONE,
+    "duration": datetime.timedelta(minutes=90),
+    "title": "café",
+}
+EXPECTED = {"id": 7, "due_date": "2025-09-10", "created_at": "2025-09-10T12:30:05.250000",
+            "amount": "12.50", "status": "completed", "duration": 5400.0, "title": "café"}
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson" and json_provider.orjson is None:
+        pytest.skip("orjson is not installed")
+    monkeypatch.setattr(json_provider, "_fast", request.param == "orjson")
+    return request.param
+
+
+def test_db_types_encode_the_same(encoder):
+    assert json.loads(json_provider.dumps(ROW)) == EXPECTED
+
+
+def test_rowset_shares_one_header(encoder):
+    rows = json_provider.RowSet.from_dicts(["id", "created_at"], [ROW, {**ROW, "id": 8}])
+    assert json.loads(json_provider.dumps({"tasks": rows})) == {"tasks": {
+        "columns": ["id", "created_at"],
+        "rows": [[7, "2025-09-10T12:30:05.250000"], [8, "2025-09-10T12:30:05.250000"]],
+    }}
+
+
+def test_unknown_types_raise(encoder):
+    with pytest.raises(TypeError):
+        json_provider.dumps({"x": object()})
+
+
+def test_provider_keeps_key_order_and_parses_requests(encoder):
+    app = Flask(__name__)
+    app.debug = False  # .env may set FLASK_DEBUG, which pretty-prints
+    app.json = json_provider.FastJSONProvider(app)
+    with app.app_context():
+        body = app.json.response({"b": 1, "a": 2}).get_data()
+        assert body == b'{"b":1,"a":2}'
+        assert app.json.loads(b'{"a": [1, 2]}') == {"a": [1, 2]}
+
+
+def test_responses_write_dates_like_flasks_default_provider(encoder):
+    app = Flask(__name__)
+    app.debug = False
+    dates = {
+        "created_at": ROW["created_at"],
+        "due_date": ROW["due_date"],
+        "aware": datetime.datetime(2025, 12, 31, 23, 59, 59,
+                                   tzinfo=datetime.timezone(datetime.timedelta(hours=-5))),
+        "leap_day": datetime.datetime(2024, 2, 29, 0, 0, 1),
+    }
+    default = DefaultJSONProvider(app)
+    app.json = json_provider.FastJSONProvider(app)
+    with app.app_context():
+        assert json.loads(app.json.response(dates).get_data()) == json.loads(default.response(dates).get_data())
+        assert json.loads(app.json.dumps(dates)) == json.loads(default.dumps(dates))
+        assert json.loads(app.json.dumps(dates))["aware"] == "Thu, 01 Jan 2026 04:59:59 GMT"
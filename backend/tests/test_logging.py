@@ -0,0 +1,43 @@
+"""JSON formatting, sampling and the non-blocking log queue."""
+import json
+import queue
+import logging
+
+from utils import log
+
+
+def _record(level=logging.INFO, **extra):
+    record = logging.makeLogRecord({"name": "t", "levelno": level,
+                                    "levelname": logging.getLevelName(level),
+                                    "msg": "user %s logged in", "args": ("jane",)})
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    entry = json.loads(log.JsonFormatter().format(_record(user_id=7, request_id="r1")))
+    assert entry["msg"] == "user jane logged in"
+    assert entry["level"] == "INFO"
+    assert entry["user_id"] == 7
+    assert entry["request_id"] == "r1"
+
+
+def test_unsampled_requests_keep_only_warnings():
+    token = log._sampled.set(False)
+    try:
+        sampler = log.SamplingFilter()
+        assert not sampler.filter(_record(logging.INFO))
+        assert sampler.filter(_record(logging.ERROR))
+    finally:
+        log._sampled.reset(token)
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = log.AsyncQueueHandler(queue.Queue(1))
+    handler.handle(_record())
+    handler.handle(_record())
+    assert handler.dropped == 1
+
+
+def test_route_rates_parse():
+    assert log._parse_route_rates("/api/tasks=0.05, /api/=0.5") == {"/api/tasks": 0.05, "/api/": 0.5}
@@ -0,0 +1,74 @@
+"""/metrics exposes request, query and runtime metrics in Prometheus text format."""
+import os
+import json
+import threading
+
+from utils.metrics import Registry, query_shape
+
+
+def test_request_and_query_metrics(client, server):
+    client.post("/api/register", json={
+        "name": "Jane Doe", "email": "jane@example.com", "password": "secret123"})
+    client.get("/api/health")
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'taskflux_http_requests_total{method="POST",route="/api/register",status="201"} 1' in text
+    assert 'taskflux_http_request_duration_seconds_count{method="GET",route="/api/health"} 1' in text
+    assert 'taskflux_db_query_duration_seconds_count{shape="INSERT INTO users' in text
+    assert 'taskflux_db_pool_connections{state="in_use"} 0' in text
+    assert "taskflux_bcrypt_pending 0" in text
+
+
+def test_counts_from_many_threads_are_not_lost():
+    registry = Registry()
+    counter = registry.counter("hits_total", "Hits", ("kind",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc(kind="a")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert registry.snapshot()[("hits_total", ("a",))] == 8000
+
+
+def test_worker_files_are_merged(tmp_path):
+    first, second = Registry(str(tmp_path)), Registry(str(tmp_path))
+    for registry in (first, second):
+        registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1)).observe(0.5)
+    # both registries live in this process; file the second one under pid 1
+    second.flush()
+    (tmp_path / f"metrics-{os.getpid()}.json").rename(tmp_path / "metrics-1.json")
+    first.flush()
+
+    text = first.render()
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert "latency_seconds_count 2" in text
+
+
+def test_query_shape_collapses_lists():
+    assert query_shape("SELECT id, title\n  FROM tasks WHERE id IN (%s, %s, %s)") == \
+        "SELECT ... FROM tasks WHERE id IN (...)"
+    assert query_shape("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)") == \
+        "INSERT INTO t (a, b) VALUES (%s, %s), ..."
+
+
+def test_exited_worker_is_folded_in_and_its_file_removed(tmp_path):
+    scraper, exited = Registry(str(tmp_path)), Registry(str(tmp_path))
+    for registry in (scraper, exited):
+        registry.counter("hits_total", "Hits").inc()
+    exited.flush()
+    (tmp_path / f"metrics-{os.getpid()}.json").rename(tmp_path / "metrics-1.json")
+
+    scraper.retire(1)
+    assert not (tmp_path / "metrics-1.json").exists()
+    assert "hits_total 2" in scraper.render()
+
+    # a scrape that listed the worker's file before it was folded still counts it once
+    stale = tmp_path / "metrics-1.json"
+    stale.write_text(json.dumps({"pid": 1, "id": exited._id, "samples": [["hits_total", [], 1]],
+                                 "gauges": []}))
+    assert "hits_total 2" in scraper.render()
@@ -0,0 +1,91 @@
+"""Checkout limits, recycling, health checks and shutdown of the connection pool."""
+import types
+
+import pytest
+
+from utils import pool as pool_module
+from utils.pool import ConnectionPool, PoolClosed, PoolTimeout
+
+
+class Conn:
+    def __init__(self, n):
+        self.n = n
+        self.alive = True
+        self.closed = False
+
+    def is_connected(self):
+        return self.alive
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(pool_module, "time", fake)
+    return fake
+
+
+def _pool(**kwargs):
+    opened = []
+
+    def factory():
+        opened.append(Conn(len(opened)))
+        return opened[-1]
+
+    return ConnectionPool(factory, min_size=0, **kwargs), opened
+
+
+def test_exhausted_pool_times_out():
+    pool, _ = _pool(max_size=1, timeout=0.01)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1 and pool.stats()["waits"] == 1
+    pool.release(held)
+    assert pool.acquire() is held
+
+
+def test_connections_past_max_lifetime_or_max_idle_are_recycled(clock):
+    pool, opened = _pool(max_lifetime=60, max_idle=10, ping_interval=1000)
+    first = pool.acquire()
+    pool.release(first)
+    clock.now += 11  # idle too long
+    second = pool.acquire()
+    assert second is not first and first.closed
+
+    clock.now += 61  # in use the whole time, but too old to go back into the pool
+    pool.release(second)
+    assert second.closed and pool.stats()["idle"] == 0
+    assert pool.stats()["recycled"] == 2 and len(opened) == 2
+
+
+def test_broken_connections_are_discarded_on_return_and_on_ping(clock):
+    pool, opened = _pool(ping_interval=30)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.alive = False
+            raise RuntimeError("lost connection mid-statement")
+    assert conn.closed and pool.stats()["size"] == 0
+
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.alive = False  # dropped by the server while idle
+    clock.now += 30
+    fresh = pool.acquire()
+    assert fresh is not conn and conn.closed
+    assert pool.stats()["failed_checks"] == 1 and len(opened) == 3
+
+
+def test_close_refuses_checkouts_and_closes_borrowed_connections_on_return():
+    pool, _ = _pool(max_size=2)
+    borrowed, idle = pool.acquire(), pool.acquire()
+    pool.release(idle)
+    pool.close()
+    assert idle.closed and not borrowed.closed
+    with pytest.raises(PoolClosed):
+        pool.acquire()
+    pool.release(borrowed)
+    assert borrowed.closed and pool.stats()["size"] == 0
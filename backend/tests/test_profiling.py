@@ -0,0 +1,52 @@
+"""Query hooks, slow-query log, N+1 warning and Server-Timing header."""
+import logging
+
+import database
+from config import Config
+from flask_jwt_extended import create_access_token
+
+
+def _auth_headers(client, user_id="1"):
+    with client.application.app_context():
+        token = create_access_token(identity=user_id)
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_hooks_receive_shape_rows_and_request(client, server):
+    events = []
+    database.db.add_query_hook(events.append)
+    try:
+        resp = client.post("/api/tasks", json={"title": "Write report"},
+                           headers={**_auth_headers(client), "X-Request-ID": "req-42"})
+    finally:
+        database.db.remove_query_hook(events.append)
+
+    assert resp.headers["X-Request-ID"] == "req-42"
+    event, read_back, stats_event = events
+    assert event.shape.startswith("INSERT INTO tasks")
+    assert read_back.shape == "SELECT ... FROM tasks WHERE id=%s"
+    assert stats_event.shape.startswith("UPDATE task_stats")
+    assert event.rows == 1
+    assert event.request_id == "req-42"
+    assert event.duration >= 0
+
+
+def test_server_timing_header(client, server, monkeypatch):
+    monkeypatch.setattr(Config, "SERVER_TIMING", True)
+    resp = client.get("/api/tasks", headers=_auth_headers(client))
+    assert resp.headers["Server-Timing"].startswith('db;dur=')
+    assert 'desc="2 queries"' in resp.headers["Server-Timing"]
+
+
+def test_slow_queries_are_logged(client, server, monkeypatch, caplog):
+    monkeypatch.setattr(Config, "SLOW_QUERY_MS", 0.000001)
+    with caplog.at_level(logging.WARNING, logger="slow_query"):
+        client.put("/api/tasks/1", json={"status": "completed"}, headers=_auth_headers(client))
+    assert any("Slow query" in r.message and "UPDATE tasks" in r.message for r in caplog.records)
+
+
+def test_too_many_queries_in_one_request_warns(client, server, monkeypatch, caplog):
+    monkeypatch.setattr(Config, "QUERY_COUNT_WARN", 1)
+    with caplog.at_level(logging.WARNING, logger="utils.profiling"):
+        client.get("/api/tasks", headers=_auth_headers(client))
+    assert any("possible N+1" in r.message for r in caplog.records)
@@ -0,0 +1,52 @@
+"""Fan-out, per-user isolation, bounded buffers and the stream limit of the event broker."""
+import json
+
+import pytest
+
+from utils import pubsub
+
+
+@pytest.fixture
+def broker():
+    return pubsub.Broker(pubsub.MemoryBackend(), max_buffered=3, max_subscribers=3)
+
+
+def _events(frames):
+    parsed = []
+    for frame in frames:
+        lines = dict(line.split(": ", 1) for line in frame.strip().splitlines())
+        parsed.append((lines["event"], json.loads(lines["data"])))
+    return parsed
+
+
+def test_events_reach_every_stream_of_that_user_only(broker):
+    first, second, other = broker.subscribe(1), broker.subscribe(1), broker.subscribe(2)
+    broker.publish(1, "task.deleted", {"id": 7})
+    assert _events(first.next_frames(0)) == [("task.deleted", {"id": 7})]
+    assert first.next_frames(0) == []
+    assert _events(second.next_frames(0)) == [("task.deleted", {"id": 7})]
+    assert other.next_frames(0) == []
+    assert broker.stats()["delivered"] == 2
+
+
+def test_slow_stream_is_disconnected_instead_of_buffering_without_limit(broker):
+    slow, keeping_up = broker.subscribe(1), broker.subscribe(1)
+    for i in range(4):
+        broker.publish(1, "task.updated", {"id": i})
+        keeping_up.next_frames(0)
+    assert slow.closed == "slow"
+    assert len(slow.next_frames(0)) == 3  # what it had buffered is still handed over
+    assert keeping_up.closed is None
+    assert broker.stats()["slow_disconnects"] == 1 and broker.stats()["subscribers"] == 1
+
+
+def test_streams_beyond_the_limit_are_refused(broker):
+    subscriptions = [broker.subscribe(1) for _ in range(3)]
+    assert broker.subscribe(2) is None
+    broker.unsubscribe(subscriptions[0])
+    assert subscriptions[0].closed == "unsubscribed"
+    assert broker.subscribe(2) is not None
+
+    broker.close()
+    assert all(s.closed for s in subscriptions)
+    assert broker.stats()["subscribers"] == 0
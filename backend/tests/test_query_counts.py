@@ -0,0 +1,109 @@
+"""Each endpoint should cost a fixed, small number of SQL round trips."""
+from flask_jwt_extended import create_access_token
+
+
+def _auth_headers(client, user_id="1"):
+    with client.application.app_context():
+        token = create_access_token(identity=user_id)
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_register_is_insert_and_timestamp_read_back(client, server):
+    resp = client.post("/api/register", json={
+        "name": "Jane Doe", "email": "jane@example.com", "password": "secret123"})
+    assert resp.status_code == 201
+    assert resp.get_json()["user"]["id"] == 1
+    assert [q.split()[0] for q in server.statements] == ["INSERT", "SELECT"]
+
+
+def test_duplicate_register_relies_on_unique_constraint(client, server):
+    body = {"name": "Jane Doe", "email": "jane@example.com", "password": "secret123"}
+    client.post("/api/register", json=body)
+    server.reset()
+    resp = client.post("/api/register", json=body)
+    assert resp.status_code == 400
+    assert "already exists" in resp.get_json()["message"]
+    assert len(server.statements) == 1
+
+
+def test_login_is_one_statement(client, server):
+    client.post("/api/register", json={
+        "name": "Jane Doe", "email": "jane@example.com", "password": "secret123"})
+    server.reset()
+    resp = client.post("/api/", json={"email": "jane@example.com", "password": "secret123"})
+    assert resp.status_code == 200
+    assert len(server.statements) == 1
+
+
+def test_profile_is_one_statement(client, server):
+    client.post("/api/register", json={
+        "name": "Jane Doe", "email": "jane@example.com", "password": "secret123"})
+    server.reset()
+    resp = client.get("/api/profile", headers=_auth_headers(client))
+    assert resp.status_code == 200
+    assert len(server.statements) == 1
+
+
+def test_create_task_is_insert_read_back_plus_stats(client, server):
+    resp = client.post("/api/tasks", json={"title": "Write report"},
+                       headers=_auth_headers(client))
+    assert resp.status_code == 201
+    task = resp.get_json()["task"]
+    assert task["id"] == 1
+    # timestamps come from the database, not the app server's clock
+    assert task["created_at"] == task["updated_at"] == "Tue, 01 Jan 2030 09:30:00 GMT"
+    assert [q.split()[0] for q in server.statements] == ["INSERT", "SELECT", "UPDATE"]
+
+
+def test_update_task_status_reads_old_state_and_adjusts_stats(client, server):
+    resp = client.put("/api/tasks/1", json={"status": "completed"},
+                      headers=_auth_headers(client))
+    assert resp.status_code == 200
+    assert resp.get_json()["task"] == {"id": 1, "status": "completed"}
+    assert len(server.statements) == 3
+
+
+def test_update_task_title_is_one_statement(client, server):
+    resp = client.put("/api/tasks/1", json={"title": "Renamed"},
+                      headers=_auth_headers(client))
+    assert resp.status_code == 200
+    assert len(server.statements) == 1
+
+
+def test_delete_task_reads_old_state_adjusts_stats_and_leaves_a_tombstone(client, server):
+    resp = client.delete("/api/tasks/1", headers=_auth_headers(client))
+    assert resp.status_code == 200
+    assert [q.split()[0] for q in server.statements] == ["SELECT", "DELETE", "INSERT", "UPDATE"]
+
+
+def test_sync_is_a_clock_read_and_two_range_scans(client, server):
+    headers = _auth_headers(client)
+    resp = client.get("/api/tasks/changes", headers=headers)
+    assert resp.status_code == 200
+    # the cutoff comes from the database clock that stamps updated_at and deleted_at
+    assert server.statements[0] == "SELECT NOW(6) AS now"
+    assert len(server.statements) == 3
+    server.reset()
+    resp = client.get(f"/api/tasks/changes?since={resp.get_json()['next_token']}", headers=headers)
+    assert resp.status_code == 200
+    assert len(server.statements) == 3
+
+
+def test_task_stats_is_one_statement(client, server):
+    server.stats = {"user_id": 1, "pending": 3, "in_progress": 1, "completed": 2,
+                    "priority_low": 1, "priority_medium": 4, "priority_high": 1, "overdue": 1,
+                    "overdue_as_of": None, "next_due": None, "reconciled_at": None}
+    resp = client.get("/api/tasks/stats", headers=_auth_headers(client))
+    assert resp.status_code == 200
+    assert resp.get_json()["stats"]["total"] == 6
+    assert len(server.statements) == 1
+
+
+def test_list_tasks_hits_database_once_per_change(client, server):
+    headers = _auth_headers(client)
+    assert client.get("/api/tasks", headers=headers).status_code == 200
+    assert len(server.statements) == 2  # version check + page
+
+    server.reset()
+    assert client.get("/api/tasks", headers=headers).status_code == 200
+    assert len(server.statements) == 0  # served from the task list cache
@@ -0,0 +1,173 @@
+"""Read replica routing: load balancing, ejection, and read-your-writes pinning."""
+import mysql.connector
+import pytest
+from flask_jwt_extended import create_access_token
+
+import database
+from app import create_app
+from conftest import FakeConnection, FakeServer
+from utils import replicas
+from utils.pool import ConnectionPool, PoolTimeout
+
+
+class FlakyServer(FakeServer):
+    """A replica that can be taken down"""
+
+    def __init__(self):
+        super().__init__()
+        self.down = False
+
+    def respond(self, query, params):
+        if self.down:
+            raise mysql.connector.errors.OperationalError(msg="Lost connection to MySQL server")
+        return super().respond(query, params)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _replica_set(count, clock, **kwargs):
+    return replicas.ReplicaSet(
+        [replicas.Replica(f"r{i}", ConnectionPool(lambda: FakeConnection(FakeServer()), min_size=0))
+         for i in range(count)], clock=clock, **kwargs)
+
+
+@pytest.fixture
+def replica(server, monkeypatch):
+    fake = FlakyServer()
+    monkeypatch.setattr(database.db, "replica_configs", [{"host": "replica1"}])
+    monkeypatch.setattr(database.db, "_open_connection",
+                        lambda config=None: FakeConnection(fake if config else server))
+    monkeypatch.setattr(replicas, "_pins", None)
+    yield fake
+    database.db.disconnect()
+
+
+@pytest.fixture
+def replica_client(replica):
+    app = create_app()
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+def _auth(client, user_id):
+    with client.application.app_context():
+        return {"Authorization": f"Bearer {create_access_token(identity=user_id)}"}
+
+
+def test_reads_go_to_the_least_busy_replica_and_rotate_among_ties():
+    replica_set = _replica_set(2, Clock())
+    first, second = replica_set.acquire(), replica_set.acquire()
+    assert second is not first
+    replica_set.release(first)
+    assert replica_set.acquire() is first  # the idle one, not the busy `second`
+    replica_set.release(first)
+    replica_set.release(second)
+    picked = []
+    for _ in range(4):
+        replica = replica_set.acquire()
+        picked.append(replica.name)
+        replica_set.release(replica)
+    assert picked == ["r1", "r0", "r1", "r0"]
+
+
+def test_ejected_replica_sits_out_a_doubling_cooldown():
+    clock = Clock()
+    replica_set = _replica_set(1, clock, eject_seconds=5)
+    [only] = replica_set.replicas
+    replica_set.eject(only, "refused")
+    assert replica_set.acquire() is None
+    clock.now += 5
+    assert replica_set.acquire() is only
+    replica_set.release(only, ok=False)
+    replica_set.eject(only, "refused again")  # failed again on the first read back
+    clock.now += 9
+    assert replica_set.acquire() is None
+    clock.now += 1
+    assert replica_set.acquire() is only
+    assert replica_set.stats()[0]["ejections"] == 2
+
+
+def test_lag_check_ejects_lagging_and_stopped_replicas_and_restores_them():
+    lags = {"r0": 0.5, "r1": 30.0, "r2": None}
+    replica_set = _replica_set(3, Clock(), max_lag=5)
+    replica_set.lag_probe = lambda connection: lags.pop(next(iter(lags)))
+    replica_set.check()
+    assert [r["up"] for r in replica_set.stats()] == [True, False, False]
+    assert replica_set.stats()[2]["reason"] == "replication stopped"
+    replica_set.lag_probe = lambda connection: 1.0
+    replica_set.check()
+    assert all(r["up"] for r in replica_set.stats())
+
+
+def test_only_plain_selects_are_read_only():
+    assert replicas.is_read_only(" select * from tasks")
+    assert not replicas.is_read_only("SELECT * FROM task_stats WHERE user_id=%s FOR UPDATE")
+    assert not replicas.is_read_only("SELECT GET_LOCK(%s, 0)")
+    assert not replicas.is_read_only("UPDATE users SET password_hash=%s WHERE id=%s")
+
+
+def test_user_reads_from_the_primary_after_writing_then_back_to_replica(replica_client, server, replica):
+    alice, bob = _auth(replica_client, "1"), _auth(replica_client, "2")
+    assert replica_client.get("/api/tasks", headers=alice).status_code == 200
+    assert replica.statements and not server.statements
+
+    replica.reset()
+    assert replica_client.post("/api/tasks", json={"title": "Write report"}, headers=alice).status_code == 201
+    server.reset()
+    assert replica_client.get("/api/tasks", headers=alice).status_code == 200
+    assert server.statements and not replica.statements  # pinned: sees its own create
+
+    server.reset()
+    assert replica_client.get("/api/tasks", headers=bob).status_code == 200
+    assert replica.statements and not server.statements  # other users are not pinned
+
+    replicas.get_pins().backend.delete("pin:1")  # the pin window has passed
+    replica.reset()
+    replica_client.get("/api/tasks?status=pending", headers=alice)
+    assert replica.statements and not server.statements
+
+
+def test_sync_always_reads_the_primary(replica_client, server, replica):
+    resp = replica_client.get("/api/tasks/changes", headers=_auth(replica_client, "1"))
+    assert resp.status_code == 200
+    assert len(server.statements) == 3 and not replica.statements
+
+
+def test_unreachable_replica_is_ejected_and_reads_fall_back_to_primary(replica_client, server, replica):
+    replica.down = True
+    assert replica_client.get("/api/tasks", headers=_auth(replica_client, "1")).status_code == 200
+    assert server.statements
+    [stats] = database.db.pool_stats()["replicas"]
+    assert not stats["up"] and stats["ejections"] == 1
+
+
+def test_per_process_pins_under_several_workers_are_reported(monkeypatch, caplog):
+    monkeypatch.setattr(replicas, "_pins", None)
+    monkeypatch.setattr(replicas.Config, "CACHE_BACKEND", "none")
+    monkeypatch.setattr(replicas.Config, "WEB_WORKERS", 4)
+    with caplog.at_level("ERROR", logger="utils.replicas"):
+        replicas.get_pins()
+    assert "CACHE_BACKEND=redis" in caplog.text
+
+
+def test_busy_replica_stays_in_rotation_while_reads_use_the_primary(replica_client, server, replica,
+                                                                    monkeypatch):
+    [busy] = database.db.replicas.replicas
+
+    def exhausted(timeout=None):
+        raise PoolTimeout("No pooled connection became free")
+
+    monkeypatch.setattr(busy.pool, "connection", exhausted)
+    monkeypatch.setattr(busy.pool, "acquire", exhausted)
+    headers = _auth(replica_client, "1")
+    assert replica_client.get("/api/tasks", headers=headers).status_code == 200
+    assert replica_client.get("/api/tasks/export?format=ndjson", headers=headers).status_code == 200
+    assert server.statements and not replica.statements
+    [stats] = database.db.pool_stats()["replicas"]
+    assert stats["up"] and stats["ejections"] == 0 and stats["overflows"] == stats["reads"] > 0
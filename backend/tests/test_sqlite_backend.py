@@ -0,0 +1,532 @@
+"""The whole API runs against the embedded SQLite backend, no MySQL needed."""
+import os
+import sys
+import time
+import subprocess
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+import database
+import migrations
+import utils.cache
+from config import Config
+from app import create_app
+from modules.user import User
+from sqlite_database import SQLiteDatabase
+
+
+@pytest.fixture
+def sqlite_db(monkeypatch, tmp_path):
+    db = SQLiteDatabase(str(tmp_path / "tasks.db"))
+    monkeypatch.setattr(database, "db", db)
+    monkeypatch.setattr(utils.cache, "_task_cache", None)
+    monkeypatch.setattr(User, "hash_password", staticmethod(lambda password: "plain:" + password))
+    monkeypatch.setattr(User, "check_password",
+                        staticmethod(lambda password_hash, password: password_hash == "plain:" + password))
+    db.create_tables()
+    yield db
+    db.disconnect()
+
+
+@pytest.fixture
+def api(sqlite_db):
+    app = create_app()
+    app.config["TESTING"] = True
+    client = app.test_client()
+    resp = client.post("/api/register", json={
+        "name": "Jane Doe", "email": "jane@example.com", "password": "secret123"})
+    assert resp.status_code == 201
+    with app.app_context():
+        token = create_access_token(identity=str(resp.get_json()["user"]["id"]))
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    return client
+
+
+def test_journal_mode_is_wal(sqlite_db):
+    row = sqlite_db.execute_query("PRAGMA journal_mode", fetch=True)
+    assert row["journal_mode"] == "wal"
+
+
+def test_migrations_are_idempotent_and_plans_use_indexes(sqlite_db):
+    assert migrations.is_current(sqlite_db)
+    assert migrations.migrate(sqlite_db) == []
+    assert migrations.check_query_plans(sqlite_db) == []
+
+
+def test_fresh_database_is_not_current(tmp_path):
+    db = SQLiteDatabase(str(tmp_path / "empty.db"))
+    try:
+        assert not migrations.is_current(db)
+    finally:
+        db.disconnect()
+
+
+def test_startup_report_has_phases(api):
+    report = api.get("/api/health/startup").get_json()["startup"]
+    assert {"app_created", "first_request"} <= set(report["phases_ms"])
+
+
+def test_creating_the_app_leaves_optional_packages_unloaded():
+    optional = ["mysql.connector", "bcrypt", "redis", "brotli", "zstandard"]
+    env = dict(os.environ, DB_BACKEND="sqlite", COMPRESSION_ENABLED="false", CACHE_BACKEND="memory")
+    script = ("import sys, app; app.create_app(); "
+              f"print([m for m in {optional!r} if m in sys.modules])")
+    out = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True)
+    assert out.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_list_tasks_as_rows_pages_like_objects(api):
+    for i in range(3):
+        assert api.post("/api/tasks", json={"title": f"t{i}", "due_date": "2025-09-10"}).status_code == 201
+
+    objects = api.get("/api/tasks?limit=2&fields=title,due_date").get_json()
+    rows = api.get("/api/tasks?limit=2&fields=title,due_date&shape=rows").get_json()
+    assert rows["tasks"]["columns"] == ["id", "title", "due_date"]
+    assert [dict(zip(rows["tasks"]["columns"], r)) for r in rows["tasks"]["rows"]] == objects["tasks"]
+    assert objects["tasks"][0]["due_date"] == "Wed, 10 Sep 2025 00:00:00 GMT"
+    assert rows["next_cursor"] == objects["next_cursor"]
+
+    rest = api.get(f"/api/tasks?shape=rows&cursor={rows['next_cursor']}").get_json()
+    assert [r[rest["tasks"]["columns"].index("title")] for r in rest["tasks"]["rows"]] == ["t0"]
+
+
+def test_duplicate_email_is_rejected(api):
+    resp = api.post("/api/register", json={
+        "name": "Jane Again", "email": "jane@example.com", "password": "secret123"})
+    assert resp.status_code == 400
+    assert "already exists" in resp.get_json()["message"]
+
+
+def test_task_crud_and_paging(api):
+    ids = [api.post("/api/tasks", json={"title": f"Task {n}"}).get_json()["task"]["id"]
+           for n in range(5)]
+
+    page = api.get("/api/tasks?limit=3").get_json()
+    assert [t["id"] for t in page["tasks"]] == ids[::-1][:3]
+    rest = api.get(f"/api/tasks?limit=3&cursor={page['next_cursor']}").get_json()
+    assert [t["id"] for t in rest["tasks"]] == ids[::-1][3:]
+    assert rest["next_cursor"] is None
+
+    assert api.put(f"/api/tasks/{ids[0]}", json={"status": "completed"}).status_code == 200
+    done = api.get("/api/tasks?status=completed").get_json()["tasks"]
+    assert [t["id"] for t in done] == [ids[0]]
+
+    assert api.delete(f"/api/tasks/{ids[1]}").status_code == 200
+    assert api.delete(f"/api/tasks/{ids[1]}").status_code == 404
+
+
+def test_batch_returns_generated_ids(api):
+    resp = api.post("/api/tasks/batch", json={"operations": [
+        {"op": "create", "title": "a"},
+        {"op": "create", "title": "b"},
+        {"op": "delete", "id": 999},
+    ]})
+    body = resp.get_json()
+    assert body["created"] == 2
+    created = [r["id"] for r in body["results"] if r["op"] == "create"]
+    listed = [t["id"] for t in api.get("/api/tasks").get_json()["tasks"]]
+    assert sorted(created) == sorted(listed)
+    assert body["results"][2]["success"] is False
+
+
+def test_malformed_updates_are_rejected_before_any_sql(api):
+    task_id = api.post("/api/tasks", json={"title": "Write report"}).get_json()["task"]["id"]
+    resp = api.post("/api/tasks/batch", json={"operations": [
+        {"op": "create", "title": "kept out with the rest of the batch"},
+        {"op": "update", "id": task_id, "title": {"x": 1}},
+        {"op": "update", "id": task_id, "title": "   "},
+    ]})
+    assert resp.status_code == 400
+    assert resp.get_json()["errors"] == [{"index": 1, "message": "title must be a string"},
+                                         {"index": 2, "message": "title cannot be empty"}]
+
+    assert api.put(f"/api/tasks/{task_id}", json={"title": ["a"]}).status_code == 400
+    assert api.put(f"/api/tasks/{task_id}", json={"title": ""}).status_code == 400
+    resp = api.put(f"/api/tasks/{task_id}", json={"title": " Renamed ", "status": "Completed"})
+    assert resp.status_code == 200
+    [task] = api.get("/api/tasks").get_json()["tasks"]
+    assert (task["title"], task["status"]) == ("Renamed", "completed")
+
+
+def test_import_then_export(api):
+    upload = "\n".join(f'{{"title": "imported {n}", "priority": "high"}}' for n in range(3))
+    resp = api.post("/api/tasks/import?format=ndjson", data=upload,
+                    content_type="application/x-ndjson")
+    assert resp.get_json()["accepted"] == 3
+
+    exported = api.get("/api/tasks/export?format=csv&fields=title,priority").get_data(as_text=True)
+    lines = exported.strip().splitlines()
+    assert lines[0] == "id,title,priority"
+    assert len(lines) == 4
+
+
+def test_import_rejects_non_string_fields_and_reports_committed_rows_on_bad_encoding(api):
+    upload = '{"title": 5}\n{"title": "ok", "status": ["done"]}\n{"title": "kept"}\n'
+    body = api.post("/api/tasks/import?format=ndjson", data=upload,
+                    content_type="application/x-ndjson").get_json()
+    assert (body["accepted"], body["rejected"]) == (1, 2)
+    assert body["errors"][0] == {"line": 1, "message": "title must be a string"}
+
+    # the first batch is committed before the decoder reaches the bad bytes
+    rows = "".join(f'{{"title": "bulk {n}"}}\n' for n in range(2000)).encode()
+    resp = api.post("/api/tasks/import?format=ndjson", data=rows + b'{"title": "\xff"}\n',
+                    content_type="application/x-ndjson")
+    assert resp.status_code == 400
+    accepted = resp.get_json()["accepted"]
+    assert accepted > 0
+    assert api.get("/api/tasks/stats").get_json()["stats"]["total"] == 1 + accepted
+
+
+def _search(api, query):
+    resp = api.get(f"/api/tasks/search?{query}")
+    assert resp.status_code == 200, resp.get_json()
+    return resp.get_json()
+
+
+def test_search_ranks_prefix_matches_and_follows_writes(api):
+    ops = [{"op": "create", "title": "Quarterly report", "description": "numbers"},
+           {"op": "create", "title": "Call Bob", "description": "about the report draft"},
+           {"op": "create", "title": "Buy milk"}]
+    ids = [r["id"] for r in api.post("/api/tasks/batch", json={"operations": ops}).get_json()["results"]]
+
+    # title matches outrank description matches; "rep" is a prefix of "report"
+    found = _search(api, "q=rep&fields=title")
+    assert [t["id"] for t in found["tasks"]] == [ids[0], ids[1]]
+    assert _search(api, "q=report+draft")["tasks"][0]["id"] == ids[1]
+    assert _search(api, "q=milk+report")["tasks"] == []
+
+    api.put(f"/api/tasks/{ids[2]}", json={"title": "Buy milk for the report party"})
+    api.delete(f"/api/tasks/{ids[0]}")
+    assert {t["id"] for t in _search(api, "q=report")["tasks"]} == {ids[1], ids[2]}
+
+
+def test_search_pages_and_stays_within_the_owner(api, sqlite_db, monkeypatch):
+    api.post("/api/tasks/batch", json={"operations": [
+        {"op": "create", "title": f"invoice {i}"} for i in range(5)]})
+    other, _ = User.create_user("Other", "other@example.com", "secret123")
+    sqlite_db.execute_write("INSERT INTO tasks (user_id, title) VALUES (%s, %s)", (other.id, "invoice"))
+
+    first = _search(api, "q=invoice&limit=3")
+    second = _search(api, f"q=invoice&limit=3&offset={first['next_offset']}")
+    assert len(first["tasks"]) == 3 and len(second["tasks"]) == 2
+    assert second["next_offset"] is None
+    assert {t["user_id"] for t in first["tasks"] + second["tasks"]} == {first["tasks"][0]["user_id"]}
+    # operator characters are dropped rather than passed to the index
+    assert len(_search(api, 'q=%22invoice*%20(-')["tasks"]) == 5
+    assert api.get("/api/tasks/search?q=+*").status_code == 400
+
+    monkeypatch.setattr(Config, "SEARCH_RANK_WINDOW", 2)
+    windowed = _search(api, "q=invoice&limit=10&status=pending")
+    assert windowed["truncated"] and len(windowed["tasks"]) == 2
+
+
+def test_search_index_is_built_for_existing_rows(tmp_path):
+    db = SQLiteDatabase(str(tmp_path / "old.db"))
+    try:
+        migrations.migrate(db, target=3)
+        db.execute_write("INSERT INTO users (name, email, password_hash) VALUES ('a', 'a@b.c', 'x')")
+        db.execute_write("INSERT INTO tasks (user_id, title) VALUES (1, 'Renew passport')")
+        assert migrations.migrate(db) == [4, 5, 6, 7]
+        rows = db.execute_query("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH %s",
+                                ('"passport"',), fetch=True)
+        assert len(rows) == 1
+    finally:
+        db.disconnect()
+
+
+def _stats(api):
+    resp = api.get("/api/tasks/stats")
+    assert resp.status_code == 200
+    return resp.get_json()["stats"]
+
+
+def _recomputed(api):
+    """The same numbers counted straight from the task list"""
+    tasks = api.get("/api/tasks?limit=100").get_json()["tasks"]
+    by_status = dict.fromkeys(("pending", "in_progress", "completed"), 0)
+    by_priority = dict.fromkeys(("low", "medium", "high"), 0)
+    for t in tasks:
+        by_status[t["status"]] += 1
+        by_priority[t["priority"]] += 1
+    return {"total": len(tasks), "by_status": by_status, "by_priority": by_priority}
+
+
+def test_stats_follow_every_write_path(api):
+    assert _stats(api) == {"total": 0, "by_status": {"pending": 0, "in_progress": 0, "completed": 0},
+                           "by_priority": {"low": 0, "medium": 0, "high": 0}, "overdue": 0}
+    ids = [api.post("/api/tasks", json={"title": f"t{i}", "priority": p}).get_json()["task"]["id"]
+           for i, p in enumerate(("low", "high", "high"))]
+    api.put(f"/api/tasks/{ids[0]}", json={"status": "completed", "priority": "medium"})
+    api.put(f"/api/tasks/{ids[1]}", json={"title": "renamed"})
+    api.delete(f"/api/tasks/{ids[2]}")
+    api.post("/api/tasks/batch", json={"operations": [
+        {"op": "create", "title": "b", "status": "in_progress"},
+        {"op": "update", "id": ids[1], "status": "in_progress"},
+        {"op": "delete", "id": ids[0]},
+        {"op": "delete", "id": ids[0]},
+    ]})
+    api.post("/api/tasks/import?format=ndjson", data='{"title": "i", "priority": "low"}',
+             content_type="application/x-ndjson")
+
+    stats = _stats(api)
+    assert {k: v for k, v in stats.items() if k != "overdue"} == _recomputed(api)
+    assert stats["by_status"] == {"pending": 1, "in_progress": 2, "completed": 0}
+
+
+def test_overdue_counts_catch_up_with_the_clock(api):
+    from datetime import datetime, timedelta
+    from modules.task_stats import TaskStats
+    now = datetime.now().replace(microsecond=0)
+    soon = now + timedelta(days=1)
+    api.post("/api/tasks", json={"title": "late", "due_date": (now - timedelta(days=1)).isoformat()})
+    soon_id = api.post("/api/tasks", json={"title": "soon", "due_date": soon.isoformat()}).get_json()["task"]["id"]
+    api.post("/api/tasks", json={"title": "done", "status": "completed",
+                                 "due_date": (now - timedelta(days=2)).isoformat()})
+    assert _stats(api)["overdue"] == 1
+
+    later = soon + timedelta(hours=1)
+    assert TaskStats.get(1, later)["overdue"] == 2
+    api.put(f"/api/tasks/{soon_id}", json={"status": "completed"})
+    assert TaskStats.get(1, later)["overdue"] == 1
+    assert TaskStats.reconcile(1, later) == {}
+
+
+def test_reconcile_repairs_drift(api, sqlite_db):
+    from modules import task_stats
+    for i in range(3):
+        api.post("/api/tasks", json={"title": f"t{i}"})
+    assert _stats(api)["total"] == 3  # builds the user's row
+    sqlite_db.execute_write("UPDATE task_stats SET pending = 7, priority_high = 2 WHERE user_id = 1")
+    assert _stats(api)["by_status"]["pending"] == 7
+
+    assert task_stats.TaskStats.reconcile(1) == {"pending": (7, 3), "priority_high": (2, 0)}
+    assert _stats(api)["by_status"]["pending"] == 3
+    assert task_stats.Reconciler(interval=0).run_once() == (1, 0)
+    assert task_stats.main(["reconcile", "--user", "1"]) == 0
+
+
+def test_stats_row_is_built_for_users_without_one(api, sqlite_db):
+    api.post("/api/tasks", json={"title": "t"})
+    sqlite_db.execute_write("DELETE FROM task_stats")
+    assert _stats(api)["total"] == 1
+    assert len(sqlite_db.execute_query("SELECT * FROM task_stats", fetch=True)) == 1
+
+
+@pytest.fixture
+def scheduler(api, monkeypatch):
+    from modules import reminders
+    sched = reminders.ReminderScheduler(reminders.QueueSink(), lookahead=3600, rescan=60, grace=600)
+    monkeypatch.setattr(reminders, "_scheduler", sched)
+    return sched
+
+
+def _fired(scheduler):
+    fired = []
+    while not scheduler.sink.queue.empty():
+        fired.append(scheduler.sink.queue.get_nowait()["title"])
+    return fired
+
+
+def test_reminders_fire_once_for_open_tasks_in_the_window(api, scheduler):
+    from datetime import datetime, timedelta
+    from modules import reminders
+    now = datetime.now().replace(microsecond=0)
+    for title, minutes, status in (("soon", 10, "pending"), ("done", 5, "completed"),
+                                   ("later", 120, "pending"), ("long ago", -60, "pending")):
+        api.post("/api/tasks", json={"title": title, "status": status,
+                                     "due_date": (now + timedelta(minutes=minutes)).isoformat()})
+    assert scheduler.tick(now) == now + timedelta(minutes=1)  # next rescan comes first
+    assert len(scheduler) == 1 and _fired(scheduler) == []
+
+    assert scheduler.tick(now + timedelta(minutes=10)) == now + timedelta(minutes=11)
+    assert _fired(scheduler) == ["soon"]
+    # another process scanning the same window does not send it again
+    other = reminders.ReminderScheduler(reminders.QueueSink(), lookahead=3600)
+    other.tick(now + timedelta(minutes=10))
+    assert _fired(other) == []
+
+    # the window moves forward; "later" is loaded once it is within the lookahead
+    scheduler.tick(now + timedelta(minutes=70))
+    assert len(scheduler) == 1
+    scheduler.tick(now + timedelta(minutes=120))
+    assert _fired(scheduler) == ["later"]
+
+
+def test_reminders_follow_task_writes(api, scheduler, sqlite_db):
+    from datetime import datetime, timedelta
+    now = datetime.now().replace(microsecond=0)
+    due = (now + timedelta(minutes=5)).isoformat()
+    ids = [api.post("/api/tasks", json={"title": t, "due_date": due}).get_json()["task"]["id"]
+           for t in ("moved", "completed", "deleted", "kept")]
+    scheduler.tick(now)
+    assert len(scheduler) == 4
+
+    before_claim = sqlite_db.execute_query("SELECT updated_at FROM tasks WHERE id=%s", (ids[3],),
+                                           fetch=True)[0]["updated_at"]
+    api.put(f"/api/tasks/{ids[0]}", json={"due_date": (now + timedelta(minutes=30)).isoformat()})
+    api.put(f"/api/tasks/{ids[1]}", json={"status": "completed"})
+    api.delete(f"/api/tasks/{ids[2]}")
+    created = api.post("/api/tasks", json={"title": "new", "due_date": due}).get_json()["task"]["id"]
+    assert len(scheduler) == 3
+
+    scheduler.tick(now + timedelta(minutes=5))
+    assert sorted(_fired(scheduler)) == ["kept", "new"]
+    # sending a reminder is not a change clients see
+    assert sqlite_db.execute_query("SELECT updated_at FROM tasks WHERE id=%s", (ids[3],),
+                                   fetch=True)[0]["updated_at"] == before_claim
+
+    scheduler.tick(now + timedelta(minutes=30))
+    assert _fired(scheduler) == ["moved"]
+    # a new due date re-arms a reminder that was already sent
+    api.put(f"/api/tasks/{created}", json={"due_date": (now + timedelta(minutes=40)).isoformat()})
+    scheduler.tick(now + timedelta(minutes=40))
+    assert _fired(scheduler) == ["new"]
+
+
+def test_batch_reminders_wait_for_the_commit(api, scheduler, monkeypatch):
+    from datetime import datetime, timedelta
+    from modules.task import Task
+    now = datetime.now().replace(microsecond=0)
+    due = (now + timedelta(minutes=5)).isoformat()
+    kept, deleted = [api.post("/api/tasks", json={"title": t, "due_date": due}).get_json()["task"]["id"]
+                     for t in ("kept", "deleted")]
+    scheduler.tick(now)
+    assert len(scheduler) == 2
+
+    # a batch that rolls back leaves the scheduler as it was
+    def fail(*args):
+        raise RuntimeError("lost connection")
+    with monkeypatch.context() as m:
+        m.setattr(Task, "update_many", fail)
+        with pytest.raises(RuntimeError):
+            api.post("/api/tasks/batch", json={"operations": [
+                {"op": "create", "title": "rolled back", "due_date": due},
+                {"op": "update", "id": kept, "status": "completed"},
+                {"op": "delete", "id": deleted}]})
+    assert len(scheduler) == 2
+
+    api.post("/api/tasks/batch", json={"operations": [
+        {"op": "create", "title": "new", "due_date": due},
+        {"op": "update", "id": kept, "status": "completed"},
+        {"op": "delete", "id": deleted}]})
+    api.post("/api/tasks/import?format=ndjson", data=f'{{"title": "imported", "due_date": "{due}"}}',
+             content_type="application/x-ndjson")
+    scheduler.tick(now + timedelta(minutes=5))
+    assert sorted(_fired(scheduler)) == ["imported", "new"]
+
+
+def test_reminder_window_is_capped(api, scheduler, tmp_path):
+    from datetime import datetime, timedelta
+    from modules import reminders
+    now = datetime.now().replace(microsecond=0)
+    for i in range(5):
+        api.post("/api/tasks", json={"title": f"t{i}", "due_date": (now + timedelta(minutes=i + 1)).isoformat()})
+    scheduler.max_pending = 2
+    scheduler.sink = reminders.FileSink(str(tmp_path / "reminders.ndjson"))
+    # with the window cut short, the next rescan comes when its last task fires
+    assert scheduler.tick(now) == now + timedelta(minutes=1)
+    assert len(scheduler) == 2
+    for minute in range(1, 6):
+        scheduler.tick(now + timedelta(minutes=minute))
+        assert len(scheduler) <= 2
+    lines = (tmp_path / "reminders.ndjson").read_text().splitlines()
+    assert [line.split('"title":"')[1].split('"')[0] for line in lines] == [f"t{i}" for i in range(5)]
+
+
+def _sync(api, token=None, limit=None):
+    query = "&".join(f"{k}={v}" for k, v in (("since", token), ("limit", limit)) if v)
+    resp = api.get(f"/api/tasks/changes?{query}")
+    assert resp.status_code == 200, resp.get_json()
+    return resp.get_json()
+
+
+def test_sync_returns_only_changes_and_tombstones(api, sqlite_db, monkeypatch):
+    monkeypatch.setattr(Config, "SYNC_SETTLE", 0)
+    ids = [api.post("/api/tasks", json={"title": f"t{i}"}).get_json()["task"]["id"] for i in range(5)]
+    # the same millisecond for several rows: paging one at a time loses none of them
+    sqlite_db.execute_write("UPDATE tasks SET updated_at = '2020-01-01 00:00:00.123' WHERE id <= 3")
+
+    seen, token = [], None
+    while True:
+        page = _sync(api, token, limit=1)
+        seen += [t["id"] for t in page["tasks"]]
+        token = page["next_token"]
+        if not page["has_more"]:
+            break
+    assert sorted(seen) == ids and page["deleted"] == []
+
+    # with no settle interval, a write stamped in the cutoff's own millisecond sorts before the token
+    time.sleep(0.002)
+    api.put(f"/api/tasks/{ids[0]}", json={"status": "completed"})
+    api.delete(f"/api/tasks/{ids[1]}")
+    created = api.post("/api/tasks", json={"title": "new"}).get_json()["task"]["id"]
+    page = _sync(api, token)
+    assert sorted(t["id"] for t in page["tasks"]) == [ids[0], created]
+    assert page["deleted"] == [ids[1]] and not page["has_more"]
+    assert _sync(api, page["next_token"])["tasks"] == []
+
+    # a batch delete leaves tombstones too
+    time.sleep(0.002)
+    api.post("/api/tasks/batch", json={"operations": [{"op": "delete", "id": ids[2]},
+                                                      {"op": "delete", "id": ids[3]}]})
+    assert sorted(_sync(api, page["next_token"])["deleted"]) == [ids[2], ids[3]]
+
+
+def test_sync_holds_back_unsettled_writes_and_expires_tokens(api, monkeypatch):
+    from datetime import datetime, timedelta
+    from modules.task import Task
+    monkeypatch.setattr(Config, "SYNC_SETTLE", 60)
+    api.post("/api/tasks", json={"title": "just now"})
+    page = _sync(api)
+    assert page["tasks"] == []
+    monkeypatch.setattr(Config, "SYNC_SETTLE", 0)
+    assert [t["title"] for t in _sync(api, page["next_token"])["tasks"]] == ["just now"]
+
+    assert api.get("/api/tasks/changes?since=nonsense").status_code == 400
+    monkeypatch.setattr(Config, "SYNC_TOMBSTONE_DAYS", 0)
+    assert api.get(f"/api/tasks/changes?since={page['next_token']}").status_code == 410
+
+    api.delete("/api/tasks/1")
+    assert Task.prune_tombstones(datetime.now() + timedelta(seconds=1), batch_size=1) == 1
+
+
+def test_stream_pushes_task_writes(api, monkeypatch):
+    from utils import pubsub
+    monkeypatch.setattr(pubsub, "_broker", None)
+    monkeypatch.setattr(Config, "SSE_HEARTBEAT", 0.01)
+    access_token = api.environ_base["HTTP_AUTHORIZATION"].split()[1]
+    viewer = api.application.test_client()  # EventSource sends no headers: token in the query
+    assert viewer.get("/api/tasks/stream").status_code == 401
+    # the long-lived access token stays out of URLs (and access logs)
+    assert viewer.get(f"/api/tasks/stream?jwt={access_token}").status_code == 401
+
+    issued = api.post("/api/tasks/stream/token").get_json()
+    token = issued["token"]
+    assert issued["expires_in"] == Config.SSE_TOKEN_TTL
+    # a stream token opens the stream and nothing else
+    assert viewer.get("/api/tasks", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+
+    resp = viewer.get(f"/api/tasks/stream?jwt={token}", buffered=False)
+    assert resp.status_code == 200 and resp.mimetype == "text/event-stream"
+    chunks = iter(resp.response)
+    assert next(chunks).startswith(b"retry: ")
+    assert next(chunks) == b": heartbeat\n\n"
+
+    task_id = api.post("/api/tasks", json={"title": "from another device"}).get_json()["task"]["id"]
+    api.delete(f"/api/tasks/{task_id}")
+    frames = next(chunks).decode()
+    assert "event: task.created\n" in frames and '"from another device"' in frames
+    assert f"event: task.deleted\ndata: {{\"id\":{task_id}}}" in frames
+
+    resp.close()
+    assert pubsub.get_broker().stats()["subscribers"] == 0
+
+
+def test_streams_can_be_turned_off(api, monkeypatch):
+    monkeypatch.setattr(Config, "PUBSUB_BACKEND", "none")
+    token = api.post("/api/tasks/stream/token").get_json()["token"]
+    assert api.get(f"/api/tasks/stream?jwt={token}").status_code == 503
+    # writes go on without anyone to tell
+    assert api.post("/api/tasks", json={"title": "t"}).status_code == 201
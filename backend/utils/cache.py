@@ -0,0 +1,220 @@
+import threading
+import time
+import uuid
+import pickle
+import logging
+from collections import OrderedDict
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Interface every cache backend implements.
+
+    Values are arbitrary Python objects; backends that leave the process
+    are responsible for serializing them.
+    """
+
+    def get(self, key):
+        """Return the cached value or None"""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        """Store `value` for `ttl` seconds (None means the backend default)"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def stats(self):
+        """Return hit/miss/eviction counters"""
+        return {}
+
+
+class NullCache(CacheBackend):
+    """Backend that never stores anything, used when caching is disabled"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+class LRUCache(CacheBackend):
+    """In-process LRU cache bounded by entry count, with per-entry TTL"""
+
+    def __init__(self, max_entries=10000, default_ttl=60):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._data.move_to_end(key)
+            self._counters['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'size': len(self._data),
+                    'max_entries': self.max_entries, **self._counters}
+
+
+class RedisCache(CacheBackend):
+    """Cache shared by every worker process, backed by Redis.
+
+    Requires the optional ``redis`` package.
+    """
+
+    def __init__(self, url, default_ttl=60, prefix='taskflux:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'errors': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Redis cache get failed: {e}")
+            self._count('errors')
+            return None
+        self._count('hits' if raw is not None else 'misses')
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        try:
+            self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or None)
+        except Exception as e:
+            logger.warning(f"Redis cache set failed: {e}")
+            self._count('errors')
+
+    def delete(self, key):
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Redis cache delete failed: {e}")
+            self._count('errors')
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'redis', **self._counters}
+
+
+def create_backend():
+    """Build the cache backend selected by Config.CACHE_BACKEND"""
+    kind = Config.CACHE_BACKEND
+    if kind == 'memory':
+        return LRUCache(Config.CACHE_MAX_ENTRIES, Config.CACHE_TTL)
+    if kind == 'redis':
+        return RedisCache(Config.CACHE_URL, Config.CACHE_TTL)
+    if kind == 'none':
+        return NullCache()
+    raise ValueError(f"Unknown CACHE_BACKEND: {kind}")
+
+
+class TaskListCache:
+    """Per-user cache of task list responses.
+
+    Entries are keyed by user id, a per-user generation token and the
+    request's filter parameters. Writes replace the user's generation token,
+    which orphans every cached list for that user at once; orphans age out
+    through TTL/LRU. A reader that raced with a write stored its result under
+    the old generation, so it can never be served afterwards.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._counters = {'list_hits': 0, 'list_misses': 0, 'invalidations': 0}
+
+    def _generation(self, user_id):
+        key = f"tasks:gen:{user_id}"
+        generation = self.backend.get(key)
+        if generation is None:
+            # Never reuse a generation, even after the old token was evicted
+            generation = uuid.uuid4().hex
+            self.backend.set(key, generation, ttl=0)
+        return generation
+
+    def key(self, user_id, params):
+        """Cache key for a list request; compute it before querying the database"""
+        parts = "&".join(f"{k}={v}" for k, v in sorted(params.items()) if v is not None)
+        return f"tasks:list:{user_id}:{self._generation(user_id)}:{parts}"
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            self._counters['list_hits' if value is not None else 'list_misses'] += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    def invalidate(self, user_id):
+        """Drop every cached task list for `user_id`"""
+        self.backend.set(f"tasks:gen:{user_id}", uuid.uuid4().hex, ttl=0)
+        with self._lock:
+            self._counters['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        return {**self.backend.stats(), **counters}
+
+
+_task_cache = None
+_task_cache_lock = threading.Lock()
+
+
+def get_task_cache():
+    """Return the process-wide task list cache, creating it on first use"""
+    global _task_cache
+    if _task_cache is None:
+        with _task_cache_lock:
+            if _task_cache is None:
+                _task_cache = TaskListCache(create_backend())
+    return _task_cache
@@ -0,0 +1,198 @@
+"""Negotiated response compression: zstd, br or gzip, picked from Accept-Encoding.
+
+gzip is always available; br and zstd need the optional ``brotli`` and
+``zstandard`` packages, imported by init_app() only when compression is
+enabled. Bodies smaller than COMPRESSION_MIN_SIZE are sent as
+is. Streamed responses (exports) are compressed chunk by chunk and flushed
+after every chunk, so they still arrive incrementally. Compressed bodies of
+responses that carry an ETag are cached, so a repeated identical response is
+not compressed again.
+"""
+import zlib
+import logging
+import importlib
+import threading
+from config import Config
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/html'}
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def compress(self, data):
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush()
+
+
+class _Brotli:
+    def __init__(self, level):
+        import brotli
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._obj.process(data) + self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        import zstandard
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+
+    def compress(self, data):
+        return self._obj.compress(data) + self._obj.flush(self._flush_block)
+
+    def finish(self):
+        return self._obj.flush()
+
+
+def _installed(module):
+    try:
+        importlib.import_module(module)
+        return True
+    except ImportError:  # optional
+        return False
+
+
+def available_codecs():
+    """Content-coding -> (compressor class, level), in server preference order"""
+    codecs = {}
+    if _installed('zstandard'):
+        codecs['zstd'] = (_Zstd, Config.COMPRESSION_ZSTD_LEVEL)
+    if _installed('brotli'):
+        codecs['br'] = (_Brotli, Config.COMPRESSION_BR_LEVEL)
+    codecs['gzip'] = (_Gzip, Config.COMPRESSION_GZIP_LEVEL)
+    return codecs
+
+
+def negotiate(accept_encodings, codecs):
+    """Best coding the client accepts: highest q-value, ties go to server preference"""
+    best, best_q = None, 0
+    for name in codecs:
+        q = accept_encodings.quality(name)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(data, encoding, codecs):
+    """Whole-body compression"""
+    compressor_class, level = codecs[encoding]
+    compressor = compressor_class(level)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(chunks, encoding, codecs):
+    """Compress an iterable of chunks, emitting output as soon as each is flushed"""
+    compressor_class, level = codecs[encoding]
+    compressor = compressor_class(level)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        if chunk:
+            out = compressor.compress(chunk)
+            if out:
+                yield out
+    yield compressor.finish()
+
+
+class CompressionStats:
+    """Responses and bytes before/after compression, per coding"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.by_encoding = {}
+
+    def add(self, encoding, raw_bytes, sent_bytes):
+        with self._lock:
+            entry = self.by_encoding.setdefault(encoding, {'responses': 0, 'bytes_in': 0, 'bytes_out': 0})
+            entry['responses'] += 1
+            entry['bytes_in'] += raw_bytes
+            entry['bytes_out'] += sent_bytes
+
+    def snapshot(self):
+        with self._lock:
+            return {encoding: dict(entry) for encoding, entry in self.by_encoding.items()}
+
+
+stats = CompressionStats()
+_body_cache = None
+_body_cache_lock = threading.Lock()
+
+
+def get_body_cache():
+    """Compressed bodies keyed by coding, path and ETag; entries never go stale
+    because a changed body gets a new ETag"""
+    global _body_cache
+    if _body_cache is None:
+        with _body_cache_lock:
+            if _body_cache is None:
+                _body_cache = LRUCache(max_entries=Config.COMPRESSION_CACHE_ENTRIES, default_ttl=0)
+    return _body_cache
+
+
+def _weaken_etag(response):
+    # the compressed bytes differ from the identity body, so the validator
+    # can only claim semantic equivalence (If-None-Match compares weakly)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return etag
+
+
+def init_app(app):
+    """Compress responses for clients that send Accept-Encoding"""
+    from flask import request
+
+    if not Config.COMPRESSION_ENABLED:
+        return
+    codecs = available_codecs()
+    min_size = Config.COMPRESSION_MIN_SIZE
+
+    @app.after_request
+    def _compress_response(response):
+        if (response.mimetype not in COMPRESSIBLE_TYPES
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough):
+            return response
+        response.vary.add('Accept-Encoding')
+        if (request.method == 'HEAD' or 'Content-Encoding' in response.headers
+                or 'no-transform' in (response.headers.get('Cache-Control') or '')):
+            return response
+
+        encoding = negotiate(request.accept_encodings, codecs)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding, codecs)
+            response.headers.pop('Content-Length', None)
+            response.headers['Content-Encoding'] = encoding
+            return response
+
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+
+        etag = _weaken_etag(response)
+        key = f"{encoding}:{request.path}:{etag}" if etag else None
+        compressed = get_body_cache().get(key) if key else None
+        if compressed is None:
+            compressed = compress(body, encoding, codecs)
+            if key:
+                get_body_cache().set(key, compressed)
+        stats.add(encoding, len(body), len(compressed))
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,31 @@
+import hashlib
+from flask import request, make_response
+
+
+def compute_etag(*parts):
+    """Strong ETag value derived from cheap version markers (counts, timestamps, ids)"""
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def is_not_modified(etag):
+    """True when the request's If-None-Match already names `etag`.
+
+    Weak comparison, as RFC 9110 specifies for If-None-Match: compressed
+    responses carry the weak form of the ETag.
+    """
+    return request.if_none_match.contains_weak(etag)
+
+
+def not_modified(etag):
+    """Empty 304 response carrying the current ETag"""
+    response = make_response("", 304)
+    response.set_etag(etag)
+    return response
+
+
+def with_etag(result, etag):
+    """Attach an ETag to a view's (response, status) tuple"""
+    response, status = result
+    response.set_etag(etag)
+    return response, status
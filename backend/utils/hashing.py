@@ -0,0 +1,168 @@
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class HasherBusy(Exception):
+    """Raised when the password hashing queue is full or a job timed out"""
+
+
+def _hash_password(password, rounds):
+    """Runs in a worker process"""
+    import bcrypt
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check_password(password_hash, password):
+    """Runs in a worker process"""
+    import bcrypt
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        # malformed stored hash
+        return False
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated, size-limited process pool.
+
+    At most ``max_pending`` jobs may be queued or running; further requests
+    fail immediately with HasherBusy instead of piling up behind CPU-bound
+    work and starving cheap requests. A job that times out keeps its slot
+    until it actually finishes. If a worker process dies, the pool is
+    replaced and the job tried once more.
+    """
+
+    def __init__(self, workers=2, max_pending=8, rounds=12, timeout=10):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: forking a multi-threaded server process is unsafe
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._executor
+
+    def _run(self, fn, *args):
+        try:
+            return self._attempt(fn, args)
+        except BrokenProcessPool:
+            # a worker died (killed, out of memory); _attempt dropped the broken pool
+            logger.warning("Password hashing pool broke; starting a new one")
+            try:
+                return self._attempt(fn, args)
+            except BrokenProcessPool:
+                raise HasherBusy("Password hashing pool is unavailable")
+
+    def _attempt(self, fn, args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HasherBusy("Password hashing queue is full")
+
+        with self._lock:
+            self._pending += 1
+        executor = self.executor
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException as e:
+            self._finished()
+            if isinstance(e, BrokenProcessPool):
+                self._discard(executor)
+            raise
+        # the slot is freed when the job ends, not when this caller stops waiting
+        future.add_done_callback(self._finished)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HasherBusy("Password hashing timed out")
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise
+
+    def _finished(self, future=None):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _discard(self, executor):
+        """Forget a broken pool so the next job starts a new one"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def hash(self, password):
+        """Hash a plain password with the configured work factor"""
+        return self._run(_hash_password, password, self.rounds)
+
+    def check(self, password_hash, password):
+        """Check if password matches stored hash"""
+        return self._run(_check_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when the stored hash was made with a different work factor"""
+        try:
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'rejected': self._rejected,
+                'rounds': self.rounds,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher():
+    """Return the process-wide password hasher, creating it on first use"""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher(
+                    workers=Config.BCRYPT_WORKERS,
+                    max_pending=Config.BCRYPT_MAX_PENDING,
+                    rounds=Config.BCRYPT_LOG_ROUNDS,
+                    timeout=Config.BCRYPT_TIMEOUT
+                )
+    return _hasher
+
+
+def reset_after_fork():
+    """Drop the parent's worker pool in a forked child; a new one starts on first use"""
+    global _hasher, _hasher_lock
+    _hasher = None
+    _hasher_lock = threading.Lock()
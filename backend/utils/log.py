@@ -0,0 +1,153 @@
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import datetime
+import threading
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+from config import Config
+from utils.profiling import current_profile
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'request_id'}
+
+# Whether INFO/DEBUG records of the current request are kept
+_sampled = contextvars.ContextVar('log_sampled', default=True)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields become top-level keys"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+                  .isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Warnings and errors always pass; lower levels only for sampled requests"""
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or _sampled.get()
+
+
+class AsyncQueueHandler(QueueHandler):
+    """Hands records to the writer thread without formatting them.
+
+    Formatting (message interpolation, JSON encoding, tracebacks) happens on
+    the writer thread; only the request id has to be captured here because
+    it lives in the caller's context. When the queue is full, records are
+    dropped and counted rather than blocking the request.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        profile = current_profile()
+        record.request_id = profile.request_id if profile is not None else None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+_listener = None
+_handler = None
+
+
+def _parse_route_rates(text):
+    """"/api/tasks=0.05,/api/=0.1" -> {"/api/tasks": 0.05, "/api/": 0.1}"""
+    rates = {}
+    for part in (text or '').split(','):
+        route, _, rate = part.rpartition('=')
+        if route.strip():
+            rates[route.strip()] = float(rate)
+    return rates
+
+
+def configure_logging():
+    """The single place logging is set up; safe to call more than once"""
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    if Config.LOG_FORMAT == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    writer = logging.StreamHandler(sys.stderr)
+    writer.setFormatter(formatter)
+
+    _handler = AsyncQueueHandler(queue.Queue(Config.LOG_QUEUE_SIZE))
+    _handler.addFilter(SamplingFilter())
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(Config.LOG_LEVEL.upper())
+
+    _listener = QueueListener(_handler.queue, writer, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener, _handler
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+
+
+def reset_after_fork():
+    """The writer thread does not survive fork; give the child its own queue and writer"""
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+    _listener = _handler = None
+    configure_logging()
+
+
+def dropped_records():
+    return _handler.dropped if _handler is not None else 0
+
+
+def init_app(app):
+    """Decide once per request whether its INFO/DEBUG records are kept"""
+    from flask import request
+    default_rate = Config.LOG_SAMPLE_RATE
+    route_rates = _parse_route_rates(Config.LOG_SAMPLE_ROUTES)
+
+    @app.before_request
+    def _sample_request_logs():
+        route = request.url_rule.rule if request.url_rule else None
+        rate = route_rates.get(route, default_rate)
+        _sampled.set(rate >= 1 or random.random() < rate)
+
+    @app.teardown_request
+    def _reset_sampling(error=None):
+        _sampled.set(True)
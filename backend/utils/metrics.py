@@ -0,0 +1,394 @@
+import os
+import json
+import time
+import uuid
+import bisect
+import weakref
+import logging
+import tempfile
+import threading
+from config import Config
+from utils.profiling import query_shape  # noqa: F401  (re-exported)
+
+logger = logging.getLogger(__name__)
+
+# Request latency buckets in seconds
+HTTP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Statement latency buckets in seconds
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+MAX_SHARDS = 256  # fold shards of finished threads once this many exist
+RETIRED_FILE = 'metrics-retired.json'  # counters of exited workers, folded together
+MAX_FOLDED = 64  # ids of recently folded worker files a scrape may still come across
+
+
+class Counter:
+    def __init__(self, registry, name, help, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = (self.name, tuple(str(labels[n]) for n in self.labelnames))
+        shard = self.registry._shard()
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Histogram:
+    """Bucket counts are stored per bucket and made cumulative on export"""
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=HTTP_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = (self.name, tuple(str(labels[n]) for n in self.labelnames))
+        shard = self.registry._shard()
+        counts = shard.get(key)
+        if counts is None:
+            # one slot per bucket, one for +Inf, then the running sum
+            counts = shard[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+
+class Registry:
+    """Process metrics recorded into per-thread shards.
+
+    Each thread only ever writes its own dict, so recording takes no lock;
+    shards are summed when metrics are scraped. With Config.METRICS_DIR set,
+    every worker process also writes its totals to a file there and a scrape
+    in any worker merges the files of all of them. When a worker exits, the
+    master folds its counters into RETIRED_FILE and removes its file (retire).
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._collectors = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []       # (weakref to owning thread, shard)
+        self._retired = {}      # totals folded in from finished threads
+        self._flusher_pid = None
+        self._id = uuid.uuid4().hex  # tells a retired worker's file from its pid's next owner
+
+    def reset_after_fork(self):
+        """Start a forked worker from zero, keeping metric definitions and collectors"""
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = {}
+        self._flusher_pid = None
+        self._id = uuid.uuid4().hex
+
+    # ---- definitions ----
+
+    def counter(self, name, help, labelnames=()):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics.setdefault(name, Counter(self, name, help, labelnames))
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=HTTP_BUCKETS):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics.setdefault(name, Histogram(self, name, help, labelnames, buckets))
+        return metric
+
+    def register_collector(self, collector):
+        """`collector()` returns [(name, type, help, labels dict, value)] read at scrape time"""
+        self._collectors.append(collector)
+
+    # ---- recording ----
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((weakref.ref(threading.current_thread()), shard))
+                if len(self._shards) > MAX_SHARDS:
+                    self._compact()
+        return shard
+
+    @staticmethod
+    def _merge(into, shard):
+        for key, value in list(shard.items()):
+            if isinstance(value, list):
+                current = into.get(key)
+                if current is None:
+                    into[key] = list(value)
+                else:
+                    for i, v in enumerate(value):
+                        current[i] += v
+            else:
+                into[key] = into.get(key, 0) + value
+
+    def _compact(self):
+        """Fold shards of threads that have exited into the retired totals; holds _lock"""
+        live = []
+        for ref, shard in self._shards:
+            thread = ref()
+            if thread is not None and thread.is_alive():
+                live.append((ref, shard))
+            else:
+                self._merge(self._retired, shard)
+        self._shards = live
+
+    def snapshot(self):
+        """Totals of every counter and histogram in this process"""
+        with self._lock:
+            self._compact()
+            totals = {}
+            self._merge(totals, self._retired)
+            for _, shard in self._shards:
+                self._merge(totals, shard)
+        return totals
+
+    def _gauges(self):
+        samples = []
+        for collector in self._collectors:
+            try:
+                samples.extend(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        return samples
+
+    # ---- multi-process ----
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def _write(self, path, data):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.metrics-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def flush(self):
+        """Write this process's totals to METRICS_DIR"""
+        if not self.directory:
+            return
+        self._write(self._path(os.getpid()), {
+            'pid': os.getpid(),
+            'id': self._id,
+            'samples': _dump_samples(self.snapshot()),
+            'gauges': self._gauges(),
+        })
+
+    def retire(self, pid):
+        """Fold the counters of the exited worker `pid` into RETIRED_FILE and remove its file.
+
+        Run by the gunicorn master for each worker that exits, so totals stay
+        monotonic without the files of recycled workers piling up. The folded
+        file's id is recorded first, and scrapes read RETIRED_FILE last, so a
+        scrape racing this counts the worker exactly once.
+        """
+        if not self.directory:
+            return
+        path = self._path(pid)
+        data = self._read(path)
+        if data is not None:
+            retired_path = os.path.join(self.directory, RETIRED_FILE)
+            retired = self._read(retired_path) or {'samples': [], 'folded': []}
+            totals = _load_samples(retired['samples'])
+            self._merge(totals, _load_samples(data['samples']))
+            self._write(retired_path, {
+                'samples': _dump_samples(totals),
+                'folded': (retired['folded'] + [data.get('id')])[-MAX_FOLDED:],
+            })
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def start_flusher(self):
+        """Write this process's file every flush_interval from a daemon thread.
+
+        Cheap to call on every request; the thread is started once per process,
+        so a forked worker gets its own.
+        """
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True).start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning(f"Could not write metrics file: {e}")
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+    def _collect_all(self):
+        """(counter/histogram totals, gauge samples) over every worker process"""
+        if not self.directory:
+            return self.snapshot(), self._gauges()
+
+        self.flush()
+        workers = []
+        for name in os.listdir(self.directory):
+            if name == RETIRED_FILE or not (name.startswith('metrics-') and name.endswith('.json')):
+                continue
+            data = self._read(os.path.join(self.directory, name))
+            if data is not None:
+                workers.append(data)
+        # read after the worker files: a file gone by now is already folded in here
+        retired = self._read(os.path.join(self.directory, RETIRED_FILE)) or {'samples': [], 'folded': []}
+        folded = set(retired['folded'])
+
+        totals, gauges = _load_samples(retired['samples']), []
+        for data in workers:
+            if data.get('id') in folded:
+                continue
+            self._merge(totals, _load_samples(data['samples']))
+            # counters of exited workers still count; their gauges do not
+            if data['pid'] == os.getpid() or self._alive(data['pid']):
+                gauges.extend(tuple(g) for g in data['gauges'])
+        return totals, gauges
+
+    # ---- exposition ----
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        totals, gauges = self._collect_all()
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            kind = 'histogram' if isinstance(metric, Histogram) else 'counter'
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (key_name, labels), value in sorted(totals.items()):
+                if key_name != name:
+                    continue
+                pairs = list(zip(metric.labelnames, labels))
+                if kind == 'counter':
+                    lines.append(f"{name}{_labels(pairs)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + ('+Inf',), value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(pairs + [('le', _number(bound))])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(pairs)} {_number(value[-1])}")
+                lines.append(f"{name}_count{_labels(pairs)} {cumulative}")
+
+        summed = {}
+        described = {}
+        for name, kind, help, labels, value in gauges:
+            key = (name, tuple(sorted(labels.items())))
+            summed[key] = summed.get(key, 0) + value
+            described.setdefault(name, (kind, help))
+        for name, (kind, help) in sorted(described.items()):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (key_name, labels), value in sorted(summed.items()):
+                if key_name == name:
+                    lines.append(f"{name}{_labels(list(labels))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _dump_samples(totals):
+    return [[name, list(labels), value] for (name, labels), value in totals.items()]
+
+
+def _load_samples(samples):
+    return {(name, tuple(labels)): value for name, labels, value in samples}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide metrics registry, creating it on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                if Config.METRICS_DIR:
+                    os.makedirs(Config.METRICS_DIR, exist_ok=True)
+                registry = Registry(Config.METRICS_DIR, Config.METRICS_FLUSH_INTERVAL)
+                # defined up front so a scrape lists them even before this worker used them
+                registry.http_requests = registry.counter(
+                    'taskflux_http_requests_total', 'HTTP requests by route and status',
+                    ('method', 'route', 'status'))
+                registry.http_latency = registry.histogram(
+                    'taskflux_http_request_duration_seconds', 'HTTP request latency by route',
+                    ('method', 'route'), HTTP_BUCKETS)
+                registry.db_latency = registry.histogram(
+                    'taskflux_db_query_duration_seconds', 'Database statement latency by query shape',
+                    ('shape',), DB_BUCKETS)
+                _registry = registry
+    return _registry
+
+
+def init_app(app):
+    """Record count, status and latency of every request, labelled by route template"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            registry = get_metrics()
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            registry.http_requests.inc(method=request.method, route=route,
+                                       status=response.status_code)
+            registry.http_latency.observe(time.perf_counter() - start,
+                                          method=request.method, route=route)
+            registry.start_flusher()
+        return response
+
+
+def observe_query(event):
+    """Query hook: record the duration of one database statement by its shape"""
+    get_metrics().db_latency.observe(event.duration, shape=event.shape)
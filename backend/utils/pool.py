@@ -0,0 +1,239 @@
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PoolError(Exception):
+    """Base class for connection pool errors"""
+
+
+class PoolTimeout(PoolError):
+    """Raised when no connection becomes available before the checkout timeout"""
+
+
+class PoolClosed(PoolError):
+    """Raised when a connection is requested from a closed pool"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of database connections.
+
+    Connections are created on demand up to ``max_size`` and handed out
+    last-in-first-out so the warmest connections are reused first. A
+    connection is recycled once it is older than ``max_lifetime`` seconds
+    or has sat idle for more than ``max_idle`` seconds, and it is health
+    checked on borrow when it has not been used for ``ping_interval``
+    seconds.
+    """
+
+    def __init__(self, factory, min_size=1, max_size=10, timeout=5.0,
+                 max_lifetime=1800, max_idle=300, ping_interval=30,
+                 validate=None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if min_size < 0 or min_size > max_size:
+            raise ValueError("min_size must be between 0 and max_size")
+
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.ping_interval = ping_interval
+        self.validate = validate or (lambda conn: conn.is_connected())
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = deque()        # connections ready for checkout, oldest on the left
+        self._meta = {}             # id(conn) -> [created_at, last_used]
+        self._size = 0              # open connections plus reserved slots
+        self._closed = False
+        self._counters = {
+            'created': 0,
+            'discarded': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'failed_checks': 0,
+            'recycled': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # checkout / return
+    # ------------------------------------------------------------------
+    def acquire(self, timeout=None):
+        """Borrow a connection, waiting up to ``timeout`` seconds for one"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            conn = self._checkout(deadline)
+            if conn is None:
+                # A slot was reserved for us, open a brand-new connection
+                conn = self._open()
+                with self._cond:
+                    self._counters['checkouts'] += 1
+                return conn
+            if self._usable(conn):
+                with self._cond:
+                    self._counters['checkouts'] += 1
+                return conn
+            self._close(conn)
+
+    def release(self, conn, discard=False):
+        """Return a borrowed connection to the pool"""
+        now = time.monotonic()
+        with self._cond:
+            meta = self._meta.get(id(conn))
+            if (discard or self._closed or meta is None
+                    or now - meta[0] > self.max_lifetime):
+                if meta is not None and not discard and not self._closed:
+                    self._counters['recycled'] += 1
+                stale = [conn]
+            else:
+                meta[1] = now
+                self._idle.append(conn)
+                stale = self._reap_locked(now)
+            self._cond.notify()
+
+        for stale_conn in stale:
+            self._close(stale_conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager that borrows a connection and always returns it"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except BaseException:
+            # Includes GeneratorExit from abandoned streaming generators
+            self.release(conn, discard=not self._alive(conn))
+            raise
+        else:
+            self.release(conn)
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    # ------------------------------------------------------------------
+    def fill(self):
+        """Open connections until the pool holds at least ``min_size``"""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._open()
+            self.release(conn)
+
+    def close(self):
+        """Close idle connections and refuse further checkouts.
+
+        Connections that are checked out are closed when they are returned.
+        """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._cond.notify_all()
+
+        for conn in idle:
+            self._close(conn)
+
+    def stats(self):
+        """Return a snapshot of pool usage for monitoring"""
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'closed': self._closed,
+                **self._counters,
+            }
+
+    # ------------------------------------------------------------------
+    # internals
+    # ------------------------------------------------------------------
+    def _checkout(self, deadline):
+        """Pop an idle connection, or reserve a slot and return None"""
+        with self._cond:
+            waited = False
+            while True:
+                if self._closed:
+                    raise PoolClosed("Connection pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeout(
+                        f"No database connection available after waiting "
+                        f"{self.timeout}s (max_size={self.max_size})"
+                    )
+                if not waited:
+                    self._counters['waits'] += 1
+                    waited = True
+                self._cond.wait(remaining)
+
+    def _open(self):
+        try:
+            conn = self.factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        now = time.monotonic()
+        with self._cond:
+            self._meta[id(conn)] = [now, now]
+            self._counters['created'] += 1
+        return conn
+
+    def _usable(self, conn):
+        now = time.monotonic()
+        created_at, last_used = self._meta[id(conn)]
+        if now - created_at > self.max_lifetime or now - last_used > self.max_idle:
+            with self._cond:
+                self._counters['recycled'] += 1
+            return False
+        if now - last_used >= self.ping_interval and not self._alive(conn):
+            with self._cond:
+                self._counters['failed_checks'] += 1
+            return False
+        return True
+
+    def _alive(self, conn):
+        try:
+            return bool(self.validate(conn))
+        except Exception:
+            return False
+
+    def _reap_locked(self, now):
+        """Detach idle connections past ``max_idle`` while keeping ``min_size``"""
+        stale = []
+        while (len(self._idle) > self.min_size
+               and now - self._meta[id(self._idle[0])][1] > self.max_idle):
+            stale.append(self._idle.popleft())
+            self._counters['recycled'] += 1
+        return stale
+
+    def _close(self, conn):
+        with self._cond:
+            self._meta.pop(id(conn), None)
+            self._size -= 1
+            self._counters['discarded'] += 1
+            self._cond.notify()
+        try:
+            conn.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection: {e}")
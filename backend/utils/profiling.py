@@ -0,0 +1,111 @@
+import re
+import time
+import uuid
+import logging
+import functools
+import contextvars
+from collections import namedtuple, Counter
+from config import Config
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('slow_query')
+
+# What every query hook receives after a statement has run
+QueryEvent = namedtuple("QueryEvent", ["shape", "query", "duration", "rows", "request_id"])
+
+_SPACES = re.compile(r"\s+")
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"VALUES (\([^)]*\))(?:, \([^)]*\))+", re.IGNORECASE)
+_SELECT_LIST = re.compile(r"^SELECT (?!COUNT\().+? FROM ", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1024)
+def query_shape(query):
+    """Collapse a statement to a low-cardinality label: whitespace, IN/VALUES lists
+    and projected column lists are normalized"""
+    shape = _SPACES.sub(" ", query).strip()
+    shape = _IN_LIST.sub("IN (...)", shape)
+    shape = _VALUES_LIST.sub(r"VALUES \1, ...", shape)
+    shape = _SELECT_LIST.sub("SELECT ... FROM ", shape)
+    return shape
+
+
+class RequestProfile:
+    """Statements run on behalf of one HTTP request"""
+
+    def __init__(self, request_id, method, path):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+
+    def add(self, event):
+        self.queries += 1
+        self.db_time += event.duration
+        self.shapes[event.shape] += 1
+
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+
+def current_profile():
+    """Profile of the request being served on this thread, or None"""
+    return _current.get()
+
+
+def record_query(event):
+    """Query hook: per-request accounting and the slow-query log"""
+    profile = _current.get()
+    if profile is not None:
+        profile.add(event)
+    if Config.SLOW_QUERY_MS and event.duration * 1000 >= Config.SLOW_QUERY_MS:
+        slow_query_logger.warning(
+            f"Slow query {event.duration * 1000:.1f} ms, {event.rows} rows"
+            f" [request {event.request_id or '-'}]: {event.shape}"
+        )
+
+
+def init_app(app):
+    """Track the statements of each request; warn on N+1 patterns and optionally
+    report DB time in a Server-Timing header"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+        g.profile_token = _current.set(RequestProfile(request_id, request.method, request.path))
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = _current.get()
+        if profile is None:
+            return response
+
+        if Config.QUERY_COUNT_WARN and profile.queries > Config.QUERY_COUNT_WARN:
+            shape, repeats = profile.shapes.most_common(1)[0]
+            logger.warning(
+                f"{profile.method} {profile.path} ran {profile.queries} queries"
+                f" [request {profile.request_id}], possible N+1; most repeated ({repeats}x): {shape}"
+            )
+
+        response.headers['X-Request-ID'] = profile.request_id
+        if Config.SERVER_TIMING:
+            total = (time.perf_counter() - profile.started) * 1000
+            response.headers['Server-Timing'] = (
+                f'db;dur={profile.db_time * 1000:.2f};desc="{profile.queries} queries", '
+                f'app;dur={total:.2f}'
+            )
+        return response
+
+    @app.teardown_request
+    def _end_profile(error=None):
+        token = g.pop('profile_token', None)
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:
+                # torn down from a different context (e.g. a streamed response)
+                _current.set(None)
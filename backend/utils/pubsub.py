@@ -0,0 +1,254 @@
+"""Publish/subscribe of task change events, behind GET /api/tasks/stream.
+
+Routes publish an event for a user; every open stream of that user gets it.
+Each event is rendered to its Server-Sent Events frame once, however many
+subscribers receive it. Subscribers hold a bounded buffer (SSE_BUFFER
+frames): one that falls that far behind is disconnected rather than
+allowed to grow without limit, and its client resynchronises when it
+reconnects.
+
+PUBSUB_BACKEND=memory delivers within the process. With several worker
+processes, PUBSUB_BACKEND=redis relays events through a Redis channel so a
+stream on any worker sees writes made on every other (needs the optional
+``redis`` package). PUBSUB_BACKEND=none turns streams off; clients poll
+/api/tasks/changes instead.
+"""
+import os
+import json
+import uuid
+import logging
+import threading
+from collections import deque
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def sse_frame(event, data):
+    """One Server-Sent Events message; `data` is encoded as JSON on a single line,
+    dates written as in API responses"""
+    from utils.json_provider import dumps
+    return f"event: {event}\ndata: {dumps(data, http_dates=True)}\n\n"
+
+
+class Subscription:
+    """One stream's view of its user's events: a bounded buffer of frames"""
+
+    def __init__(self, user_id, max_buffered):
+        self.user_id = user_id
+        self.max_buffered = max_buffered
+        self._frames = deque()
+        self._cond = threading.Condition()
+        self.closed = None   # reason once closed: 'slow', 'unsubscribed' or 'shutdown'
+
+    def offer(self, frame):
+        """Buffer a frame; False if the subscriber is too far behind to take it"""
+        with self._cond:
+            if self.closed:
+                return True
+            if len(self._frames) >= self.max_buffered:
+                return False
+            self._frames.append(frame)
+            self._cond.notify()
+            return True
+
+    def close(self, reason):
+        with self._cond:
+            if not self.closed:
+                self.closed = reason
+            self._cond.notify()
+
+    def next_frames(self, timeout):
+        """Wait up to `timeout` seconds; returns the buffered frames (empty on timeout)"""
+        with self._cond:
+            if not self._frames and not self.closed:
+                self._cond.wait(timeout)
+            frames = list(self._frames)
+            self._frames.clear()
+            return frames
+
+
+class MemoryBackend:
+    """Events stay in the process"""
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, user_id, frame):
+        self._deliver(user_id, frame)
+
+    def close(self):
+        pass
+
+
+class NullBackend:
+    """Streams are off; events go nowhere"""
+
+    def start(self, deliver):
+        pass
+
+    def publish(self, user_id, frame):
+        pass
+
+    def close(self):
+        pass
+
+
+class RedisBackend:
+    """Relays events between processes through one Redis pub/sub channel.
+
+    Events are delivered locally at once and published for the other
+    processes; a listener thread delivers theirs. Requires the optional
+    ``redis`` package.
+    """
+
+    def __init__(self, url, channel='taskflux:events'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._pubsub = None
+        self._thread = None
+
+    def start(self, deliver):
+        self._deliver = deliver
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self.channel)
+        self._thread = threading.Thread(target=self._listen, name='pubsub-redis', daemon=True)
+        self._thread.start()
+
+    def _listen(self):
+        try:
+            for message in self._pubsub.listen():
+                try:
+                    origin, user_id, frame = json.loads(message["data"])
+                except (ValueError, TypeError):
+                    logger.warning("Ignoring malformed event on %s", self.channel)
+                    continue
+                if origin != self.origin:
+                    self._deliver(user_id, frame)
+        except Exception as e:
+            if self._pubsub is not None:
+                logger.error(f"Redis event listener stopped: {e}")
+
+    def publish(self, user_id, frame):
+        self._deliver(user_id, frame)
+        try:
+            self.client.publish(self.channel, json.dumps([self.origin, user_id, frame]))
+        except Exception as e:
+            logger.warning(f"Redis event publish failed: {e}")
+
+    def close(self):
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            pubsub.close()
+
+
+class Broker:
+    """Fans published events out to the subscriptions of each user"""
+
+    def __init__(self, backend, max_buffered=64, max_subscribers=1000):
+        self.backend = backend
+        self.max_buffered = max_buffered
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._by_user = {}   # user_id -> set of Subscription
+        self._count = 0
+        self._counters = {'published': 0, 'delivered': 0, 'slow_disconnects': 0, 'rejected': 0}
+        backend.start(self._deliver)
+
+    def subscribe(self, user_id):
+        """A new subscription, or None when the process already serves max_subscribers"""
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                self._counters['rejected'] += 1
+                return None
+            subscription = Subscription(user_id, self.max_buffered)
+            self._by_user.setdefault(user_id, set()).add(subscription)
+            self._count += 1
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._by_user.get(subscription.user_id)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._by_user[subscription.user_id]
+        subscription.close('unsubscribed')
+
+    def publish(self, user_id, event, data):
+        """Send `event` to every stream of `user_id`, in this and (with Redis) other processes"""
+        with self._lock:
+            self._counters['published'] += 1
+        self.backend.publish(user_id, sse_frame(event, data))
+
+    def _deliver(self, user_id, frame):
+        with self._lock:
+            subscribers = list(self._by_user.get(user_id, ()))
+        slow = [s for s in subscribers if not s.offer(frame)]
+        for subscription in slow:
+            logger.info("Disconnecting slow event stream of user %s", user_id)
+            subscription.close('slow')
+            self.unsubscribe(subscription)
+        with self._lock:
+            self._counters['delivered'] += len(subscribers) - len(slow)
+            self._counters['slow_disconnects'] += len(slow)
+
+    def close(self):
+        """End every open stream (worker shutdown)"""
+        with self._lock:
+            subscriptions = [s for group in self._by_user.values() for s in group]
+            self._by_user.clear()
+            self._count = 0
+        for subscription in subscriptions:
+            subscription.close('shutdown')
+        self.backend.close()
+
+    def stats(self):
+        with self._lock:
+            return {'subscribers': self._count, 'max_subscribers': self.max_subscribers,
+                    **self._counters}
+
+
+def create_backend():
+    """Build the backend selected by Config.PUBSUB_BACKEND"""
+    kind = Config.PUBSUB_BACKEND
+    if kind == 'memory':
+        return MemoryBackend()
+    if kind == 'redis':
+        return RedisBackend(Config.PUBSUB_URL)
+    if kind == 'none':
+        return NullBackend()
+    raise ValueError(f"Unknown PUBSUB_BACKEND: {kind}")
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker, creating it on first use"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = Broker(create_backend(), Config.SSE_BUFFER, Config.SSE_MAX_STREAMS)
+    return _broker
+
+
+def publish(user_id, event, data):
+    """Publish through the process-wide broker; never fails the write that triggered it"""
+    if Config.PUBSUB_BACKEND == 'none':
+        return
+    try:
+        get_broker().publish(user_id, event, data)
+    except Exception:
+        logger.exception("Could not publish %s for user %s", event, user_id)
+
+
+def reset_after_fork():
+    """Subscriptions and the Redis listener thread belong to the parent; start afresh"""
+    global _broker
+    _broker = None
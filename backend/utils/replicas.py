@@ -0,0 +1,342 @@
+"""Read replicas: read-only statements served away from the primary.
+
+With DB_REPLICAS set, Database.execute_query and stream_query send a plain
+SELECT to a replica; writes, transactions, locking reads and connection()
+always use the primary. Each read goes to the replica with the fewest reads
+in flight, rotating among ties. A read that finds the replica's pool
+exhausted runs on the primary, leaving the replica in rotation. A replica
+that fails at the connection level is ejected for DB_REPLICA_EJECT_SECONDS, doubled while failures repeat; a
+lag checker also ejects replicas more than DB_REPLICA_MAX_LAG seconds behind
+and restores them once they catch up. With every replica ejected, reads fall
+back to the primary.
+
+Read-your-writes: init_app() gives each request a ReadScope. Once a request
+writes, its remaining reads use the primary, and its user is pinned to the
+primary for DB_PRIMARY_PIN_SECONDS, so a list fetched right after a create
+never comes from a replica that has not applied it yet. Keep the pin longer
+than DB_REPLICA_MAX_LAG plus DB_REPLICA_CHECK_INTERVAL. Pins are kept in
+Redis when CACHE_BACKEND=redis, otherwise per process, which only holds with
+a single worker: gunicorn.conf.py refuses to start several workers without
+Redis, and other servers get an error logged.
+"""
+import math
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_scope = contextvars.ContextVar('read_scope', default=None)
+_primary = contextvars.ContextVar('primary_reads', default=False)
+
+# a SELECT carrying one of these takes locks and must run on the primary
+_LOCKING = ('FOR UPDATE', 'FOR SHARE', 'LOCK IN SHARE MODE', 'GET_LOCK', 'RELEASE_LOCK')
+
+
+def is_read_only(query):
+    """True for a plain SELECT that a replica can answer"""
+    if query.lstrip()[:6].upper() != 'SELECT':
+        return False
+    upper = query.upper()
+    return not any(marker in upper for marker in _LOCKING)
+
+
+class ReadScope:
+    """Routing state of one request: whether it wrote, and whether its user is pinned"""
+    __slots__ = ('wrote', 'user_id', '_pinned', '_resolve')
+
+    def __init__(self, resolve=None):
+        self.wrote = False
+        self.user_id = None     # the acting user when the request carries no JWT (registration)
+        self._pinned = None
+        self._resolve = resolve
+
+    def use_primary(self):
+        if self.wrote:
+            return True
+        if self._pinned is None:
+            # resolved on the first read, after the route has verified its JWT
+            self._pinned = bool(self._resolve and self._resolve(self))
+        return self._pinned
+
+
+def note_write():
+    """Called by the database on every write: later reads of this request use the primary"""
+    scope = _scope.get()
+    if scope is not None:
+        scope.wrote = True
+
+
+def wants_primary():
+    """True when reads here must see this request's or this user's recent writes"""
+    if _primary.get():
+        return True
+    scope = _scope.get()
+    return scope is not None and scope.use_primary()
+
+
+@contextmanager
+def primary_reads():
+    """Run every read in the block on the primary"""
+    token = _primary.set(True)
+    try:
+        yield
+    finally:
+        _primary.reset(token)
+
+
+def set_request_user(user_id):
+    """Name the user a request without a JWT acts for, so its writes pin them"""
+    scope = _scope.get()
+    if scope is not None:
+        scope.user_id = user_id
+
+
+def replication_lag(connection):
+    """Seconds the server behind `connection` trails its source, None if replication is stopped.
+
+    A server that reports no replication status (e.g. a managed read
+    endpoint) is taken to be current.
+    """
+    cursor = connection.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")  # MySQL 8.0.22+
+        except Exception:
+            cursor.execute("SHOW SLAVE STATUS")
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    lags = [row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master')) for row in rows]
+    if any(lag is None for lag in lags):
+        return None
+    return float(max(lags, default=0))
+
+
+class Replica:
+    """One read replica and its routing state"""
+
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.in_flight = 0
+        self.reads = 0
+        self.failures = 0           # consecutive ejections, for the backoff
+        self.ejections = 0
+        self.overflows = 0          # reads sent to the primary because the pool was exhausted
+        self.ejected_until = 0.0
+        self.reason = None
+        self.lag = None
+
+
+class ReplicaSet:
+    """Load balancing and health-based ejection over the read replicas"""
+
+    def __init__(self, replicas, eject_seconds=5, max_eject_seconds=300, max_lag=5,
+                 check_interval=5, lag_probe=replication_lag, clock=time.monotonic):
+        self.replicas = list(replicas)
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag_probe = lag_probe
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._next = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def acquire(self):
+        """The replica for the next read, counted in flight; None when all are ejected"""
+        now = self._clock()
+        count = len(self.replicas)
+        with self._lock:
+            best = None
+            for i in range(count):
+                replica = self.replicas[(self._next + i) % count]
+                if replica.ejected_until <= now and (best is None or replica.in_flight < best.in_flight):
+                    best = replica
+            if best is None:
+                return None
+            self._next = (self._next + 1) % count
+            best.in_flight += 1
+            best.reads += 1
+            return best
+
+    def release(self, replica, ok=True):
+        with self._lock:
+            replica.in_flight -= 1
+            if ok and replica.ejected_until <= self._clock():
+                replica.failures = 0
+
+    def eject(self, replica, reason):
+        """Stop reading from `replica` for a while, longer each time in a row"""
+        with self._lock:
+            now = self._clock()
+            newly = replica.ejected_until <= now
+            delay = min(self.eject_seconds * 2 ** replica.failures, self.max_eject_seconds)
+            replica.failures += 1
+            replica.ejections += newly
+            replica.ejected_until = now + delay
+            replica.reason = reason
+        if newly:
+            logger.warning("Read replica %s ejected for %.0fs: %s", replica.name, delay, reason)
+
+    def overflow(self, replica):
+        """Count a read that went to the primary because `replica` had no free
+        pooled connection; a busy replica is not ejected"""
+        with self._lock:
+            replica.overflows += 1
+
+    def restore(self, replica):
+        with self._lock:
+            if not replica.ejected_until:
+                return
+            replica.ejected_until, replica.failures, replica.reason = 0.0, 0, None
+        logger.info("Read replica %s restored", replica.name)
+
+    def fill(self):
+        """Warm every replica pool; one that cannot be reached is ejected, not fatal"""
+        for replica in self.replicas:
+            try:
+                replica.pool.fill()
+            except Exception as e:
+                self.eject(replica, f"connect failed: {e}")
+
+    def check(self):
+        """Measure each replica's lag once, ejecting those too far behind or unreachable"""
+        for replica in self.replicas:
+            try:
+                with replica.pool.connection() as connection:
+                    lag = self.lag_probe(connection)
+            except Exception as e:
+                self.eject(replica, f"health check failed: {e}")
+                continue
+            replica.lag = lag
+            if lag is None:
+                self.eject(replica, "replication stopped")
+            elif self.max_lag and lag > self.max_lag:
+                self.eject(replica, f"{lag:.0f}s behind")
+            else:
+                self.restore(replica)
+
+    # ---- background lag checks ----
+
+    def start(self):
+        if not self.check_interval or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='replica-check', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Read replica check failed")
+
+    def close(self):
+        self._stop.set()
+        for replica in self.replicas:
+            replica.pool.close()
+
+    def stats(self):
+        now = self._clock()
+        with self._lock:
+            return [{'name': r.name, 'up': r.ejected_until <= now, 'in_flight': r.in_flight,
+                     'reads': r.reads, 'ejections': r.ejections, 'overflows': r.overflows,
+                     'lag': r.lag, 'reason': r.reason,
+                     'pool': r.pool.stats()} for r in self.replicas]
+
+
+class ReadPins:
+    """Users whose reads stay on the primary until their pin expires"""
+
+    def __init__(self, backend, seconds):
+        self.backend = backend
+        self.ttl = max(1, math.ceil(seconds))  # Redis expiries are whole seconds
+
+    def pin(self, user_id):
+        self.backend.set(f"pin:{user_id}", True, ttl=self.ttl)
+
+    def is_pinned(self, user_id):
+        return self.backend.get(f"pin:{user_id}") is not None
+
+
+_pins = None
+_pins_lock = threading.Lock()
+
+
+def get_pins():
+    """Return the process-wide pin store, creating it on first use"""
+    global _pins
+    if _pins is None:
+        with _pins_lock:
+            if _pins is None:
+                from utils.cache import LRUCache, RedisCache
+                if Config.CACHE_BACKEND == 'redis':
+                    backend = RedisCache(Config.CACHE_URL)
+                else:
+                    # even with caching off: pins are needed for correctness, not speed
+                    backend = LRUCache(Config.CACHE_MAX_ENTRIES)
+                    if Config.WEB_WORKERS > 1:
+                        logger.error("Read-your-writes pins are per process but WEB_WORKERS=%s: "
+                                     "set CACHE_BACKEND=redis, or reads after a write may come "
+                                     "from a lagging replica", Config.WEB_WORKERS)
+                _pins = ReadPins(backend, Config.DB_PRIMARY_PIN_SECONDS)
+    return _pins
+
+
+def reset_after_fork():
+    """A Redis client must not be shared with the parent process"""
+    global _pins
+    _pins = None
+
+
+def _jwt_user():
+    from flask_jwt_extended import get_jwt_identity
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None  # the route did not check a JWT
+
+
+def _pinned(scope):
+    user_id = scope.user_id or _jwt_user()
+    return user_id is not None and get_pins().is_pinned(user_id)
+
+
+def init_app(app):
+    """Track the writes of each request and pin its user to the primary afterwards;
+    a no-op when no replicas are configured"""
+    from flask import g
+    from database import get_db_connection
+
+    if not get_db_connection().replica_configs:
+        return
+
+    @app.before_request
+    def _start_scope():
+        g.read_scope_token = _scope.set(ReadScope(_pinned))
+
+    @app.after_request
+    def _pin_writer(response):
+        scope = _scope.get()
+        if scope is not None and scope.wrote:
+            user_id = scope.user_id or _jwt_user()
+            if user_id is not None:
+                get_pins().pin(user_id)
+        return response
+
+    @app.teardown_request
+    def _end_scope(error=None):
+        token = g.pop('read_scope_token', None)
+        if token is not None:
+            try:
+                _scope.reset(token)
+            except ValueError:
+                _scope.set(None)
@@ -1,15 +1,30 @@
 # utils/security.py
-from flask_bcrypt import Bcrypt
+from utils.hashing import get_password_hasher
 
-bcrypt = Bcrypt()
 
 class SecurityUtils:
     @staticmethod
     def hash_password(password: str) -> str:
-        """Hash a plain password."""
-        return bcrypt.generate_password_hash(password).decode("utf-8")
+        """Hash a plain password on the bcrypt worker pool."""
+        return get_password_hasher().hash(password)
 
     @staticmethod
     def check_password(password_hash: str, password: str) -> bool:
         """Check if password matches stored hash."""
-        return bcrypt.check_password_hash(password_hash, password)
+        return get_password_hasher().check(password_hash, password)
+
+    @staticmethod
+    def validate_request_data(data, required_fields):
+        """Check that the JSON body is an object containing every required field."""
+        if not isinstance(data, dict):
+            return False, "Request body must be a JSON object"
+        missing = [f for f in required_fields
+                   if data.get(f) is None or str(data.get(f)).strip() == ""]
+        if missing:
+            return False, f"Missing required fields: {', '.join(missing)}"
+        return True, "Request data is valid"
+
+    @staticmethod
+    def sanitize_input(value):
+        """Trim surrounding whitespace from a string input."""
+        return value.strip() if isinstance(value, str) else value
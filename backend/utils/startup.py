@@ -0,0 +1,136 @@
+"""Startup timing: how long the process took to import, build the app and serve.
+
+Import this module before anything heavy (wsgi.py and app.py do). With
+STARTUP_PROFILE_IMPORTS=true it also times every module imported afterwards.
+"""
+import os
+import sys
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_t0 = time.perf_counter()
+_marks = {}
+_imports = {}   # module -> (self seconds, cumulative seconds)
+_lock = threading.Lock()
+
+
+def _process_age():
+    """Seconds since the process started (Linux /proc), or None elsewhere"""
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# Time spent before this module was imported: interpreter start and earlier imports
+_boot_offset = _process_age() or 0.0
+
+
+def elapsed():
+    """Seconds since the process started"""
+    return _boot_offset + time.perf_counter() - _t0
+
+
+def mark(phase):
+    """Record when `phase` was first reached"""
+    with _lock:
+        _marks.setdefault(phase, elapsed())
+
+
+class _TimedLoader:
+    """Wraps a module loader to measure exec_module, excluding nested imports"""
+
+    _stack = threading.local()
+
+    def __init__(self, loader):
+        self._loader = loader
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        stack = self._stack.__dict__.setdefault('frames', [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            total = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += total
+            with _lock:
+                _imports[module.__name__] = (total - nested, total)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _ImportTimer:
+    """Meta path finder that defers to the real finders and wraps their loaders"""
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader)
+                return spec
+        return None
+
+
+def profile_imports():
+    """Start timing every import from now on"""
+    if not any(isinstance(f, _ImportTimer) for f in sys.meta_path):
+        sys.meta_path.insert(0, _ImportTimer())
+
+
+def report(top=25):
+    """Phase timings in milliseconds and, when profiled, the slowest imports"""
+    with _lock:
+        marks = {phase: round(seconds * 1000, 1) for phase, seconds in _marks.items()}
+        imports = sorted(_imports.items(), key=lambda item: item[1][0], reverse=True)
+    result = {'phases_ms': marks, 'uptime_ms': round(elapsed() * 1000, 1)}
+    if imports:
+        result['imports'] = {
+            'profiled_modules': len(imports),
+            'total_ms': round(sum(self_time for _, (self_time, _) in imports) * 1000, 1),
+            'slowest': [
+                {'module': name, 'self_ms': round(self_time * 1000, 2),
+                 'cumulative_ms': round(total * 1000, 2)}
+                for name, (self_time, total) in imports[:top]
+            ],
+        }
+    return result
+
+
+def init_app(app):
+    """Mark the app as built and log the time to the first request once"""
+    from flask import request
+    mark('app_created')
+    state = {'pending': True}
+
+    @app.before_request
+    def _first_request():
+        if state['pending']:
+            state['pending'] = False
+            mark('first_request')
+            marks = report()['phases_ms']
+            logger.info(
+                "Startup: app created at %s ms, first request (%s %s) at %s ms",
+                marks.get('app_created'), request.method, request.path, marks.get('first_request'),
+            )
+
+
+# Read from the environment directly: this has to run before config is imported
+if os.getenv('STARTUP_PROFILE_IMPORTS', 'false').lower() == 'true':
+    profile_imports()
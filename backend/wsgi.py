@@ -0,0 +1,49 @@
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is built once at import time, in the master when the server preloads
+it, so workers fork with every module already imported. Nothing here touches
+the database; apply the schema beforehand with `python migrations.py upgrade`.
+"""
+from utils import startup  # noqa: F401  (first, so startup timing covers the imports below)
+import logging
+import database
+from app import create_app
+from modules import reminders, task_stats
+from utils import hashing, log, metrics, pubsub, replicas
+
+logger = logging.getLogger(__name__)
+
+app = create_app()
+
+
+def post_fork():
+    """Per-worker initialisation, run in each worker right after fork"""
+    log.reset_after_fork()
+    metrics.get_metrics().reset_after_fork()
+    hashing.reset_after_fork()
+    database.db.reset_after_fork()
+    replicas.reset_after_fork()
+    database.db.connect()
+    pubsub.reset_after_fork()
+    task_stats.reset_after_fork()
+    task_stats.get_reconciler().start()
+    reminders.reset_after_fork()
+    if reminders.get_scheduler():
+        reminders.get_scheduler().start()
+
+
+def shutdown():
+    """Release the worker's resources when it exits (shutdown, reload or recycle)"""
+    pubsub.get_broker().close()
+    task_stats.get_reconciler().stop()
+    if reminders.get_scheduler():
+        reminders.get_scheduler().stop()
+    database.db.disconnect()
+    hashing.get_password_hasher().shutdown()
+    try:
+        metrics.get_metrics().flush()
+    except OSError as e:
+        logger.warning(f"Could not write final metrics: {e}")
+    log.shutdown_logging()
@@ -139,4 +139,50 @@ export async function apiDeleteTask(id) {
   return data?.deleted;
 }
 
+// POST /tasks/stream/token: a short-lived token that only opens the event stream
+export async function apiStreamToken() {
+  const data = await request("/tasks/stream/token", { method: "POST", auth: true });
+  return data?.token;
+}
+
+const STREAM_REOPEN_MS = 5000;
+
+// GET /tasks/stream (Server-Sent Events); returns a function that closes the stream.
+// EventSource cannot send headers, so a stream token goes in the query string,
+// never the login token. The browser reconnects by itself with the same URL;
+// once that token has expired the reconnect is refused, so open with a new one.
+// "open" fires on every (re)connect: events sent while disconnected are not replayed.
+export function apiSubscribeTasks(onEvent) {
+  let source = null;
+  let closed = false;
+
+  async function open() {
+    let token = null;
+    try {
+      token = await apiStreamToken();
+    } catch {
+      token = null;
+    }
+    if (closed) return;
+    if (!token) {
+      setTimeout(open, STREAM_REOPEN_MS);
+      return;
+    }
+    source = new EventSource(`${BASE_URL}/tasks/stream?jwt=${encodeURIComponent(token)}`);
+    for (const type of ["task.created", "task.updated", "task.deleted", "tasks.changed", "resync"]) {
+      source.addEventListener(type, (e) => onEvent(type, JSON.parse(e.data)));
+    }
+    source.onopen = () => onEvent("open", null);
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED && !closed) setTimeout(open, STREAM_REOPEN_MS);
+    };
+  }
+
+  open();
+  return () => {
+    closed = true;
+    if (source) source.close();
+  };
+}
+
 export { BASE_URL };